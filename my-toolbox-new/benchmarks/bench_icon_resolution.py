@@ -0,0 +1,120 @@
+"""
+图标查找基准测试 - 统计每次扫描的文件系统系统调用次数，比较旧的 exists/glob 查找与单次 scandir + 缓存
+
+用法:
+    python benchmarks/bench_icon_resolution.py [--folders 500] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.icon_manager import IconManager  # noqa: E402
+
+# 需要统计的 os 层函数；pathlib 的 exists/glob/mkdir 最终都会调用它们
+COUNTED_CALLS = ('stat', 'lstat', 'scandir', 'listdir', 'mkdir')
+
+
+class SyscallCounter:
+    """在上下文中临时包装 os 模块的文件系统函数并计数"""
+    def __init__(self):
+        self.counts = Counter()
+        self._originals = {}
+
+    def __enter__(self):
+        for name in COUNTED_CALLS:
+            original = getattr(os, name)
+            self._originals[name] = original
+
+            def wrapper(*args, _name=name, _original=original, **kwargs):
+                self.counts[_name] += 1
+                return _original(*args, **kwargs)
+            setattr(os, name, wrapper)
+        return self
+
+    def __exit__(self, *exc):
+        for name, original in self._originals.items():
+            setattr(os, name, original)
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+
+def legacy_get_script_icon(base_dir: Path, folder: Path) -> str:
+    """重构前的查找方式：每个文件夹新建 IconManager，逐个 exists() 后再逐个 glob()"""
+    icons_dir = base_dir / "assets" / "icons"
+    icons_dir.mkdir(parents=True, exist_ok=True)
+    default_icon = icons_dir / "icon-mo.ico"
+    if folder.exists():
+        for ext in ['.ico', '.png', '.jpg', '.jpeg', '.gif', '.svg']:
+            if (folder / f"icon{ext}").exists():
+                return str(folder / f"icon{ext}")
+        for ext in ['.ico', '.png', '.jpg', '.jpeg', '.gif', '.svg']:
+            for icon_file in folder.glob(f"*{ext}"):
+                if not icon_file.name.startswith('.'):
+                    return str(icon_file)
+    return str(default_icon) if default_icon.exists() else ""
+
+
+def build_tree(root: Path, folders: int):
+    """生成脚本文件夹：三分之一有 icon.png，三分之一有其他名称的图标，其余没有图标"""
+    (root / "assets" / "icons").mkdir(parents=True)
+    (root / "assets" / "icons" / "icon-mo.ico").write_bytes(b"\0")
+    scripts_dir = root / "scripts"
+    result = []
+    for i in range(folders):
+        folder = scripts_dir / f"脚本_{i:04d}"
+        folder.mkdir(parents=True)
+        (folder / "main.py").write_text("def get_metadata():\n    return {}\n", encoding='utf-8')
+        (folder / "README.md").write_text("说明", encoding='utf-8')
+        if i % 3 == 0:
+            (folder / "icon.png").write_bytes(b"\0")
+        elif i % 3 == 1:
+            (folder / "logo.svg").write_text("<svg/>", encoding='utf-8')
+        result.append(folder)
+    return result
+
+
+def measure(label, func, folders, repeat):
+    for round_index in range(repeat):
+        with SyscallCounter() as counter:
+            start = time.perf_counter()
+            for folder in folders:
+                func(folder)
+            elapsed = time.perf_counter() - start
+        per_folder = counter.total / len(folders)
+        detail = ', '.join(f"{name}={counter.counts[name]}" for name in COUNTED_CALLS if counter.counts[name])
+        print(f"{label:<12} 第{round_index + 1}轮 {elapsed * 1000:>9.2f} ms  "
+              f"每文件夹 {per_folder:>5.1f} 次  ({detail})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='统计图标查找的系统调用次数')
+    parser.add_argument('--folders', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base_dir = Path(tmp)
+        folders = build_tree(base_dir, args.folders)
+
+        manager = IconManager(base_dir)
+        for folder in folders:
+            if legacy_get_script_icon(base_dir, folder) != manager.get_script_icon(folder):
+                print(f"结果不一致: {folder}")
+                sys.exit(1)
+
+        measure('旧实现', lambda folder: legacy_get_script_icon(base_dir, folder), folders, args.repeat)
+        # 新实例：第一轮为冷缓存（每个文件夹 stat + scandir），之后只需 stat
+        manager = IconManager(base_dir)
+        measure('scandir+缓存', manager.get_script_icon, folders, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,280 @@
+"""
+脚本库规模基准测试 - 在生成的 scripts 目录上测量发现、列表、搜索和排序的耗时与内存分配
+
+生成的脚本库包含 get_metadata 元数据、图标文件和中文文件夹名（如 "测试-报告-00001"），
+全程无需 GUI：目录变更推送到一个只记录调用的假窗口对象。
+
+用法:
+    python benchmarks/bench_library_scale.py [--sizes 100 1000 5000] [--repeat 5]
+    python benchmarks/bench_library_scale.py --json-out result.json
+    python benchmarks/bench_library_scale.py --baseline result.json --tolerance 0.5
+    python benchmarks/bench_library_scale.py --sizes 10000 --search-budget-ms 1.0
+
+脚本数不超过 10000 时，冷查询（清空查询缓存后）的平均单次搜索耗时超出 --search-budget-ms 即以状态码 1 退出。
+"""
+import argparse
+import json
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.script_discovery import ScriptDiscovery  # noqa: E402
+from core.script_manager import ScriptManager  # noqa: E402
+
+FOLDER_PATTERNS = ["测试-报告-{:05d}", "数据处理_{:05d}", "tool_{:05d}", "图片转换 {:05d}", "web-analyzer-{:05d}"]
+CATEGORIES = ["网络工具", "图像处理", "数据分析", "系统工具", "测试", "Utilities", None]
+DESCRIPTIONS = [
+    "生成测试报告并导出为 HTML",
+    "批量转换图片格式，支持 PNG、JPG 和 WebP",
+    "Download videos and convert them to mp4",
+    "分析网页的加载性能和资源大小",
+    "统计 CSV 文件中的数据并绘制图表",
+]
+DEPENDENCIES = ["requests", "pillow", "pandas", "qrcode", "beautifulsoup4", "yt-dlp"]
+SEARCH_QUERIES = ["报告", "tool", "图片 转换", "pillow", "vert", "不存在的关键词"]
+
+# 搜索耗时预算适用的最大脚本数
+SEARCH_BUDGET_MAX_SCRIPTS = 10000
+
+
+class FakeWindow:
+    """替代 pywebview 窗口，只记录 evaluate_js 的调用次数和字节数"""
+    def __init__(self):
+        self.calls = 0
+        self.bytes = 0
+
+    def evaluate_js(self, script):
+        self.calls += 1
+        self.bytes += len(script.encode('utf-8'))
+
+
+def build_library(base_dir: Path, count: int, body_lines: int, seed: int = 0):
+    """生成 count 个脚本文件夹，返回文件夹路径列表"""
+    rng = random.Random(seed)
+    scripts_dir = base_dir / "scripts"
+    scripts_dir.mkdir(parents=True)
+    filler = "".join(f"def helper_{n}(value):\n    return value * {n}\n\n" for n in range(body_lines // 3))
+    folders = []
+    for i in range(count):
+        folder = scripts_dir / FOLDER_PATTERNS[i % len(FOLDER_PATTERNS)].format(i)
+        folder.mkdir()
+        metadata = {
+            'description': f"{rng.choice(DESCRIPTIONS)} #{i}",
+            'dependencies': rng.sample(DEPENDENCIES, rng.randint(0, 3)),
+            'parameters': [{'name': 'input', 'type': 'text', 'label': '输入文件'}] if i % 2 else [],
+        }
+        category = rng.choice(CATEGORIES)
+        if category:
+            metadata['category'] = category
+        if i % 50 == 49:
+            # 少量没有 get_metadata 的脚本，覆盖使用默认元数据的分支
+            source = f"import sys\n\n{filler}"
+        else:
+            source = f"import sys\n\n\ndef get_metadata():\n    return {metadata!r}\n\n\n{filler}"
+        (folder / "main.py").write_text(source, encoding='utf-8')
+        if i % 3 == 0:
+            (folder / "icon.png").write_bytes(b"\x89PNG\r\n\x1a\n" + bytes(64))
+        elif i % 3 == 1:
+            (folder / "logo.svg").write_text("<svg xmlns='http://www.w3.org/2000/svg'/>", encoding='utf-8')
+        folders.append(folder)
+    return folders
+
+
+def measure(setup, repeat):
+    """
+    setup() 返回一个待测的无参函数（准备工作不计时）。
+    先计时 repeat 次，再在 tracemalloc 下单独运行一次统计分配，避免追踪开销影响耗时。
+    """
+    samples = []
+    for _ in range(repeat):
+        func = setup()
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+
+    func = setup()
+    tracemalloc.start()
+    func()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    samples.sort()
+    return {
+        "median_ms": statistics.median(samples) * 1000,
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+        "retained_kb": current / 1024,
+        "peak_kb": peak / 1024,
+    }
+
+
+def run_size(count: int, repeat: int, body_lines: int):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        base_dir = Path(tmp)
+        folders = build_library(base_dir, count, body_lines)
+        scripts_dir = base_dir / "scripts"
+        cache_file = base_dir / "cache" / "metadata_cache.json"
+
+        # --- 发现 ---
+        def cold_discovery():
+            if cache_file.exists():
+                cache_file.unlink()
+            discovery = ScriptDiscovery(scripts_dir, {}, cache_file)
+            return discovery.discover_scripts
+        results["discover.cold"] = measure(cold_discovery, repeat)
+
+        def restart_discovery():
+            discovery = ScriptDiscovery(scripts_dir, {}, cache_file)
+            return discovery.discover_scripts
+        results["discover.warm_restart"] = measure(restart_discovery, repeat)
+
+        warm = ScriptDiscovery(scripts_dir, {}, cache_file)
+        warm.discover_scripts()
+        results["discover.warm"] = measure(lambda: warm.discover_scripts, repeat)
+
+        # --- 列表 ---
+        results["manager.init"] = measure(lambda: (lambda: ScriptManager(base_dir)), repeat)
+        manager = ScriptManager(base_dir)
+        results["list.rediscover"] = measure(lambda: manager.get_all_scripts, repeat)
+
+        window = FakeWindow()
+        manager.start_watching(lambda diff: window.evaluate_js(
+            f'window.onScriptsChanged && window.onScriptsChanged({json.dumps(diff, ensure_ascii=False)})'))
+        try:
+            results["list.watching"] = measure(lambda: manager.get_all_scripts, repeat)
+
+            target = folders[len(folders) // 2]
+            def incremental():
+                main_file = target / "main.py"
+                # 修改描述，使增量刷新产生一条 updated 差异
+                source = main_file.read_text(encoding='utf-8').replace("'description': '", "'description': '更新 ", 1)
+                main_file.write_text(source, encoding='utf-8')
+
+                def apply():
+                    diff = manager.apply_folder_changes([target.name])
+                    window.evaluate_js(f'window.onScriptsChanged({json.dumps(diff, ensure_ascii=False)})')
+                return apply
+            results["incremental.update"] = measure(incremental, repeat)
+        finally:
+            manager.stop_watching()
+
+        # --- 搜索 ---
+        index = manager.registry.search_index
+
+        def cold_search():
+            index._query_cache.clear()
+            return lambda: [manager.search_scripts(query) for query in SEARCH_QUERIES]
+        results["search.cold"] = measure(cold_search, repeat)
+        results["search.warm"] = measure(
+            lambda: (lambda: [manager.search_scripts(query) for query in SEARCH_QUERIES]), repeat)
+        results["search.page"] = measure(
+            lambda: (lambda: [manager.search_scripts(query, limit=50) for query in SEARCH_QUERIES]), repeat)
+
+        def cold_page():
+            index._query_cache.clear()
+            return lambda: [manager.search_scripts(query, limit=50) for query in SEARCH_QUERIES]
+        results["search.page_cold"] = measure(cold_page, repeat)
+
+        # --- 排序 ---
+        rng = random.Random(1)
+        script_ids = [script['id'] for script in manager.scripts]
+
+        def shuffled_order():
+            order = script_ids[:]
+            rng.shuffle(order)
+            return lambda: manager._apply_saved_script_order_list(manager.scripts, order)
+        results["reorder.apply_saved"] = measure(shuffled_order, repeat)
+
+        def registry_reorder():
+            order = script_ids[:]
+            rng.shuffle(order)
+            return lambda: manager.registry.reorder(order)
+        results["reorder.registry"] = measure(registry_reorder, repeat)
+
+        results["fake_window"] = {"calls": window.calls, "bytes": window.bytes}
+        shutil.rmtree(base_dir / "cache", ignore_errors=True)
+    return results
+
+
+def compare(current, baseline, tolerance):
+    """返回中位耗时超出基线 (1 + tolerance) 倍的操作"""
+    regressions = []
+    for size, operations in current.items():
+        for name, stats in operations.items():
+            base = baseline.get(size, {}).get(name)
+            if not base or "median_ms" not in stats:
+                continue
+            if stats["median_ms"] > base["median_ms"] * (1 + tolerance):
+                regressions.append((size, name, base["median_ms"], stats["median_ms"]))
+    return regressions
+
+
+def check_search_budget(current, budget_ms):
+    """返回平均单次冷查询耗时超出预算的 (脚本数, 操作, 平均耗时)"""
+    failures = []
+    for size, operations in current.items():
+        if int(size) > SEARCH_BUDGET_MAX_SCRIPTS:
+            continue
+        for name in ("search.cold", "search.page_cold"):
+            per_query = operations[name]["median_ms"] / len(SEARCH_QUERIES)
+            if per_query > budget_ms:
+                failures.append((size, name, per_query))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='测量脚本发现、列表、搜索和排序随脚本数量的变化')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 5000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--body-lines', type=int, default=60, help='每个 main.py 中填充代码的行数')
+    parser.add_argument('--json-out', type=Path, help='把结果写入 JSON 文件，可作为之后的 --baseline')
+    parser.add_argument('--baseline', type=Path, help='与之前保存的结果比较，出现回退时以状态码 1 退出')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='允许的中位耗时增幅（0.5 即 50%%）')
+    parser.add_argument('--search-budget-ms', type=float, default=1.0,
+                        help='平均单次冷查询的耗时上限（脚本数不超过 10000 时检查），0 表示不检查')
+    args = parser.parse_args()
+
+    all_results = {}
+    print(f"{'脚本数':>7} {'操作':<22} {'中位(ms)':>10} {'p95(ms)':>10} {'峰值分配(KB)':>13} {'留存(KB)':>10}")
+    for count in args.sizes:
+        results = run_size(count, args.repeat, args.body_lines)
+        all_results[str(count)] = results
+        for name, stats in results.items():
+            if "median_ms" not in stats:
+                continue
+            print(f"{count:>7} {name:<22} {stats['median_ms']:>10.2f} {stats['p95_ms']:>10.2f} "
+                  f"{stats['peak_kb']:>13.1f} {stats['retained_kb']:>10.1f}")
+        window = results["fake_window"]
+        print(f"{count:>7} {'推送到假窗口':<22} {window['calls']} 次, {window['bytes']} 字节")
+        for name in ("search.cold", "search.page_cold"):
+            print(f"{count:>7} {name + ' 单次':<22} {results[name]['median_ms'] / len(SEARCH_QUERIES):>10.3f}")
+
+    if args.json_out:
+        args.json_out.write_text(json.dumps(all_results, ensure_ascii=False, indent=2), encoding='utf-8')
+
+    failed = False
+    if args.search_budget_ms:
+        for size, name, per_query in check_search_budget(all_results, args.search_budget_ms):
+            print(f"超出搜索耗时预算: {size} 个脚本 {name} 单次 {per_query:.3f} ms > {args.search_budget_ms} ms")
+            failed = True
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding='utf-8'))
+        regressions = compare(all_results, baseline, args.tolerance)
+        for size, name, before, after in regressions:
+            print(f"性能回退: {size} 个脚本 {name} {before:.2f} ms -> {after:.2f} ms")
+        if regressions:
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+元数据提取基准测试 - 比较完整 AST 解析与只解析 get_metadata 函数的快速路径
+
+用法:
+    python benchmarks/bench_metadata_extractor.py [--lines 5000] [--repeat 20]
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.metadata_extractor import extract_metadata, extract_metadata_fast  # noqa: E402
+
+METADATA_FUNCTION = '''
+def get_metadata():
+    """返回脚本的元数据"""
+    return {'description': '生成的大文件', 'dependencies': ['requests'], 'parameters': [{'name': 'url', 'type': 'text', 'label': '地址'}], 'category': '测试'}
+
+'''
+
+
+def build_source(lines: int, metadata_position: str) -> str:
+    """生成约 lines 行的模块，get_metadata 位于开头、中间或末尾"""
+    blocks = []
+    for i in range(lines // 5):
+        blocks.append(
+            f"def generated_{i}(x, y={i}):\n"
+            f"    values = [x * {i}, y + {i}, {{'k{i}': x}}]\n"
+            f"    if x > {i}:\n"
+            f"        return sum(v for v in values if isinstance(v, int))\n"
+            f"    return None\n"
+        )
+    index = {'top': 0, 'middle': len(blocks) // 2, 'bottom': len(blocks)}[metadata_position]
+    blocks.insert(index, METADATA_FUNCTION)
+    return "import os\nimport sys\n\n" + "\n".join(blocks) + "\nif __name__ == '__main__':\n    pass\n"
+
+
+def time_call(func, path, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(path)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='比较元数据提取的完整路径与快速路径')
+    parser.add_argument('--lines', type=int, nargs='+', default=[200, 2000, 10000, 50000])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'行数':>8} {'位置':>8} {'完整AST(ms)':>12} {'快速路径(ms)':>12} {'加速比':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for lines in args.lines:
+            for position in ('top', 'middle', 'bottom'):
+                path = Path(tmp) / f"main_{lines}_{position}.py"
+                path.write_text(build_source(lines, position), encoding='utf-8')
+
+                if extract_metadata(path) != extract_metadata_fast(path):
+                    print(f"结果不一致: {path}")
+                    sys.exit(1)
+
+                full = time_call(extract_metadata, path, args.repeat)
+                fast = time_call(extract_metadata_fast, path, args.repeat)
+                print(f"{lines:>8} {position:>8} {full * 1000:>12.2f} {fast * 1000:>12.2f} {full / fast:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
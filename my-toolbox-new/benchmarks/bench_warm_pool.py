@@ -0,0 +1,79 @@
+"""
+预热解释器池基准测试 - 比较冷启动与使用预热进程时，脚本从启动到第一行输出的时间以及总耗时
+
+用法:
+    python benchmarks/bench_warm_pool.py [--runs 20] [--interval 0.3] [--python 解释器路径] [--script main.py]
+不指定 --script 时运行一个只打印一行的临时脚本；--interval 为两次运行之间的间隔（留给池补充进程的时间）
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.interpreter_pool import InterpreterPool  # noqa: E402
+from core.process_runner import ProcessRunner  # noqa: E402
+from core.process_supervisor import ProcessSupervisor  # noqa: E402
+
+
+class FakeWindow:
+    def evaluate_js(self, script):
+        pass
+
+
+def measure(python: str, script: str, runs: int, interval: float, use_pool: bool) -> dict:
+    supervisor = ProcessSupervisor()
+    pool = InterpreterPool(supervisor, enabled=use_pool)
+    runner = ProcessRunner(supervisor=supervisor, interpreter_pool=pool)
+    window = FakeWindow()
+    if use_pool:
+        pool.prewarm(python)
+        time.sleep(max(interval, 0.5))
+
+    first_output_ms, total_ms, warm = [], [], 0
+    for _ in range(runs):
+        job = runner.run_script([python, script], window)
+        job.wait(60)
+        if job.first_output_at is not None:
+            first_output_ms.append((job.first_output_at - job.started_at) * 1000)
+        total_ms.append((job.finished_at - job.started_at) * 1000)
+        warm += job.warm
+        time.sleep(interval)
+
+    pool.shutdown()
+    supervisor.shutdown()
+    return {
+        "first_output_median_ms": statistics.median(first_output_ms) if first_output_ms else None,
+        "total_median_ms": statistics.median(total_ms),
+        "warm_runs": warm,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='比较冷启动与预热解释器池的脚本启动延迟')
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--interval', type=float, default=0.3)
+    parser.add_argument('--python', default=sys.executable)
+    parser.add_argument('--script', help='要运行的 main.py，默认使用只打印一行的临时脚本')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        script = args.script
+        if script is None:
+            script = str(Path(tmp) / "main.py")
+            Path(script).write_text("print('ready')\n", encoding='utf-8')
+
+        print(f"{'模式':<8}{'首行输出中位数(ms)':>20}{'总耗时中位数(ms)':>18}{'预热次数':>10}")
+        for label, use_pool in (("冷启动", False), ("预热池", True)):
+            result = measure(args.python, script, args.runs, args.interval, use_pool)
+            first = result["first_output_median_ms"]
+            first_text = f"{first:.1f}" if first is not None else "-"
+            print(f"{label:<8}{first_text:>20}{result['total_median_ms']:>18.1f}"
+                  f"{result['warm_runs']:>7}/{args.runs}")
+
+
+if __name__ == '__main__':
+    main()
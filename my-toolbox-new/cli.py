@@ -0,0 +1,267 @@
+"""
+脚本工具箱 - 命令行入口（不依赖 pywebview，可用于 cron 和服务器上的批处理任务）
+
+用法:
+    python cli.py list [--json]
+    python cli.py show <脚本ID或名称> [--json]
+    python cli.py run <脚本ID或名称> [-p 参数名=值 ...] [--venv 环境名] [--result-file 结果.json]
+    python cli.py wheelhouse stats|prune [--max-mb 大小]
+
+run 使用与界面相同的虚拟环境配置、已保存的参数默认值和参数构建方式运行脚本，
+脚本的输出直接写到标准输出，结束后把包含退出码和耗时的 JSON 结果作为最后一行写到标准错误，
+命令行的退出码与脚本相同。
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from core.script_manager import ScriptManager
+
+BASE_DIR = Path(__file__).resolve().parent
+
+_TRUE_VALUES = {'1', 'true', 'yes', 'y', 'on'}
+_FALSE_VALUES = {'0', 'false', 'no', 'n', 'off', ''}
+
+
+def find_script(script_manager, key):
+    """按脚本ID、名称或文件夹名查找脚本，找不到或名称不唯一时返回 (None, 错误信息)"""
+    scripts = script_manager.get_all_scripts()
+    for script in scripts:
+        if script['id'] == key:
+            return script, None
+    matches = [script for script in scripts
+               if key.casefold() in (script['name'].casefold(), Path(script['file_path']).parent.name.casefold())]
+    if not matches:
+        return None, f"找不到脚本 {key}"
+    if len(matches) > 1:
+        ids = ', '.join(script['id'] for script in matches)
+        return None, f"名称 {key} 对应多个脚本，请使用脚本ID: {ids}"
+    return matches[0], None
+
+
+def parse_params(script, assignments):
+    """
+    把 -p 参数名=值 与参数默认值合并成 build_command 使用的参数字典
+    :return: (参数字典, 错误信息)
+    """
+    param_defs = {p['name']: p for p in script.get('parameters', [])}
+    params = {name: p['defaultValue'] for name, p in param_defs.items()
+              if p.get('defaultValue') not in (None, '')}
+    for assignment in assignments:
+        name, sep, value = assignment.partition('=')
+        if not sep:
+            return None, f"参数格式应为 参数名=值: {assignment}"
+        param_def = param_defs.get(name)
+        if param_def is None:
+            return None, f"脚本没有参数 {name}（可用参数: {', '.join(param_defs) or '无'}）"
+        if param_def.get('type') == 'boolean':
+            if value.lower() not in _TRUE_VALUES | _FALSE_VALUES:
+                return None, f"参数 {name} 是布尔值，应为 true 或 false: {value}"
+            params[name] = value.lower() in _TRUE_VALUES
+        elif param_def.get('type') == 'choice' and param_def.get('choices'):
+            allowed = [str(choice.get('value')) for choice in param_def['choices']]
+            if value not in allowed:
+                return None, f"参数 {name} 的值应为 {', '.join(allowed)} 之一: {value}"
+            params[name] = value
+        else:
+            params[name] = value
+    missing = [name for name, p in param_defs.items() if p.get('required') and params.get(name) in (None, '')]
+    if missing:
+        return None, f"缺少必填参数: {', '.join(missing)}"
+    return params, None
+
+
+def _wait(process):
+    """等待脚本退出，返回 (退出码, rusage)；没有 os.wait4 的系统（Windows）rusage 为 None"""
+    if not hasattr(os, 'wait4'):
+        return process.wait(), None
+    _pid, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return process.returncode, usage
+
+
+def cmd_list(script_manager, args):
+    scripts = script_manager.get_all_scripts()
+    if args.json:
+        print(json.dumps([{
+            "id": script['id'],
+            "name": script['name'],
+            "category": script.get('category'),
+            "venv": script.get('venv', 'default'),
+            "description": script.get('description', ''),
+        } for script in scripts], ensure_ascii=False, indent=2))
+        return 0
+    for script in scripts:
+        print(f"{script['id']:<36}{script['name']:<24}{script.get('category') or '-':<12}{script.get('venv', 'default')}")
+    return 0
+
+
+def cmd_show(script_manager, args):
+    script, error = find_script(script_manager, args.script)
+    if script is None:
+        print(f"错误: {error}", file=sys.stderr)
+        return 2
+    if args.json:
+        print(json.dumps({key: script.get(key) for key in
+                          ('id', 'name', 'description', 'category', 'venv', 'dependencies', 'parameters', 'file_path')},
+                         ensure_ascii=False, indent=2))
+        return 0
+    print(f"{script['name']} ({script['id']})")
+    if script.get('description'):
+        print(f"  {script['description']}")
+    print(f"  虚拟环境: {script.get('venv', 'default')}")
+    print(f"  文件: {script['file_path']}")
+    if script.get('dependencies'):
+        print(f"  依赖: {', '.join(script['dependencies'])}")
+    print("参数:")
+    if not script.get('parameters'):
+        print("  (无)")
+    for param in script.get('parameters', []):
+        flags = []
+        if param.get('required'):
+            flags.append("必填")
+        if param.get('defaultValue') not in (None, ''):
+            flags.append(f"默认 {param['defaultValue']!r}")
+        if param.get('choices'):
+            flags.append("可选值 " + '/'.join(str(choice.get('value')) for choice in param['choices']))
+        extra = f" [{', '.join(flags)}]" if flags else ""
+        print(f"  {param['name']} ({param.get('type', 'text')}) {param.get('label', '')}{extra}")
+    return 0
+
+
+def cmd_run(script_manager, args, started):
+    script, error = find_script(script_manager, args.script)
+    if script is None:
+        print(f"错误: {error}", file=sys.stderr)
+        return 2
+    params, error = parse_params(script, args.param)
+    if params is None:
+        print(f"错误: {error}", file=sys.stderr)
+        return 2
+
+    # 只有 run 需要虚拟环境（首次运行时会创建默认环境）
+    from core.venv_manager import VenvManager
+    venv_manager = VenvManager(base_dir=BASE_DIR)
+    venv_name = args.venv or script.get('venv')
+    if not venv_name:
+        auto_enabled = script_manager.get_user_preferences().get('auto_environments', {}).get('enabled')
+        venv_name = 'auto' if auto_enabled else 'default'
+    if venv_name == 'auto':
+        # 按依赖集合使用共享的自动环境，需要时创建并安装依赖（pip 输出写到标准错误）
+        from core.auto_env import AutoEnvironments
+        prepared = AutoEnvironments(venv_manager).ensure(script.get('dependencies', []))
+        if not prepared['success']:
+            print(f"错误: {prepared['error']}", file=sys.stderr)
+            return 2
+        venv_name = prepared['name']
+    python_executable = venv_manager.get_python_executable_for_venv(venv_name)
+    if not python_executable:
+        print(f"错误: 在虚拟环境 '{venv_name}' 中未找到 Python 解释器。", file=sys.stderr)
+        return 2
+
+    command_parts = script_manager.build_command(script, params)
+    command = [python_executable, '-X', 'utf8', '-u'] + command_parts
+    sys.stdout.flush()
+    spawned = time.time()
+    try:
+        # 子进程直接继承标准输出和标准错误，输出不经过本进程转发
+        process = subprocess.Popen(command)
+    except OSError as e:
+        print(f"错误: 无法启动脚本: {e}", file=sys.stderr)
+        return 2
+    # cron 或批处理系统终止本进程时同时终止脚本
+    signal.signal(signal.SIGTERM, lambda signum, frame: process.terminate())
+    while True:
+        try:
+            exit_code, usage = _wait(process)
+            break
+        except KeyboardInterrupt:
+            # Ctrl+C 同样发给了子进程，继续等待它退出
+            continue
+    finished = time.time()
+
+    result = {
+        "script_id": script['id'],
+        "name": script['name'],
+        "venv": venv_name,
+        "command": command,
+        "exit_code": exit_code,
+        "success": exit_code == 0,
+        "started_at": spawned,
+        "finished_at": finished,
+        "timings": {
+            "startup": spawned - started,
+            "wall_time": finished - spawned,
+            "total": finished - started,
+        },
+    }
+    if usage is not None:
+        result["timings"]["user_cpu"] = usage.ru_utime
+        result["timings"]["system_cpu"] = usage.ru_stime
+        # Linux 上 ru_maxrss 的单位是 KB，macOS 上是字节
+        result["peak_rss"] = usage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+    text = json.dumps(result, ensure_ascii=False)
+    if args.result_file:
+        try:
+            Path(args.result_file).write_text(text + "\n", encoding='utf-8')
+        except OSError as e:
+            print(f"写入结果文件失败: {e}", file=sys.stderr)
+    print(text, file=sys.stderr)
+    return exit_code if exit_code >= 0 else 128 - exit_code
+
+
+def cmd_wheelhouse(script_manager, args):
+    from core.wheelhouse import Wheelhouse, DEFAULT_MAX_BYTES
+    prefs = script_manager.get_user_preferences().get('wheelhouse', {})
+    wheelhouse = Wheelhouse(BASE_DIR / "venvs" / "wheelhouse", offline=prefs.get('offline', False),
+                            max_bytes=prefs.get('max_bytes', DEFAULT_MAX_BYTES))
+    if args.action == 'prune':
+        max_bytes = int(args.max_mb * 1024 * 1024) if args.max_mb is not None else None
+        print(json.dumps(wheelhouse.prune(max_bytes), ensure_ascii=False))
+    else:
+        print(json.dumps(wheelhouse.get_stats(), ensure_ascii=False, indent=2))
+    return 0
+
+
+def main(argv=None):
+    started = time.time()
+    parser = argparse.ArgumentParser(description='脚本工具箱命令行（无界面）')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    list_parser = subparsers.add_parser('list', help='列出所有脚本')
+    list_parser.add_argument('--json', action='store_true', help='以 JSON 输出')
+
+    show_parser = subparsers.add_parser('show', help='显示脚本的参数')
+    show_parser.add_argument('script', help='脚本ID、名称或文件夹名')
+    show_parser.add_argument('--json', action='store_true', help='以 JSON 输出')
+
+    run_parser = subparsers.add_parser('run', help='运行脚本')
+    run_parser.add_argument('script', help='脚本ID、名称或文件夹名')
+    run_parser.add_argument('-p', '--param', action='append', default=[], metavar='参数名=值',
+                            help='脚本参数，可重复；未指定的参数使用已保存的默认值')
+    run_parser.add_argument('--venv', help='使用指定的虚拟环境（auto 表示按依赖集合共享的自动环境），默认使用为脚本配置的环境')
+    run_parser.add_argument('--result-file', help='把 JSON 结果同时写入该文件')
+
+    wheelhouse_parser = subparsers.add_parser('wheelhouse', help='查看或清理本地 wheel 仓库')
+    wheelhouse_parser.add_argument('action', choices=['stats', 'prune'])
+    wheelhouse_parser.add_argument('--max-mb', type=float,
+                                   help='prune 时保留的最大容量（MB），默认为配置的上限')
+
+    args = parser.parse_args(argv)
+    script_manager = ScriptManager(base_dir=BASE_DIR)
+    if args.command == 'list':
+        return cmd_list(script_manager, args)
+    if args.command == 'show':
+        return cmd_show(script_manager, args)
+    if args.command == 'wheelhouse':
+        return cmd_wheelhouse(script_manager, args)
+    return cmd_run(script_manager, args, started)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
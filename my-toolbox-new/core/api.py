@@ -1,93 +1,467 @@
 """
 API层 - 处理GUI与核心功能之间的通信
 """
+import itertools
 import threading
 import json
+import time
 import subprocess
 import sys
 from pathlib import Path
 from core.script_manager import ScriptManager
-from core.process_runner import ProcessRunner
+from core.process_runner import ProcessRunner, JOB_SUCCEEDED
+from core.process_supervisor import ProcessSupervisor
+from core.interpreter_pool import InterpreterPool, DEFAULT_POOL_SIZE
+from core.resource_monitor import ResourceMonitor
+from core.output_batcher import OutputBatcher
+from core.package_queue import PackageOperationQueue
+from core.wheelhouse import DEFAULT_MAX_BYTES as WHEELHOUSE_MAX_BYTES
+from core.auto_env import AutoEnvironments, AUTO_ENV_SETTING
+from core.job_scheduler import JobScheduler
+from core.output_store import DEFAULT_MAX_LINES, DEFAULT_MAX_BYTES
+from core.run_log import RunLogStore, MAX_TOTAL_BYTES, MAX_AGE_DAYS
 from core.venv_manager import VenvManager
+from core.icon_cache import IconThumbnailCache
+from core.result_cache import ResultCache, MAX_TOTAL_BYTES as RESULT_CACHE_MAX_BYTES, MAX_AGE_DAYS as RESULT_CACHE_MAX_AGE_DAYS
 
 
 class Api:
+    # 批量加载图标时每次推送给前端的图标数量
+    ICON_CHUNK_SIZE = 16
+
     def __init__(self):
         self._base_dir = Path(__file__).parent.parent  # 项目根目录
         self.script_manager = ScriptManager()
-        self.process_runner = ProcessRunner()
+        # 每个任务在内存中保留的输出行数/字节数可在用户配置的 terminal 字段中调整
+        terminal_prefs = self.script_manager.get_user_preferences().get('terminal', {})
+        # 脚本任务和虚拟环境操作的子进程都由同一个事件循环监管
+        self.supervisor = ProcessSupervisor()
+        # 每次运行的完整输出压缩保存在 logs 目录中，按总大小和保留天数轮转（用户配置的 logs 字段）
+        log_prefs = self.script_manager.get_user_preferences().get('logs', {})
+        self.run_logs = RunLogStore(
+            self._base_dir / "logs",
+            max_total_bytes=log_prefs.get('max_total_bytes', MAX_TOTAL_BYTES),
+            max_age_days=log_prefs.get('max_age_days', MAX_AGE_DAYS),
+            supervisor=self.supervisor,
+        )
+        # 上次退出时仍在运行的日志标记为 interrupted，然后轮转；之后只在写入足够多或间隔足够久时轮转
+        self.run_logs.recover_interrupted()
+        self.run_logs.rotate()
+        # 可选的预热解释器池，开关和大小保存在用户配置的 interpreter_pool 字段中
+        pool_prefs = self.script_manager.get_user_preferences().get('interpreter_pool', {})
+        self.interpreter_pool = InterpreterPool(
+            self.supervisor,
+            enabled=pool_prefs.get('enabled', False),
+            size=pool_prefs.get('size', DEFAULT_POOL_SIZE),
+        )
+        # 每次运行的 CPU 时间、峰值内存、读写字节数和耗时，按脚本保存在 cache/run_stats.json 中
+        self.resource_monitor = ResourceMonitor(self.supervisor, self._base_dir / "cache" / "run_stats.json")
+        self.process_runner = ProcessRunner(
+            output_max_lines=terminal_prefs.get('max_lines', DEFAULT_MAX_LINES),
+            output_max_bytes=terminal_prefs.get('max_bytes', DEFAULT_MAX_BYTES),
+            log_store=self.run_logs,
+            supervisor=self.supervisor,
+            interpreter_pool=self.interpreter_pool,
+            resource_monitor=self.resource_monitor,
+        )
+        # 调度器限制同时运行的脚本数量，并发上限保存在用户配置的 scheduler 字段中
+        scheduler_prefs = self.script_manager.get_user_preferences().get('scheduler', {})
+        self.job_scheduler = JobScheduler(
+            self.process_runner,
+            max_concurrent=scheduler_prefs.get('max_concurrent'),
+            per_script_limit=scheduler_prefs.get('per_script_limit'),
+            script_limits=scheduler_prefs.get('script_limits'),
+        )
         # 将 VenvManager 初始化放在这里
         self.venv_manager = VenvManager(base_dir=self._base_dir)
+        # 按依赖集合自动共享的虚拟环境（用户配置的 auto_environments 字段开启，或脚本的环境设置为 auto）
+        self.auto_environments = AutoEnvironments(self.venv_manager)
+        # 虚拟环境模板不存在时在后台构建，之后创建环境只需从模板复制
+        self.supervisor.submit(self._prepare_venv_template())
+        # 包的安装/卸载按虚拟环境排队：每个环境同一时间只有一个 pip 进程，排队中的同类操作合并为一次调用
+        self.package_queue = PackageOperationQueue(self.supervisor, self.venv_manager.package_plan,
+                                                   self._open_install_log,
+                                                   on_finished=self.venv_manager.record_package_operation)
+        # 本地 wheel 仓库的离线模式和大小上限保存在用户配置的 wheelhouse 字段中
+        wheelhouse_prefs = self.script_manager.get_user_preferences().get('wheelhouse', {})
+        self.venv_manager.wheelhouse.offline = bool(wheelhouse_prefs.get('offline', False))
+        self.venv_manager.wheelhouse.max_bytes = wheelhouse_prefs.get('max_bytes', WHEELHOUSE_MAX_BYTES)
+        self._prewarm_default_venv()
+        # 声明了 cacheable 的脚本的运行结果缓存在 cache/results 中（用户配置的 result_cache 字段可调整上限）
+        cache_prefs = self.script_manager.get_user_preferences().get('result_cache', {})
+        self.result_cache = ResultCache(
+            self._base_dir / "cache" / "results",
+            max_total_bytes=cache_prefs.get('max_total_bytes', RESULT_CACHE_MAX_BYTES),
+            max_age_days=cache_prefs.get('max_age_days', RESULT_CACHE_MAX_AGE_DAYS),
+        )
+        self.process_runner.add_start_listener(self._begin_cached_result)
+        self.process_runner.add_finish_listener(self._store_cached_result)
+        # 图标 base64 数据按内容哈希缓存在内存和 cache/icons 中
+        self.icon_cache = IconThumbnailCache(self._base_dir / "cache" / "icons")
+        # 等待加载的图标（路径 -> 尺寸，按推送顺序）和最新的批量请求ID，新请求取代尚未完成的旧请求
+        self._icon_queue = {}
+        self._icon_request_id = None
+        self._icon_loading = False
+        self._icon_lock = threading.Lock()
         self._window = None  # 使用私有属性防止被暴露到前端
 
     def set_window(self, window):
         """设置窗口对象（避免在初始化时直接暴露复杂对象）"""
         self._window = window
+        # 窗口就绪后开始监视脚本目录，变化以差异的形式推送给前端
+        self.script_manager.start_watching(self._push_script_changes)
+
+    def shutdown(self):
+        """窗口关闭后调用：终止所有仍在运行的子进程并停止进程监管器"""
+        self.script_manager.stop_watching()
+        self.interpreter_pool.shutdown()
+        self.process_runner.shutdown()
+        self.supervisor.shutdown()
+        self.resource_monitor.flush()
+
+    async def _evaluate_js(self, script):
+        """在事件循环中调用前端（evaluate_js 会阻塞，交给线程池执行）"""
+        if not self._window:
+            return
+        try:
+            await self.supervisor.run_blocking(self._window.evaluate_js, script)
+        except Exception as e:
+            print(f"调用前端时出错 (可能窗口已关闭): {e}")
+
+    def _push_script_changes(self, diff):
+        """把脚本的新增/更新/删除差异推送到前端，避免前端整体重新加载"""
+        if self._window:
+            try:
+                self._window.evaluate_js(f'window.onScriptsChanged && window.onScriptsChanged({json.dumps(diff, ensure_ascii=False)})')
+            except Exception as e:
+                print(f"推送脚本变更到前端时出错 (可能窗口已关闭): {e}")
 
     def get_scripts(self):
         """获取所有脚本信息"""
         return self.script_manager.get_all_scripts()
 
-    def execute_script(self, script_id, params=None):
+    def get_discovery_stats(self):
+        """获取最近一次脚本发现的缓存命中统计"""
+        return self.script_manager.get_discovery_stats()
+
+    def execute_script(self, script_id, params=None, priority='normal', use_cache=True):
         """
-        执行指定脚本
+        执行指定脚本，作为一个新任务交给调度器：有空闲名额时立即运行，否则排队
+        声明了 cacheable 的脚本在输入相同时直接回放缓存的结果
         :param script_id: 脚本ID
         :param params: 脚本参数
+        :param priority: 'high'、'normal' 或 'low'
+        :param use_cache: 为 False 时忽略缓存的结果，重新运行
+        :return: {"success": True, "job": 任务信息} 或 {"success": False, "error": 错误信息}
+        """
+        return self._execute_script(script_id, params, priority, use_cache, prepare_env=True)
+
+    def _execute_script(self, script_id, params, priority, use_cache, prepare_env):
+        """
+        :param prepare_env: 脚本使用的自动环境尚未就绪时是否先准备环境（准备完成后以 False 再次调用）
         """
         script = self.script_manager.get_script_by_id(script_id)
         if not script:
             error_msg = f'<span style="color:red;">错误：找不到脚本 {script_id}</span><br>'
             if self._window:
                 self._window.evaluate_js(f'updateTerminal({repr(error_msg)})')
-            return
-
-        # 在新线程中执行脚本，避免阻塞GUI
-        thread = threading.Thread(
-            target=self._execute_script_thread, 
-            args=(script, params or {})
-        )
-        thread.start()
+            return {"success": False, "error": f"找不到脚本 {script_id}"}
 
-    def _execute_script_thread(self, script, params):
-        """在新线程中执行脚本，并管理其进程"""
         try:
-            venv_name = self.script_manager.get_user_preferences().get('scripts', {}).get(script['id'], {}).get('venv', 'default')
+            venv_name = self._script_venv_setting(script['id'])
+            if venv_name == AUTO_ENV_SETTING:
+                venv_name, missing = self.auto_environments.resolve(script.get('dependencies', []))
+                if prepare_env and (missing or venv_name not in self.venv_manager.get_venvs()):
+                    self.supervisor.submit(self._prepare_auto_environment(
+                        script, venv_name, missing, lambda: self._execute_script(script_id, params, priority, use_cache, False)))
+                    return {"success": True, "preparing": True, "venv": venv_name,
+                            "message": f"正在准备共享环境 {venv_name}，完成后开始运行。"}
             python_executable = self.venv_manager.get_python_executable_for_venv(venv_name)
             if not python_executable:
                 raise FileNotFoundError(f"在虚拟环境 '{venv_name}' 中未找到 Python 解释器。")
 
-            command_parts = self.script_manager.build_command(script, params)
+            command_parts = self.script_manager.build_command(script, params or {})
             final_command = [python_executable] + command_parts
 
-            if self._window:
-                # 启动进程并保存进程对象
-                self.script_process = self.process_runner.run_script(final_command, self._window)
-                if self.script_process:
-                    # 等待进程结束
-                    self.script_process.wait()
+            cache_key = None
+            if script.get('cacheable'):
+                cache_key = self.result_cache.compute_key(script, command_parts, python_executable)
+                entry = self.result_cache.lookup(cache_key) if use_cache else None
+                if entry is not None:
+                    restored = self.result_cache.restore_artifacts(cache_key, entry)
+                    created = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry['created_at']))
+                    note = f"输入与 {created} 的运行相同，使用缓存的结果（恢复了 {len(restored)} 个文件）"
+                    job = self.process_runner.replay_job(final_command, self._window, entry['lines'],
+                                                         script_id=script['id'], name=script['name'], note=note)
+                    return {"success": True, "job": job.to_dict()}
+
+            # 进程的启动、等待和输出转发都由进程监管器在后台进行，这里不会阻塞
+            job = self.job_scheduler.submit(final_command, self._window, script_id=script['id'],
+                                            name=script['name'], priority=priority, cache_key=cache_key)
+            return {"success": True, "job": job.to_dict()}
 
         except Exception as e:
             error_msg = f'<span style="color:red;">执行脚本时发生错误: {str(e)}</span><br>'
             if self._window:
                 self._window.evaluate_js(f'updateTerminal({json.dumps(error_msg)})')
-        finally:
-            # 任务结束后，清除进程引用
-            self.script_process = None
+            return {"success": False, "error": str(e)}
+
+    def _script_venv_setting(self, script_id):
+        """脚本设置中选择的环境；未选择时按全局设置使用自动环境（auto）或 default"""
+        preferences = self.script_manager.get_user_preferences()
+        venv_name = preferences.get('scripts', {}).get(script_id, {}).get('venv')
+        if venv_name:
+            return venv_name
+        return AUTO_ENV_SETTING if preferences.get('auto_environments', {}).get('enabled') else 'default'
+
+    async def _prepare_auto_environment(self, script, venv_name, missing, then):
+        """从模板创建自动环境并通过包操作队列安装缺少的依赖，完成后调用 then"""
+        async def report_error(error):
+            error_msg = f'<span style="color:red;">准备共享环境 {venv_name} 失败: {error}</span><br>'
+            await self._evaluate_js(f'updateTerminal({json.dumps(error_msg)})')
+
+        message = f'正在准备共享环境 {venv_name}（{script["name"]}）...<br>'
+        await self._evaluate_js(f'updateTerminal({json.dumps(message)})')
+        result = await self.supervisor.run_blocking(
+            self.auto_environments.create, venv_name, script.get('dependencies', []))
+        if not result['success']:
+            await report_error(result['error'])
+            return
+        if not missing:
+            await self.supervisor.run_blocking(then)
+            return
+
+        async def on_done(install_result):
+            await self._evaluate_js(
+                f'window.scriptVenvUI.onInstallComplete({json.dumps({"success": install_result["success"], "error": install_result.get("error")})}, {json.dumps(venv_name)})')
+            if install_result['success']:
+                await self.supervisor.run_blocking(then)
+            else:
+                await report_error(install_result.get('error'))
+
+        self.package_queue.submit(venv_name, 'install', missing, on_done)
+
+    def _auto_env_assignments(self):
+        """使用自动环境的脚本 -> 对应的环境名"""
+        assignments = {}
+        for script in self.script_manager.get_all_scripts():
+            if self._script_venv_setting(script['id']) == AUTO_ENV_SETTING:
+                assignments[script['id']] = self.auto_environments.resolve(script.get('dependencies', []))[0]
+        return assignments
+
+    def get_auto_environments(self):
+        """获取自动环境模式的开关，以及每个自动环境的依赖集合和使用它的脚本"""
+        enabled = self.script_manager.get_user_preferences().get('auto_environments', {}).get('enabled', False)
+        assignments = self._auto_env_assignments()
+        return {"success": True, "enabled": bool(enabled), "assignments": assignments,
+                "environments": self.auto_environments.list_environments(assignments)}
+
+    def set_auto_environments(self, enabled):
+        """
+        开启/关闭自动环境模式并保存到用户配置：开启后未单独选择环境的脚本按依赖集合共用自动创建的环境
+        """
+        preferences = self.script_manager.get_user_preferences()
+        preferences['auto_environments'] = {"enabled": bool(enabled)}
+        if not self.script_manager.save_user_preferences(preferences):
+            return {"success": False, "error": "保存用户配置失败。"}
+        return self.get_auto_environments()
+
+    def remove_unused_auto_environments(self):
+        """删除没有脚本使用的自动环境"""
+        removed = self.auto_environments.remove_unused(self._auto_env_assignments().values())
+        return {"success": True, "removed": removed}
+
+    def _begin_cached_result(self, job):
+        """任务启动回调：声明了 cacheable 的脚本在子进程启动前记录输出位置的文件快照"""
+        if job.cache_key is None or job.cached:
+            return
+        script = self.script_manager.get_script_by_id(job.script_id)
+        if script:
+            self.result_cache.begin(job.job_id, script, job.command[1:])
+
+    def _store_cached_result(self, job):
+        """任务结束回调：声明了 cacheable 的脚本运行成功后保存输出和产物"""
+        if job.cache_key is None or job.cached:
+            return
+        script = self.script_manager.get_script_by_id(job.script_id)
+        if script and job.status == JOB_SUCCEEDED and job.captured_lines is not None:
+            self.result_cache.store(job.job_id, job.cache_key, script, job.command[1:], job.captured_lines,
+                                    job.started_at)
+        else:
+            self.result_cache.discard(job.job_id)
+
+    def get_result_cache_stats(self):
+        """获取结果缓存的命中次数、条目数和占用空间"""
+        return self.result_cache.get_stats()
+
+    def clear_result_cache(self):
+        """清空结果缓存"""
+        self.result_cache.clear()
+        return {"success": True}
+
+    def list_jobs(self):
+        """列出所有任务（排队中、运行中和最近结束的），排队中的任务带有 queue_position"""
+        positions = self.job_scheduler.queue_positions()
+        jobs = self.process_runner.list_jobs()
+        for job in jobs:
+            job["queue_position"] = positions.get(job["job_id"])
+        return jobs
+
+    def terminate_job(self, job_id):
+        """终止指定任务；任务仍在排队时直接取消"""
+        if self.job_scheduler.cancel(job_id):
+            return {"success": True, "message": "任务已取消。"}
+        if self.process_runner.terminate_job(job_id):
+            return {"success": True, "message": "终止信号已发送。"}
+        else:
+            return {"success": False, "error": f"任务 {job_id} 不存在或已结束。"}
+
+    def cancel_job(self, job_id):
+        """取消排队中（尚未启动）的任务"""
+        if self.job_scheduler.cancel(job_id):
+            return {"success": True, "message": "任务已取消。"}
+        return {"success": False, "error": f"任务 {job_id} 不在队列中。"}
+
+    def get_scheduler_status(self):
+        """获取调度器的并发上限以及运行中/排队中的任务数"""
+        return self.job_scheduler.status()
+
+    def set_scheduler_limits(self, max_concurrent=None, per_script_limit=None, script_limits=None):
+        """
+        设置并发上限并保存到用户配置
+        :param per_script_limit: 同一脚本的并发上限，0 表示不限制
+        """
+        try:
+            self.job_scheduler.configure(max_concurrent, per_script_limit, script_limits)
+            status = self.job_scheduler.status()
+            preferences = self.script_manager.get_user_preferences()
+            preferences['scheduler'] = {
+                "max_concurrent": status["max_concurrent"],
+                "per_script_limit": status["per_script_limit"],
+                "script_limits": status["script_limits"],
+            }
+            self.script_manager.save_user_preferences(preferences)
+            return {"success": True, "scheduler": status}
+        except (TypeError, ValueError) as e:
+            return {"success": False, "error": str(e)}
+
+    def _prewarm_default_venv(self):
+        """解释器池启用时为默认环境预先启动进程（其他环境在第一次运行后开始预热）"""
+        python_executable = self.venv_manager.get_python_executable_for_venv('default')
+        if python_executable:
+            self.interpreter_pool.prewarm(str(python_executable))
+
+    def get_interpreter_pool_status(self):
+        """获取预热解释器池的开关、大小、空闲进程数和命中次数"""
+        return self.interpreter_pool.status()
+
+    def set_interpreter_pool(self, enabled=None, size=None):
+        """
+        开启/关闭预热解释器池或调整每个环境的空闲进程数，并保存到用户配置
+        启用后脚本在预先启动的解释器中通过 runpy 运行，每个进程只运行一次
+        """
+        try:
+            self.interpreter_pool.configure(enabled, size)
+            if self.interpreter_pool.enabled:
+                self._prewarm_default_venv()
+            status = self.interpreter_pool.status()
+            preferences = self.script_manager.get_user_preferences()
+            preferences['interpreter_pool'] = {"enabled": status["enabled"], "size": status["size"]}
+            self.script_manager.save_user_preferences(preferences)
+            return {"success": True, "interpreter_pool": status}
+        except (TypeError, ValueError) as e:
+            return {"success": False, "error": str(e)}
+
+    def wait_job(self, job_id, timeout=None):
+        """等待指定任务结束（可设置超时秒数），返回任务状态"""
+        job = self.process_runner.wait_job(job_id, timeout)
+        if job is None:
+            return {"success": False, "error": f"任务 {job_id} 不存在。"}
+        return {"success": True, "job": job}
 
     def terminate_current_script(self):
-        """终止当前正在运行的脚本进程"""
-        if self.process_runner.shutdown():
+        """终止最近启动且仍在运行的脚本任务"""
+        if self.process_runner.terminate_latest():
             return {"success": True, "message": "终止信号已发送。"}
         else:
             return {"success": False, "error": "没有正在运行的脚本任务。"}
 
+    def get_job_output(self, job_id, start=None, count=200):
+        """
+        分页读取任务的输出行
+        :param start: 起始行号，为 None 时返回最后 count 行
+        :return: {"success": True, "start", "lines", "first_line", "total_lines"}
+        """
+        result = self.process_runner.get_output(job_id, start, count)
+        if result is None:
+            return {"success": False, "error": f"任务 {job_id} 不存在。"}
+        return {"success": True, "job_id": job_id, **result}
+
+    def get_job_resources(self, job_id):
+        """
+        获取任务的资源统计（CPU 时间、峰值内存、读写字节数、耗时）以及常驻内存随时间的变化
+        :return: {"success": True, "resources": {..., "timeline": [[秒, 字节], ...]}}
+        """
+        job = self.process_runner.get_job(job_id)
+        if job is None:
+            return {"success": False, "error": f"任务 {job_id} 不存在。"}
+        if job.resources is None:
+            return {"success": False, "error": "该任务没有资源统计（结果来自缓存或尚未启动）。"}
+        return {"success": True, "job_id": job_id, "resources": job.resources.to_dict(include_timeline=True)}
+
+    def get_script_run_stats(self, script_id=None):
+        """获取脚本最近的运行统计和汇总（中位耗时、中位 CPU 时间、最大峰值内存），script_id 为 None 时返回所有脚本"""
+        return {"success": True, "available": self.resource_monitor.available,
+                "scripts": self.resource_monitor.get_history(script_id)}
+
+    def list_run_logs(self, script_id=None):
+        """列出保存的运行日志（最新的在前），可按脚本ID过滤"""
+        return {"success": True, "logs": self.run_logs.list_logs(script_id)}
+
+    def get_run_log(self, log_id, start=None, count=200):
+        """
+        读取运行日志的指定行，只解压用到的块
+        :param start: 起始行号，为 None 时返回最后 count 行
+        :return: {"success": True, "start", "lines", "total_lines"}
+        """
+        if start is None:
+            result = self.run_logs.tail(log_id, count)
+        else:
+            result = self.run_logs.read_lines(log_id, start, count)
+        if result is None:
+            return {"success": False, "error": f"运行日志 {log_id} 不存在。"}
+        return {"success": True, "log_id": log_id, **result}
+
+    def search_run_log(self, log_id, query, limit=200, ignore_case=True):
+        """在运行日志中查找包含 query 的行，返回行号和内容"""
+        if not query:
+            return {"success": False, "error": "搜索内容不能为空。"}
+        result = self.run_logs.search(log_id, query, limit, ignore_case)
+        if result is None:
+            return {"success": False, "error": f"运行日志 {log_id} 不存在。"}
+        return {"success": True, "log_id": log_id, **result}
+
+    def delete_run_log(self, log_id):
+        """删除一份运行日志（正在写入的日志不能删除）"""
+        if self.run_logs.delete(log_id):
+            return {"success": True}
+        return {"success": False, "error": f"运行日志 {log_id} 不存在或正在写入。"}
+
+    def get_output_stats(self, job_id=None):
+        """获取指定任务（默认为最近启动的任务）的输出转发统计"""
+        return self.process_runner.get_output_stats(job_id)
+
     def get_script_categories(self):
         """获取脚本分类"""
         return self.script_manager.get_categories()
 
-    def search_scripts(self, query):
-        """搜索脚本"""
-        return self.script_manager.search_scripts(query)
+    def search_scripts(self, query, limit=None, offset=0):
+        """
+        搜索脚本，结果按相关度排序
+        :param limit: 最多返回的结果数（None 表示不限制）
+        :param offset: 跳过前 offset 个结果，用于分页
+        """
+        return self.script_manager.search_scripts(query, limit=limit, offset=offset or 0)
 
     def get_user_preferences(self):
         """获取用户偏好设置"""
@@ -230,21 +604,22 @@ class Api:
 
     def get_script_icon(self, script_file_path):
         """获取脚本的图标路径"""
-        import os
         from pathlib import Path
-        from core.icon_manager import IconManager
         
         script_path = Path(script_file_path)
         script_folder = script_path.parent
         
-        icon_manager = IconManager(Path(__file__).parent.parent)
+        # 复用脚本发现共享的图标管理器及其按文件夹缓存的查找结果
+        icon_manager = self.script_manager.script_discovery.icon_manager
         icon_path = icon_manager.get_script_icon(script_folder)
         
         return {"success": True, "icon_path": icon_path}
     
-    def get_icon_as_base64(self, icon_path):
-        """将图标文件转换为base64格式以供前端显示"""
-        import base64
+    def get_icon_as_base64(self, icon_path, size=None):
+        """
+        将图标文件转换为base64格式以供前端显示
+        :param size: 显示尺寸（像素），提供时返回缩放后的缩略图（需要 Pillow）
+        """
         from pathlib import Path
         
         try:
@@ -261,14 +636,12 @@ class Api:
             if not mime_type:
                 return {"success": False, "error": f"不支持的文件类型: {icon_file.suffix}"}
             
-            with open(icon_file, 'rb') as f:
-                file_content = f.read()
-                base64_content = base64.b64encode(file_content).decode('utf-8')
-                
+            data_url = self.icon_cache.get_data_url(icon_file, mime_type, size)
+
             return {
                 "success": True, 
-                "base64_data": f"data:{mime_type};base64,{base64_content}",
-                "mime_type": mime_type
+                "base64_data": data_url,
+                "mime_type": data_url[5:data_url.index(';')]
             }
         except Exception as e:
             return {"success": False, "error": str(e)}
@@ -285,122 +658,191 @@ class Api:
         }
         return mime_types.get(file_extension, None)
 
+    def get_icons_as_base64(self, icon_paths, size=None):
+        """
+        批量获取图标的base64数据，相同路径只处理一次
+        :return: {"success": True, "icons": {路径: data URL}, "errors": {路径: 错误信息}}
+        """
+        icons = {}
+        errors = {}
+        for icon_path in dict.fromkeys(icon_paths or []):
+            result = self.get_icon_as_base64(icon_path, size)
+            if result["success"]:
+                icons[icon_path] = result["base64_data"]
+            else:
+                errors[icon_path] = result["error"]
+        return {"success": True, "icons": icons, "errors": errors}
+
+    def request_icons(self, request_id, icon_paths, size=None):
+        """
+        在进程监管器的线程池中按顺序批量加载图标，每 ICON_CHUNK_SIZE 个去重后的图标通过
+        window.onIconsChunk 推送一次，前端可以先显示首屏的图标。
+        新请求取代尚未完成的旧请求：新请求的图标排在最前，旧请求剩余的图标接在后面继续加载
+        （前端不会再次请求已在加载中的图标），之后推送的块都带新请求的ID，不再为旧请求推送
+        """
+        if not self._window:
+            return {"success": False, "error": "窗口尚未就绪"}
+        unique_paths = list(dict.fromkeys(icon_paths or []))
+        with self._icon_lock:
+            queue = {path: size for path in unique_paths}
+            for path, queued_size in self._icon_queue.items():
+                queue.setdefault(path, queued_size)
+            self._icon_queue = queue
+            self._icon_request_id = request_id
+            start = not self._icon_loading
+            self._icon_loading = True
+        if start:
+            self.supervisor.submit(self._load_requested_icons())
+        return {"success": True, "count": len(unique_paths)}
+
+    async def _load_requested_icons(self):
+        """逐块编码排队的图标并推送，队列为空时结束（同一时间只有一个在运行）"""
+        while True:
+            with self._icon_lock:
+                if not self._icon_queue or not self._window:
+                    self._icon_queue = {}
+                    self._icon_loading = False
+                    return
+                chunk_items = list(itertools.islice(self._icon_queue.items(), self.ICON_CHUNK_SIZE))
+                for path, _size in chunk_items:
+                    del self._icon_queue[path]
+            chunk = await self.supervisor.run_blocking(self._encode_icon_chunk, chunk_items)
+            with self._icon_lock:
+                chunk["request_id"] = self._icon_request_id
+                chunk["done"] = not self._icon_queue
+            await self._evaluate_js(f'window.onIconsChunk && window.onIconsChunk({json.dumps(chunk)})')
+
+    def _encode_icon_chunk(self, chunk_items):
+        icons = {}
+        errors = {}
+        for icon_path, size in chunk_items:
+            result = self.get_icon_as_base64(icon_path, size)
+            if result["success"]:
+                icons[icon_path] = result["base64_data"]
+            else:
+                errors[icon_path] = result["error"]
+        return {"success": True, "icons": icons, "errors": errors}
+
     # --- 虚拟环境管理 API ---
 
     def get_venvs(self):
         """获取所有虚拟环境的列表"""
         return self.venv_manager.get_venvs()
 
-    def _create_venv_thread(self, name):
-        """在后台线程中分步创建虚拟环境并提供反馈"""
+    async def _prepare_venv_template(self):
+        result = await self.supervisor.run_blocking(self.venv_manager.venv_template.ensure)
+        if not result['success']:
+            print(result['error'])
+
+    async def _create_venv(self, name):
+        """在事件循环中分步创建虚拟环境并提供反馈"""
         # 步骤0: 获取命令
         result = self.venv_manager.create_venv(name)
         if not result['success']:
-            if self._window:
-                self._window.evaluate_js(f'window.scriptVenvUI.onCreateVenvComplete({json.dumps(result)})')
+            await self._evaluate_js(f'window.scriptVenvUI.onCreateVenvComplete({json.dumps(result)})')
+            return
+
+        # 优先从模板复制（不需要联网，通常不到一秒）
+        await self._evaluate_js(f'window.scriptVenvUI.updateCreateLog("正在从模板复制环境...")')
+        clone_result = await self.supervisor.run_blocking(self.venv_manager.clone_venv_from_template, name)
+        if clone_result['success']:
+            await self._evaluate_js(f'window.scriptVenvUI.onCreateVenvComplete({json.dumps(clone_result)})')
             return
+        await self._evaluate_js(f'window.scriptVenvUI.updateCreateLog({json.dumps(clone_result["error"] + "，改为直接创建...")})')
 
         commands = result['commands']
         venv_path = result['path']
 
         try:
             # 步骤1: 创建基础环境
-            if self._window:
-                self._window.evaluate_js(f'window.scriptVenvUI.updateCreateLog("正在创建基础环境...")')
-            subprocess.run(commands['create'], capture_output=True, text=True, check=True, encoding='utf-8')
+            await self._evaluate_js(f'window.scriptVenvUI.updateCreateLog("正在创建基础环境...")')
+            return_code, output = await self.supervisor.run_process(commands['create'])
+            if return_code != 0:
+                raise subprocess.CalledProcessError(return_code, commands['create'], stderr=output)
 
             # 步骤2: 更新PIP
-            if self._window:
-                self._window.evaluate_js(f'window.scriptVenvUI.updateCreateLog("正在联网更新 pip...")')
-            subprocess.run(commands['upgrade_pip'], capture_output=True, text=True, check=True, encoding='utf-8')
+            await self._evaluate_js(f'window.scriptVenvUI.updateCreateLog("正在联网更新 pip...")')
+            return_code, output = await self.supervisor.run_process(commands['upgrade_pip'])
+            if return_code != 0:
+                raise subprocess.CalledProcessError(return_code, commands['upgrade_pip'], stderr=output)
 
             # 步骤3: 更新配置文件并通知成功
             self.venv_manager.venvs_config['venvs'][name] = {"path": venv_path, "editable": True}
             self.venv_manager._save_config(self.venv_manager.venvs_config)
-            
+
             final_result = {"success": True, "name": name}
-            if self._window:
-                self._window.evaluate_js(f'window.scriptVenvUI.onCreateVenvComplete({json.dumps(final_result)})')
+            await self._evaluate_js(f'window.scriptVenvUI.onCreateVenvComplete({json.dumps(final_result)})')
 
         except (subprocess.CalledProcessError, FileNotFoundError) as e:
             error_message = str(e)
             if isinstance(e, subprocess.CalledProcessError):
                 error_message += f"\n{e.stderr}"
             final_result = {"success": False, "error": error_message}
-            if self._window:
-                self._window.evaluate_js(f'window.scriptVenvUI.onCreateVenvComplete({json.dumps(final_result)})')
+            await self._evaluate_js(f'window.scriptVenvUI.onCreateVenvComplete({json.dumps(final_result)})')
 
     def create_venv(self, name):
-        """在新线程中创建虚拟环境"""
-        thread = threading.Thread(target=self._create_venv_thread, args=(name,))
-        thread.start()
+        """在进程监管器中创建虚拟环境（不阻塞）"""
+        self.supervisor.submit(self._create_venv(name))
         return {"success": True, "message": "创建任务已开始..."}
 
     def list_venv_packages(self, venv_name):
         """列出指定虚拟环境中的包"""
         return self.venv_manager.list_packages(venv_name)
 
-    def _package_operation_thread(self, operation, venv_name, package_name):
-        """在线程中执行包操作并流式传输输出"""
-        command = []
-        if operation == 'install':
-            command = self.venv_manager.install_package(venv_name, package_name)
-        else: # uninstall
-            command = self.venv_manager.uninstall_package(venv_name, package_name)
+    def _open_install_log(self, venv_name):
+        """为一次 pip 调用创建输出批处理器，输出按帧合并后推送到前端的安装日志"""
+        window = self._window
+        def send_frame(lines):
+            if window:
+                text = '\n'.join(lines) + '\n'
+                window.evaluate_js(f'window.scriptVenvUI.updateInstallLog({json.dumps(text, ensure_ascii=False)})')
+        return OutputBatcher(send_frame, self.supervisor)
 
-        if not command:
-            result = {"success": False, "error": "无法构建命令，可能是环境不存在。"}
-            if self._window:
-                self._window.evaluate_js(f'window.scriptVenvUI.onInstallComplete({json.dumps(result)})')
-            return
+    def _start_package_operation(self, operation, venv_name, packages):
+        """把包操作加入该虚拟环境的队列，完成后通知前端"""
+        async def on_done(result):
+            result = {key: value for key, value in result.items() if key != 'packages'}
+            await self._evaluate_js(f'window.scriptVenvUI.onInstallComplete({json.dumps(result)}, {json.dumps(venv_name)})')
 
-        try:
-            process = subprocess.Popen(
-                command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                encoding='utf-8',
-                creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0,
-                bufsize=1
-            )
-
-            while True:
-                output = process.stdout.readline()
-                if output == '' and process.poll() is not None:
-                    break
-                if output and self._window:
-                    self._window.evaluate_js(f'window.scriptVenvUI.updateInstallLog({json.dumps(output)})')
-            
-            process.stdout.close()
-            return_code = process.wait()
-            result = {"success": return_code == 0}
-            if self._window:
-                self._window.evaluate_js(f'window.scriptVenvUI.onInstallComplete({json.dumps(result)}, "{venv_name}")')
-
-        except Exception as e:
-            result = {"success": False, "error": str(e)}
-            if self._window:
-                self._window.evaluate_js(f'window.scriptVenvUI.onInstallComplete({json.dumps(result)}, "{venv_name}")')
+        self.package_queue.submit(venv_name, operation, packages, on_done)
 
     def install_package(self, venv_name, package_spec):
-        """在新线程中安装一个包"""
-        thread = threading.Thread(
-            target=self._package_operation_thread, 
-            args=('install', venv_name, package_spec)
-        )
-        thread.start()
+        """在后台安装一个包（不阻塞）"""
+        self._start_package_operation('install', venv_name, [package_spec])
         return {"success": True, "message": "安装任务已开始..."}
 
     def uninstall_package(self, venv_name, package_name):
-        """在新线程中卸载一个包"""
-        thread = threading.Thread(
-            target=self._package_operation_thread, 
-            args=('uninstall', venv_name, package_name)
-        )
-        thread.start()
+        """在后台卸载一个包（不阻塞）"""
+        self._start_package_operation('uninstall', venv_name, [package_name])
         return {"success": True, "message": "卸载任务已开始..."}
 
+    def get_wheelhouse_stats(self):
+        """获取本地 wheel 仓库的命中次数、wheel 数量、占用空间和离线模式"""
+        return self.venv_manager.wheelhouse.get_stats()
+
+    def set_wheelhouse_options(self, offline=None, max_bytes=None):
+        """
+        设置 wheel 仓库的离线模式（只从仓库安装，不访问网络）和大小上限，并保存到用户配置
+        """
+        wheelhouse = self.venv_manager.wheelhouse
+        if offline is not None:
+            wheelhouse.offline = bool(offline)
+        if max_bytes is not None:
+            wheelhouse.max_bytes = max(0, int(max_bytes))
+        preferences = self.script_manager.get_user_preferences()
+        preferences['wheelhouse'] = {"offline": wheelhouse.offline, "max_bytes": wheelhouse.max_bytes}
+        if not self.script_manager.save_user_preferences(preferences):
+            return {"success": False, "error": "保存用户配置失败。"}
+        return {"success": True, "stats": wheelhouse.get_stats()}
+
+    def prune_wheelhouse(self, max_bytes=None):
+        """从最久未使用的 wheel 开始删除，直到 wheel 仓库不超过 max_bytes（默认为配置的上限）"""
+        return self.venv_manager.wheelhouse.prune(max_bytes)
+
+    def get_package_queue_status(self):
+        """获取每个虚拟环境正在安装/卸载和排队中的包"""
+        return self.package_queue.status()
+
     def check_script_dependencies(self, script_id, venv_name):
         """检查脚本在指定环境中的依赖满足状态"""
         script = self.script_manager.get_script_by_id(script_id)
@@ -410,8 +852,15 @@ class Api:
         requirements = script.get('dependencies', [])
         if not requirements:
             return {"success": True, "dependencies_status": []} # 没有依赖，直接返回成功
-            
-        return self.venv_manager.check_dependencies(venv_name, requirements)
+
+        if venv_name == AUTO_ENV_SETTING:
+            venv_name = self.auto_environments.resolve(requirements)[0]
+            if venv_name not in self.venv_manager.get_venvs():
+                # 自动环境尚未创建（第一次运行或安装依赖时创建）
+                return {"success": True, "venv": venv_name, "dependencies_status": [
+                    {"requirement": req, "name": req, "status": "未安装", "installed_version": None}
+                    for req in requirements]}
+        return {**self.venv_manager.check_dependencies(venv_name, requirements), "venv": venv_name}
 
     def rename_venv(self, old_name, new_name):
         """重命名虚拟环境"""
@@ -451,10 +900,16 @@ class Api:
         return self.script_manager.save_parameter_default(script_id, param_name, value)
 
     def install_script_dependencies(self, script_id, venv_name):
-        """安装指定脚本的所有缺失依赖到指定环境"""
+        """安装指定脚本的所有缺失依赖到指定环境（环境为 auto 时安装到对应的自动环境，不存在时先创建）"""
         check_result = self.check_script_dependencies(script_id, venv_name)
         if not check_result.get('success'):
             return check_result
+        if venv_name == AUTO_ENV_SETTING and check_result.get('venv'):
+            venv_name = check_result['venv']
+            script = self.script_manager.get_script_by_id(script_id)
+            create_result = self.auto_environments.create(venv_name, script.get('dependencies', []))
+            if not create_result['success']:
+                return create_result
 
         missing_deps = [
             dep['requirement'] for dep in check_result.get('dependencies_status', []) 
@@ -464,16 +919,13 @@ class Api:
         if not missing_deps:
             return {"success": True, "message": "所有依赖均已满足。"}
 
-        # 对于每个缺失的依赖，启动一个安装线程
-        # 注意：为了简单起见，这里是串行启动。在实际应用中可能需要更复杂的任务管理。
-        for dep in missing_deps:
-            self.install_package(venv_name, dep)
-        
+        # 所有缺失的依赖合并为一次 pip 调用，只解析一次依赖
+        self._start_package_operation('install', venv_name, missing_deps)
+
         return {"success": True, "message": f"开始为 {len(missing_deps)} 个依赖项执行安装任务..."}
 
     def set_custom_script_icon(self, script_id, icon_path):
         """为脚本设置自定义图标"""
-        from core.icon_manager import IconManager
         from pathlib import Path
         
         # 获取脚本信息
@@ -484,7 +936,7 @@ class Api:
         script_file_path = Path(script['file_path'])
         script_folder_path = script_file_path.parent
         
-        icon_manager = IconManager(Path(__file__).parent.parent)
+        icon_manager = self.script_manager.script_discovery.icon_manager
         result = icon_manager.set_custom_icon(script_folder_path, icon_path)
         
         if result["success"]:
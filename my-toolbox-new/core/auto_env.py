@@ -0,0 +1,163 @@
+"""
+自动共享环境 - 按脚本声明的依赖集合自动选择虚拟环境
+
+依赖集合规范化（包名按 PEP 503 规范化，extras 和版本约束排序，去重后整体排序）后取哈希，
+依赖集合相同的脚本共用名为 auto_<哈希> 的环境；没有相同集合时，若某个已有的自动环境已满足全部依赖，
+也直接使用它。需要的环境不存在时从模板复制并安装依赖。
+环境数量和安装时间因此只随不同依赖集合的数量增长，而不是随脚本数量增长。
+没有声明依赖的脚本使用 default 环境。
+"""
+import hashlib
+import subprocess
+import sys
+import threading
+from typing import Dict, Any, Iterable, List, Tuple
+
+from packaging.requirements import InvalidRequirement, Requirement
+from packaging.utils import canonicalize_name
+
+# 自动环境名称前缀
+AUTO_ENV_PREFIX = "auto_"
+
+# 在脚本设置中选择该值表示使用自动环境
+AUTO_ENV_SETTING = "auto"
+
+
+def normalize_requirement(requirement: str) -> str:
+    """规范化单个依赖（无法解析的依赖原样保留）"""
+    try:
+        req = Requirement(requirement)
+    except InvalidRequirement:
+        return requirement.strip()
+    text = canonicalize_name(req.name)
+    if req.extras:
+        text += "[" + ",".join(sorted(canonicalize_name(extra) for extra in req.extras)) + "]"
+    if req.url:
+        text += f" @ {req.url}"
+    else:
+        text += ",".join(sorted(str(spec) for spec in req.specifier))
+    if req.marker:
+        text += f"; {req.marker}"
+    return text
+
+
+def normalize_requirements(requirements: Iterable[str]) -> List[str]:
+    return sorted({normalize_requirement(requirement) for requirement in requirements if requirement.strip()})
+
+
+def requirements_key(requirements: Iterable[str]) -> str:
+    """依赖集合的哈希（与依赖的书写顺序、大小写和空格无关）"""
+    source = "\n".join(normalize_requirements(requirements))
+    return hashlib.sha1(source.encode('utf-8')).hexdigest()[:12]
+
+
+def _applies(requirement: str) -> bool:
+    """依赖的环境标记（如 sys_platform == 'win32'）是否适用于当前系统"""
+    try:
+        req = Requirement(requirement)
+    except InvalidRequirement:
+        return True
+    return req.marker is None or req.marker.evaluate()
+
+
+class AutoEnvironments:
+    def __init__(self, venv_manager):
+        self._venv_manager = venv_manager
+        self._lock = threading.Lock()
+
+    def resolve(self, requirements: List[str]) -> Tuple[str, List[str]]:
+        """
+        为依赖集合选择环境
+        :return: (环境名, 尚未满足的依赖)；环境不存在时所有依赖都视为未满足，需要先调用 create
+        """
+        normalized = normalize_requirements(requirements)
+        if not normalized:
+            return 'default', []
+        name = AUTO_ENV_PREFIX + requirements_key(normalized)
+        venvs = self._venv_manager.get_venvs()
+        if name in venvs:
+            return name, self.missing_requirements(name, normalized)
+
+        # 已有的自动环境满足全部依赖时直接共用（依赖最少的优先）
+        candidates = sorted(
+            (venv_name for venv_name, info in venvs.items() if info.get('auto')),
+            key=lambda venv_name: len(venvs[venv_name].get('requirements', [])),
+        )
+        for venv_name in candidates:
+            if not self.missing_requirements(venv_name, normalized):
+                return venv_name, []
+        return name, [requirement for requirement in normalized if _applies(requirement)]
+
+    def missing_requirements(self, venv_name: str, requirements: List[str]) -> List[str]:
+        """环境中尚未满足的依赖（不适用于当前系统的依赖不计入）"""
+        applicable = [requirement for requirement in requirements if _applies(requirement)]
+        if not applicable:
+            return []
+        result = self._venv_manager.check_dependencies(venv_name, applicable)
+        if not result.get('success'):
+            return applicable
+        return [status['requirement'] for status in result['dependencies_status'] if status['status'] != '已安装']
+
+    def create(self, venv_name: str, requirements: List[str]) -> Dict[str, Any]:
+        """从模板创建自动环境并记录其依赖集合（环境已存在时直接返回成功）"""
+        with self._lock:
+            if venv_name in self._venv_manager.get_venvs():
+                return {"success": True, "name": venv_name, "created": False}
+            result = self._venv_manager.clone_venv_from_template(venv_name)
+            if not result['success']:
+                return result
+            venv_info = self._venv_manager.venvs_config['venvs'][venv_name]
+            venv_info['auto'] = True
+            venv_info['requirements'] = normalize_requirements(requirements)
+            self._venv_manager._save_config(self._venv_manager.venvs_config)
+            return {"success": True, "name": venv_name, "created": True}
+
+    def ensure(self, requirements: List[str], output=sys.stderr) -> Dict[str, Any]:
+        """
+        同步地准备好依赖集合对应的环境（供命令行使用，pip 输出写到 output）
+        :return: {"success": True, "name": 环境名} 或 {"success": False, "error": 错误信息}
+        """
+        venv_name, missing = self.resolve(requirements)
+        if venv_name not in self._venv_manager.get_venvs():
+            result = self.create(venv_name, requirements)
+            if not result['success']:
+                return result
+        if not missing:
+            return {"success": True, "name": venv_name}
+        plan = self._venv_manager.package_plan(venv_name, 'install', missing)
+        if not plan:
+            return {"success": False, "error": f"无法为环境 {venv_name} 构建安装命令。"}
+        for attempt, commands in enumerate(plan):
+            if all(subprocess.run(command, stdout=output, stderr=output).returncode == 0 for command in commands):
+                self._venv_manager.record_package_operation(venv_name, 'install', missing,
+                                                            {"success": True, "attempt": attempt})
+                return {"success": True, "name": venv_name}
+        self._venv_manager.record_package_operation(venv_name, 'install', missing, {"success": False})
+        return {"success": False, "error": f"在环境 {venv_name} 中安装依赖失败: {' '.join(missing)}"}
+
+    def list_environments(self, assignments: Dict[str, str]) -> List[Dict[str, Any]]:
+        """
+        所有自动环境及其依赖集合和使用它的脚本
+        :param assignments: 脚本ID -> 该脚本使用的环境名
+        """
+        environments = []
+        for venv_name, info in self._venv_manager.get_venvs().items():
+            if not info.get('auto'):
+                continue
+            environments.append({
+                "name": venv_name,
+                "path": info['path'],
+                "requirements": info.get('requirements', []),
+                "scripts": sorted(script_id for script_id, name in assignments.items() if name == venv_name),
+            })
+        return environments
+
+    def remove_unused(self, used_venvs: Iterable[str]) -> List[str]:
+        """删除没有脚本使用的自动环境，返回被删除的环境名"""
+        used = set(used_venvs)
+        removed = []
+        for venv_name, info in list(self._venv_manager.get_venvs().items()):
+            if info.get('auto') and venv_name not in used:
+                if self._venv_manager.delete_venv(venv_name).get('success'):
+                    removed.append(venv_name)
+        return removed
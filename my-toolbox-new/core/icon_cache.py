@@ -0,0 +1,206 @@
+"""
+图标缓存 - 按内容哈希缓存图标的 base64 数据（可选缩放为卡片尺寸的缩略图）
+内存中为按字节预算淘汰的 LRU，磁盘上保存已编码的结果，重复渲染无需再读文件和编码；
+磁盘缓存同样有大小上限，超出时按最近使用时间（文件修改时间）删除最久未使用的结果
+"""
+import base64
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# 卡片图标显示为 32px，64px 用于高分屏；请求的尺寸会向上取整到其中之一
+THUMBNAIL_SIZES = (32, 64)
+
+# 内存缓存的字节预算（按 data URL 字符串长度计）
+MEMORY_BUDGET_BYTES = 16 * 1024 * 1024
+
+# 磁盘缓存的大小上限，图标修改或更换主题后旧的结果会按此淘汰
+DISK_BUDGET_BYTES = 64 * 1024 * 1024
+
+# 可以用 Pillow 缩放的格式（SVG 为矢量图，直接返回原文件）
+_RASTER_MIME_TYPES = {'image/png', 'image/jpeg', 'image/gif', 'image/x-icon'}
+
+
+class IconThumbnailCache:
+    def __init__(self, cache_dir: Path, memory_budget: int = MEMORY_BUDGET_BYTES,
+                 disk_budget: int = DISK_BUDGET_BYTES):
+        self._cache_dir = Path(cache_dir)
+        self._memory_budget = memory_budget
+        self._disk_budget = disk_budget
+        # 磁盘缓存的总字节数，首次写入时扫描目录得出，之后按写入累加
+        self._disk_bytes: Optional[int] = None
+        # (内容哈希, 尺寸) -> data URL，按最近使用排序
+        self._memory: "OrderedDict[Tuple[str, int], str]" = OrderedDict()
+        self._memory_bytes = 0
+        # 文件路径 -> (mtime, 大小, 内容哈希)；stat 未变化时无需重新读取文件计算哈希
+        self._digests: Dict[str, Tuple[int, int, str]] = {}
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "encodes": 0}
+
+    def get_data_url(self, icon_file: Path, mime_type: str, size: Optional[int] = None) -> str:
+        """
+        返回图标的 data URL。
+        :param size: 显示尺寸（像素），为 None 时返回原图；未安装 Pillow 时总是返回原图
+        """
+        size_key = self._normalize_size(size, mime_type)
+        path_key = str(icon_file)
+        stat = os.stat(path_key)
+
+        content = None
+        with self._lock:
+            known = self._digests.get(path_key)
+        if known is not None and known[0] == stat.st_mtime_ns and known[1] == stat.st_size:
+            digest = known[2]
+        else:
+            with open(path_key, 'rb') as f:
+                content = f.read()
+            digest = hashlib.sha1(content).hexdigest()
+            with self._lock:
+                self._digests[path_key] = (stat.st_mtime_ns, stat.st_size, digest)
+
+        key = (digest, size_key)
+        with self._lock:
+            data_url = self._memory.get(key)
+            if data_url is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return data_url
+
+        disk_file = self._cache_dir / f"{digest}_{size_key}.txt"
+        data_url = self._read_disk(disk_file)
+        if data_url is not None:
+            with self._lock:
+                self.stats["disk_hits"] += 1
+            self._touch(disk_file)
+        else:
+            if content is None:
+                with open(path_key, 'rb') as f:
+                    content = f.read()
+            image_bytes, result_mime = self._make_thumbnail(content, mime_type, size_key)
+            data_url = f"data:{result_mime};base64,{base64.b64encode(image_bytes).decode('ascii')}"
+            self._write_disk(disk_file, data_url)
+            with self._lock:
+                self.stats["encodes"] += 1
+
+        self._remember(key, data_url)
+        return data_url
+
+    def prune_disk(self, max_bytes: Optional[int] = None) -> int:
+        """从最久未使用的开始删除磁盘缓存，直到不超过 max_bytes（默认为磁盘上限），返回删除的文件数"""
+        limit = self._disk_budget if max_bytes is None else max_bytes
+        entries = []
+        try:
+            for entry in self._cache_dir.iterdir():
+                if entry.suffix in ('.txt', '.tmp'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry))
+        except OSError:
+            pass
+        entries.sort()
+        total = sum(size for _mtime, size, _entry in entries)
+        removed = 0
+        for _mtime, size, entry in entries:
+            if total <= limit:
+                break
+            try:
+                entry.unlink()
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        with self._lock:
+            self._disk_bytes = total
+        return removed
+
+    def clear_memory(self):
+        """清空内存缓存（磁盘缓存保留）"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+
+    @staticmethod
+    def _normalize_size(size: Optional[int], mime_type: str) -> int:
+        """把请求的尺寸映射到预设的缩略图尺寸，0 表示原图"""
+        if not size or Image is None or mime_type not in _RASTER_MIME_TYPES:
+            return 0
+        for candidate in THUMBNAIL_SIZES:
+            if size <= candidate:
+                return candidate
+        return THUMBNAIL_SIZES[-1]
+
+    @staticmethod
+    def _make_thumbnail(content: bytes, mime_type: str, size: int) -> Tuple[bytes, str]:
+        """缩放为不超过 size×size 的 PNG；原图已足够小或无法处理时返回原文件内容"""
+        if not size:
+            return content, mime_type
+        try:
+            with Image.open(io.BytesIO(content)) as image:
+                if max(image.size) <= size:
+                    return content, mime_type
+                image.seek(0)  # GIF 等多帧格式只取第一帧
+                thumbnail = image.convert('RGBA')
+                thumbnail.thumbnail((size, size))
+                output = io.BytesIO()
+                thumbnail.save(output, format='PNG', optimize=True)
+                return output.getvalue(), 'image/png'
+        except Exception as e:
+            print(f"生成图标缩略图失败，使用原图: {e}")
+            return content, mime_type
+
+    def _remember(self, key: Tuple[str, int], data_url: str):
+        """放入内存 LRU，超出字节预算时淘汰最久未使用的条目"""
+        cost = len(data_url)
+        if cost > self._memory_budget:
+            return
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= len(previous)
+            self._memory[key] = data_url
+            self._memory_bytes += cost
+            while self._memory_bytes > self._memory_budget:
+                _old_key, old_value = self._memory.popitem(last=False)
+                self._memory_bytes -= len(old_value)
+
+    @staticmethod
+    def _read_disk(disk_file: Path) -> Optional[str]:
+        try:
+            with open(disk_file, 'r', encoding='ascii') as f:
+                return f.read()
+        except (OSError, UnicodeDecodeError):
+            return None
+
+    def _write_disk(self, disk_file: Path, data_url: str):
+        """先写临时文件再替换，避免并发请求读到写了一半的缓存"""
+        try:
+            self._cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_file = disk_file.with_name(f"{disk_file.name}.{threading.get_ident()}.tmp")
+            with open(tmp_file, 'w', encoding='ascii') as f:
+                f.write(data_url)
+            os.replace(tmp_file, disk_file)
+        except OSError as e:
+            print(f"保存图标缓存时出错: {e}")
+            return
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += len(data_url)
+            over_budget = self._disk_bytes is None or self._disk_bytes > self._disk_budget
+        if over_budget:
+            self.prune_disk()
+
+    @staticmethod
+    def _touch(disk_file: Path):
+        """标记为最近使用，淘汰时较晚删除"""
+        try:
+            os.utime(disk_file)
+        except OSError:
+            pass
@@ -3,9 +3,14 @@
 """
 import json
 import os
+import threading
 from pathlib import Path
 import shutil
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
+
+# 支持的图标扩展名，顺序即优先级
+ICON_EXTENSIONS = ['.ico', '.png', '.jpg', '.jpeg', '.gif', '.svg']
+_EXTENSION_RANK = {ext: rank for rank, ext in enumerate(ICON_EXTENSIONS)}
 
 
 class IconManager:
@@ -22,28 +27,70 @@ class IconManager:
         self.default_icon_path = self.icons_dir / "icon-mo.ico"
         self.error_icon_path = self.icons_dir / "debug.ico"
 
+        # 文件夹路径 -> (文件夹 mtime, 查找结果)。文件夹内增删/重命名文件都会改变其 mtime，
+        # 因此 mtime 不变时可直接复用上次的结果，只需一次 stat
+        self._folder_cache: Dict[str, Tuple[int, Optional[str]]] = {}
+        self._cache_lock = threading.Lock()
+        # 默认图标路径，首次使用时检查是否存在
+        self._default_icon: Optional[str] = None
+
     def find_icon_in_folder(self, folder_path: Path) -> Optional[Path]:
         """
         在文件夹中查找图标文件，优先查找名为icon的文件
         """
-        if not folder_path.exists():
+        folder_key = str(folder_path)
+        try:
+            folder_mtime = os.stat(folder_key).st_mtime_ns
+        except OSError:
             return None
-            
-        # 首先查找名为icon的图标文件
-        for ext in ['.ico', '.png', '.jpg', '.jpeg', '.gif', '.svg']:
-            icon_file = folder_path / f"icon{ext}"
-            if icon_file.exists():
-                return icon_file
-        
-        # 如果没有找到名为icon的文件，则查找其他图标文件
-        for ext in ['.ico', '.png', '.jpg', '.jpeg', '.gif', '.svg']:
-            for icon_file in folder_path.glob(f"*{ext}"):
-                # 跳过临时文件或隐藏文件
-                if icon_file.name.startswith('.'):
-                    continue
-                return icon_file
-        
-        return None
+
+        with self._cache_lock:
+            cached = self._folder_cache.get(folder_key)
+        if cached is not None and cached[0] == folder_mtime:
+            return Path(cached[1]) if cached[1] else None
+
+        icon_path = self._scan_folder_for_icon(folder_key)
+        with self._cache_lock:
+            self._folder_cache[folder_key] = (folder_mtime, icon_path)
+        return Path(icon_path) if icon_path else None
+
+    def _scan_folder_for_icon(self, folder_key: str) -> Optional[str]:
+        """
+        一次 scandir 遍历文件夹，按优先级选出图标：
+        先是名为 icon 的文件（按扩展名优先级），其次是其他图标文件（按扩展名优先级、再按文件名）
+        """
+        best_rank = None
+        best_path = None
+        for name, path, ext_rank in self._iter_icon_files(folder_key):
+            rank = (os.path.splitext(name)[0] != 'icon', ext_rank, name)
+            if best_rank is None or rank < best_rank:
+                best_rank = rank
+                best_path = path
+        return best_path
+
+    @staticmethod
+    def _iter_icon_files(folder_key: str):
+        """一次 scandir 列出文件夹中的图标文件，产出 (文件名, 路径, 扩展名优先级)"""
+        try:
+            with os.scandir(folder_key) as entries:
+                for entry in entries:
+                    name = entry.name
+                    # 跳过临时文件或隐藏文件
+                    if name.startswith('.'):
+                        continue
+                    ext_rank = _EXTENSION_RANK.get(os.path.splitext(name)[1].lower())
+                    if ext_rank is None:
+                        continue
+                    # d_type 已随目录项返回，is_file 通常不需要额外的系统调用
+                    if entry.is_file():
+                        yield name, entry.path, ext_rank
+        except OSError:
+            return
+
+    def invalidate_folder(self, folder_path: Path):
+        """作废某个文件夹的图标缓存"""
+        with self._cache_lock:
+            self._folder_cache.pop(str(folder_path), None)
 
     def get_script_icon(self, script_folder_path: Path) -> str:
         """
@@ -60,11 +107,13 @@ class IconManager:
             return str(icon_path)
         else:
             # 如果没有找到图标，返回默认图标
-            if self.default_icon_path.exists():
-                return str(self.default_icon_path)
-            else:
-                # 如果连默认图标都不存在，则返回空字符串
-                return ""
+            return self._get_default_icon()
+
+    def _get_default_icon(self) -> str:
+        """默认图标路径（只检查一次是否存在），不存在时返回空字符串"""
+        if self._default_icon is None:
+            self._default_icon = str(self.default_icon_path) if self.default_icon_path.exists() else ""
+        return self._default_icon
 
     def set_custom_icon(self, script_folder_path: Path, icon_path: str) -> Dict[str, Any]:
         """
@@ -90,6 +139,7 @@ class IconManager:
             
             # 复制新图标到脚本文件夹
             shutil.copy2(icon_path, new_icon_path)
+            self.invalidate_folder(script_folder_path)
             
             return {
                 "success": True,
@@ -106,31 +156,20 @@ class IconManager:
         """
         获取脚本文件夹中所有可用的图标文件
         """
-        icons = []
-        script_folder_path = Path(script_folder_path) if isinstance(script_folder_path, str) else script_folder_path
-        
-        for ext in ['.ico', '.png', '.jpg', '.jpeg', '.gif', '.svg']:
-            for icon_file in script_folder_path.glob(f"*{ext}"):
-                if not icon_file.name.startswith('.'):
-                    icons.append(str(icon_file))
-        
+        files = list(self._iter_icon_files(str(script_folder_path)))
+
         # 按名称排序，但将icon命名的文件放在前面
-        icons.sort(key=lambda x: (not Path(x).name.startswith('icon'), Path(x).name))
-        
-        return icons
+        files.sort(key=lambda item: (not item[0].startswith('icon'), item[0]))
+
+        return [path for _name, path, _rank in files]
 
     def get_default_icons(self) -> List[str]:
         """
         获取系统默认图标库
         """
-        icons = []
-        
-        for ext in ['.ico', '.png', '.jpg', '.jpeg', '.gif', '.svg']:
-            for icon_file in self.icons_dir.glob(f"*{ext}"):
-                if not icon_file.name.startswith('.'):
-                    icons.append(str(icon_file))
-        
-        return icons
+        # 与原来按扩展名逐个 glob 的结果顺序一致：先按扩展名优先级分组
+        files = sorted(self._iter_icon_files(str(self.icons_dir)), key=lambda item: (item[2], item[0]))
+        return [path for _name, path, _rank in files]
     
     def get_error_icon_path(self) -> str:
         """
@@ -0,0 +1,199 @@
+"""
+解释器池 - 为每个虚拟环境的 Python 预先启动若干空闲的解释器进程（可选功能，默认关闭）
+运行脚本时取出一个已完成启动的进程，通过标准输入告诉它要运行的脚本，省去解释器启动的时间。
+每个进程只运行一次脚本，取出后立即在后台补充新的进程。
+"""
+import json
+import subprocess
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Any, List, Optional
+from core.process_supervisor import ProcessSupervisor, SupervisedProcess
+
+# 预热进程运行的引导脚本
+WORKER_SCRIPT = Path(__file__).parent / "warm_worker.py"
+
+# 每个 Python 保留的空闲进程数
+DEFAULT_POOL_SIZE = 1
+MAX_POOL_SIZE = 8
+
+# 取出进程后延迟多久（秒）补充新的进程
+REFILL_DELAY = 0.2
+
+
+class WarmWorker:
+    """一个预热的解释器进程；取出前的输出先缓存，取出后转给运行的任务"""
+    def __init__(self, pool: 'InterpreterPool', python: str):
+        self.python = python
+        self.created_at = time.time()
+        self.process: Optional[SupervisedProcess] = None
+        self._pool = pool
+        self._on_line: Optional[Callable[[str], None]] = None
+        self._on_exit: Optional[Callable] = None
+        self._throttle: Optional[Callable[[], Awaitable]] = None
+        self._on_eof: Optional[Callable[[SupervisedProcess], None]] = None
+        self._early_lines: List[str] = []
+        # 取出前进程就已结束时记录的 (退出码, 异常)
+        self._exit_result = None
+
+    @property
+    def is_alive(self) -> bool:
+        return self._exit_result is None and (self.process is None or self.process.poll() is None)
+
+    def run(self, script: str, args: list, on_line: Callable[[str], None], on_exit: Callable,
+            throttle: Optional[Callable[[], Awaitable]] = None,
+            on_eof: Optional[Callable[[SupervisedProcess], None]] = None) -> SupervisedProcess:
+        """让该进程运行脚本，回调的含义与 ProcessSupervisor.spawn 相同"""
+        supervisor = self._pool.supervisor
+        # 在事件循环中按顺序执行：先接上回调，再发送运行请求
+        supervisor.call_soon(self._attach, on_line, on_exit, throttle, on_eof)
+        request = json.dumps({"script": script, "args": list(args)}, ensure_ascii=False) + "\n"
+        self.process.send_input(request.encode('utf-8'))
+        # 发出请求后再补充新进程，避免启动新进程（fork）推迟这次运行
+        self._pool._schedule_refill(self.python)
+        return self.process
+
+    def _attach(self, on_line, on_exit, throttle, on_eof):
+        self._on_line = on_line
+        self._on_exit = on_exit
+        self._throttle = throttle
+        self._on_eof = on_eof
+        for line in self._early_lines:
+            on_line(line)
+        self._early_lines = []
+        if self._exit_result is not None:
+            self._pool.supervisor.submit(self._notify_exit(*self._exit_result))
+
+    def _handle_line(self, line: str):
+        if self._on_line is None:
+            self._early_lines.append(line)
+        else:
+            self._on_line(line)
+
+    async def _handle_throttle(self):
+        if self._throttle is not None:
+            await self._throttle()
+
+    def _handle_eof(self, process: SupervisedProcess):
+        if self._on_eof is not None:
+            self._on_eof(process)
+
+    async def _handle_exit(self, return_code: Optional[int], error: Optional[Exception]):
+        if self._on_exit is None:
+            # 空闲时退出（启动失败或池已关闭）
+            self._exit_result = (return_code, error)
+            self._pool._discard(self)
+            return
+        await self._notify_exit(return_code, error)
+
+    async def _notify_exit(self, return_code, error):
+        result = self._on_exit(return_code, error)
+        if result is not None:
+            await result
+
+
+class InterpreterPool:
+    def __init__(self, supervisor: ProcessSupervisor, enabled: bool = False, size: int = DEFAULT_POOL_SIZE):
+        """
+        :param enabled: 是否启用；关闭时 acquire 总是返回 None
+        :param size: 每个 Python 保留的空闲进程数
+        """
+        self.supervisor = supervisor
+        self.enabled = enabled
+        self.size = max(1, min(int(size), MAX_POOL_SIZE))
+        self._lock = threading.Lock()
+        # Python 路径 -> 空闲进程
+        self._idle: Dict[str, deque] = {}
+        self._closed = False
+        self._stats = {"hits": 0, "misses": 0, "started": 0}
+
+    def configure(self, enabled: Optional[bool] = None, size: Optional[int] = None):
+        """调整开关和大小；关闭时结束所有空闲进程"""
+        with self._lock:
+            if enabled is not None:
+                self.enabled = bool(enabled)
+            if size is not None:
+                self.size = max(1, min(int(size), MAX_POOL_SIZE))
+            pythons = list(self._idle)
+        if self.enabled:
+            for python in pythons:
+                self.prewarm(python)
+        else:
+            self._stop_idle()
+
+    def prewarm(self, python: str):
+        """为指定 Python 补足空闲进程"""
+        with self._lock:
+            if not self.enabled or self._closed:
+                return
+            missing = self.size - len(self._idle.get(python, ()))
+        workers = []
+        for _ in range(max(0, missing)):
+            worker = WarmWorker(self, python)
+            worker.process = self.supervisor.spawn(
+                [python, '-X', 'utf8', '-u', str(WORKER_SCRIPT)],
+                on_line=worker._handle_line,
+                on_exit=worker._handle_exit,
+                throttle=worker._handle_throttle,
+                on_eof=worker._handle_eof,
+                stdin=subprocess.PIPE,
+            )
+            workers.append(worker)
+        with self._lock:
+            self._idle.setdefault(python, deque()).extend(workers)
+            self._stats["started"] += len(workers)
+
+    def acquire(self, python: str) -> Optional[WarmWorker]:
+        """
+        取出一个空闲进程（运行脚本后在后台补充），没有可用进程时返回 None，调用方照常冷启动
+        """
+        if not self.enabled:
+            return None
+        worker = None
+        with self._lock:
+            idle = self._idle.get(python)
+            while idle:
+                candidate = idle.popleft()
+                if candidate.is_alive:
+                    worker = candidate
+                    break
+            self._stats["hits" if worker else "misses"] += 1
+        if worker is None:
+            self.prewarm(python)
+        return worker
+
+    def _schedule_refill(self, python: str):
+        """稍后补充空闲进程，让刚开始运行的脚本先占用 CPU"""
+        self.supervisor.call_soon(self.supervisor.loop.call_later, REFILL_DELAY, self.prewarm, python)
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "size": self.size,
+                "idle": {python: len(idle) for python, idle in self._idle.items()},
+                **self._stats,
+            }
+
+    def shutdown(self):
+        """停止补充并结束所有空闲进程"""
+        with self._lock:
+            self._closed = True
+        self._stop_idle()
+
+    def _stop_idle(self):
+        with self._lock:
+            workers = [worker for idle in self._idle.values() for worker in idle]
+            self._idle.clear()
+        for worker in workers:
+            if worker.process is not None:
+                # 关闭标准输入后引导脚本直接退出
+                worker.process.send_input(b"", close=True)
+
+    def _discard(self, worker: WarmWorker):
+        with self._lock:
+            idle = self._idle.get(worker.python)
+            if idle and worker in idle:
+                idle.remove(worker)
@@ -0,0 +1,135 @@
+"""
+任务调度器 - 位于 ProcessRunner 之前，限制同时运行的脚本数量
+任务按优先级排队（同优先级先进先出），受全局并发上限和单个脚本的并发上限约束，排队中的任务可以取消
+"""
+import heapq
+import itertools
+import os
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+from core.process_runner import ProcessRunner, ScriptJob, JOB_QUEUED
+
+# 优先级名称 -> 数值（越小越先运行）
+PRIORITIES = {'high': 0, 'normal': 1, 'low': 2}
+DEFAULT_PRIORITY = 'normal'
+
+
+def default_max_concurrent() -> int:
+    """默认的全局并发上限：CPU 核数（至少 2）"""
+    return max(2, os.cpu_count() or 1)
+
+
+class JobScheduler:
+    def __init__(self, runner: ProcessRunner, max_concurrent: Optional[int] = None,
+                 per_script_limit: Optional[int] = None, script_limits: Optional[Dict[str, int]] = None):
+        """
+        :param max_concurrent: 同时运行的任务总数上限，默认为 CPU 核数
+        :param per_script_limit: 同一脚本同时运行的任务数上限，None 表示不限制
+        :param script_limits: 个别脚本的并发上限 {脚本ID: 上限}，优先于 per_script_limit
+        """
+        self._runner = runner
+        self.max_concurrent = max_concurrent or default_max_concurrent()
+        self.per_script_limit = per_script_limit
+        self.script_limits: Dict[str, int] = dict(script_limits or {})
+
+        self._lock = threading.RLock()
+        # (优先级, 序号, 任务)；序号保证同优先级先进先出
+        self._queue: List[Tuple[int, int, ScriptJob]] = []
+        self._sequence = itertools.count()
+        self._running: Dict[str, ScriptJob] = {}
+        runner.add_finish_listener(self._on_job_finished)
+
+    def configure(self, max_concurrent: Optional[int] = None, per_script_limit: Optional[int] = None,
+                  script_limits: Optional[Dict[str, int]] = None):
+        """调整并发上限（放宽后立即启动可以运行的排队任务）"""
+        with self._lock:
+            if max_concurrent is not None:
+                self.max_concurrent = max(1, int(max_concurrent))
+            if per_script_limit is not None:
+                self.per_script_limit = int(per_script_limit) if per_script_limit > 0 else None
+            if script_limits is not None:
+                self.script_limits = {script_id: int(limit) for script_id, limit in script_limits.items()}
+        self._dispatch()
+
+    def submit(self, command: list, window, script_id: Optional[str] = None, name: Optional[str] = None,
+               priority: str = DEFAULT_PRIORITY, cache_key: Optional[str] = None) -> ScriptJob:
+        """提交一个任务：有空闲名额时立即启动，否则进入队列"""
+        if priority not in PRIORITIES:
+            raise ValueError(f"未知的优先级: {priority}")
+        job = self._runner.create_job(command, window, script_id, name, PRIORITIES[priority], cache_key)
+        with self._lock:
+            heapq.heappush(self._queue, (job.priority, next(self._sequence), job))
+        self._runner.push_job_status(job)
+        self._dispatch()
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        """取消排队中的任务，任务已启动或不存在时返回 False"""
+        with self._lock:
+            job = self._runner.get_job(job_id)
+            if job is None or job.status != JOB_QUEUED:
+                return False
+            # 已被 _dispatch 取出、正等待 start_job 的任务状态仍为排队中，只有确实从队列中移除的任务才能取消
+            remaining = [item for item in self._queue if item[2] is not job]
+            if len(remaining) == len(self._queue):
+                return False
+            self._queue = remaining
+            heapq.heapify(self._queue)
+        return self._runner.cancel_job(job)
+
+    def queue_positions(self) -> Dict[str, int]:
+        """排队中的任务ID -> 在队列中的位置（从 1 开始）"""
+        with self._lock:
+            ordered = sorted(self._queue, key=lambda item: item[:2])
+        return {job.job_id: index for index, (_p, _s, job) in enumerate(ordered, start=1)}
+
+    def status(self) -> Dict[str, Any]:
+        """调度器当前的配置和队列状态"""
+        with self._lock:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "per_script_limit": self.per_script_limit,
+                "script_limits": dict(self.script_limits),
+                "running": len(self._running),
+                "queued": len(self._queue),
+            }
+
+    def _script_limit(self, script_id: Optional[str]) -> Optional[int]:
+        if script_id is not None and script_id in self.script_limits:
+            return self.script_limits[script_id]
+        return self.per_script_limit
+
+    def _dispatch(self):
+        """按优先级启动可以运行的排队任务；受单脚本上限阻塞的任务不会挡住后面其他脚本的任务"""
+        to_start = []
+        with self._lock:
+            if not self._queue or len(self._running) >= self.max_concurrent:
+                return
+            running_per_script: Dict[Optional[str], int] = {}
+            for job in self._running.values():
+                running_per_script[job.script_id] = running_per_script.get(job.script_id, 0) + 1
+
+            remaining = []
+            for item in sorted(self._queue, key=lambda entry: entry[:2]):
+                job = item[2]
+                limit = self._script_limit(job.script_id)
+                script_running = running_per_script.get(job.script_id, 0)
+                if (len(self._running) + len(to_start) < self.max_concurrent
+                        and (limit is None or script_running < limit)):
+                    to_start.append(job)
+                    running_per_script[job.script_id] = script_running + 1
+                else:
+                    remaining.append(item)
+            self._queue = remaining
+            heapq.heapify(self._queue)
+            for job in to_start:
+                self._running[job.job_id] = job
+
+        for job in to_start:
+            self._runner.start_job(job)
+
+    def _on_job_finished(self, job: ScriptJob):
+        with self._lock:
+            was_running = self._running.pop(job.job_id, None) is not None
+        if was_running:
+            self._dispatch()
@@ -0,0 +1,129 @@
+"""
+元数据缓存 - 将 main.py 解析出的元数据持久化到磁盘，避免重复解析未变更的脚本
+"""
+import copy
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Any, Optional, Callable
+
+# 缓存文件格式版本，元数据提取规则变化时递增以使旧缓存整体失效
+# 2: 改用只解析 get_metadata 的快速提取
+CACHE_VERSION = 2
+
+# 区分“未命中”与“命中但元数据为 None（文件中没有 get_metadata）”
+MISS = object()
+
+
+class MetadataCache:
+    def __init__(self, cache_file: Path):
+        self._cache_file = Path(cache_file)
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self):
+        """从磁盘加载缓存，文件损坏或版本不符时从空缓存开始"""
+        if not self._cache_file.exists():
+            return
+        try:
+            with open(self._cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == CACHE_VERSION:
+                self._entries = data.get('entries', {})
+        except (json.JSONDecodeError, OSError, AttributeError) as e:
+            print(f"加载元数据缓存时出错，将重新建立缓存: {e}")
+            self._entries = {}
+
+    def save(self):
+        """仅在缓存有变化时写回磁盘（先写临时文件再替换，防止写入中断导致文件损坏）"""
+        if not self._dirty:
+            return
+        try:
+            self._cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self._cache_file.with_suffix('.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({'version': CACHE_VERSION, 'entries': self._entries}, f, ensure_ascii=False)
+            os.replace(tmp_file, self._cache_file)
+            self._dirty = False
+        except OSError as e:
+            print(f"保存元数据缓存时出错: {e}")
+
+    def reset_stats(self):
+        """重置命中/未命中计数"""
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_extract(self, file_path: Path, extract_func: Callable[[Path], Optional[Dict[str, Any]]]):
+        """
+        返回文件的元数据：命中缓存时直接返回副本，否则调用 extract_func 解析并写入缓存。
+        失效判定：mtime 与大小均未变则视为命中；任一变化时再比较内容哈希，
+        哈希相同（例如仅 touch 过）仍视为命中，只刷新记录的 stat 信息。
+        """
+        result = self.lookup(file_path)
+        if result is not MISS:
+            return result
+        metadata = extract_func(file_path)
+        self.store(file_path, metadata)
+        return copy.deepcopy(metadata)
+
+    def lookup(self, file_path: Path):
+        """查询缓存，未命中时返回 MISS"""
+        key = str(file_path)
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            self.misses += 1
+            return MISS
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+                self.hits += 1
+                return copy.deepcopy(entry['metadata'])
+            if self._hash_file(file_path) == entry['sha1']:
+                entry['mtime_ns'] = stat.st_mtime_ns
+                entry['size'] = stat.st_size
+                self._dirty = True
+                self.hits += 1
+                return copy.deepcopy(entry['metadata'])
+
+        self.misses += 1
+        return MISS
+
+    def store(self, file_path: Path, metadata: Optional[Dict[str, Any]]):
+        """记录文件当前的 stat、内容哈希和解析结果"""
+        try:
+            stat = os.stat(file_path)
+            sha1 = self._hash_file(file_path)
+        except OSError:
+            return
+        self._entries[str(file_path)] = {
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'sha1': sha1,
+            'metadata': copy.deepcopy(metadata),
+        }
+        self._dirty = True
+
+    def invalidate(self, file_path: Path):
+        """移除单个文件的缓存条目"""
+        if self._entries.pop(str(file_path), None) is not None:
+            self._dirty = True
+
+    def prune(self, live_paths):
+        """移除不在 live_paths 中的条目（对应脚本已被删除或重命名）"""
+        live_keys = {str(p) for p in live_paths}
+        stale_keys = [key for key in self._entries if key not in live_keys]
+        for key in stale_keys:
+            del self._entries[key]
+        if stale_keys:
+            self._dirty = True
+
+    @staticmethod
+    def _hash_file(file_path: Path) -> str:
+        with open(file_path, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
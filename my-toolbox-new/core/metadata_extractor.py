@@ -0,0 +1,171 @@
+"""
+元数据提取器 - 从脚本 main.py 中安全地提取 get_metadata() 的返回值
+这些函数均为模块级函数，以便在进程池中并行调用
+"""
+import ast
+import io
+import os
+import re
+import textwrap
+import tokenize
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Tuple
+
+
+# 定位 get_metadata 定义行（允许缩进，以覆盖 ast.walk 能找到的嵌套定义）
+_GET_METADATA_DEF = re.compile(r'^([ \t]*)def[ \t]+get_metadata[ \t]*\(', re.MULTILINE)
+
+# 快速路径无法给出确定结果时的标记，调用方应退回完整 AST 解析
+_UNSURE = object()
+
+
+def extract_metadata(file_path) -> Optional[Dict[str, Any]]:
+    """使用AST安全地从脚本文件中提取元数据"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        source = f.read()
+    return _extract_from_module(source, file_path)
+
+
+def extract_metadata_fast(file_path) -> Optional[Dict[str, Any]]:
+    """
+    快速提取元数据：只切出 get_metadata 函数的源码并解析这一小段，
+    不对整个模块做 AST 解析。无法确定结果时退回 extract_metadata 的完整解析。
+    注意：与 extract_metadata 不同，模块其他部分的语法错误不会被发现（get_metadata 本身可解析时仍返回元数据），
+    这类脚本照常出现在列表中，错误在运行时报告。对整个模块调用 compile() 检查的开销与完整解析相当，
+    会抵消快速路径的收益，因此不做检查。
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        source = f.read()
+    function_source = _slice_get_metadata(source)
+    if function_source is not _UNSURE:
+        try:
+            tree = ast.parse(function_source)
+        except SyntaxError:
+            tree = None
+        if tree is not None and len(tree.body) == 1 and _is_get_metadata(tree.body[0]):
+            return _metadata_from_function(tree.body[0])
+    return _extract_from_module(source, file_path)
+
+
+def _extract_from_module(source: str, file_path) -> Optional[Dict[str, Any]]:
+    tree = ast.parse(source, filename=str(file_path))
+
+    for node in ast.walk(tree):
+        if _is_get_metadata(node):
+            return _metadata_from_function(node)
+    return None
+
+
+def _is_get_metadata(node) -> bool:
+    return isinstance(node, ast.FunctionDef) and node.name == 'get_metadata'
+
+
+def _metadata_from_function(node: ast.FunctionDef) -> Optional[Dict[str, Any]]:
+    """从 get_metadata 函数节点中读取第一个 return 的字面量字典"""
+    for sub_node in node.body:
+        if isinstance(sub_node, ast.Return):
+            # 安全地评估返回值
+            try:
+                metadata = ast.literal_eval(sub_node.value)
+                if isinstance(metadata, dict):
+                    # 确保关键字段存在
+                    metadata.setdefault('description', '暂无描述')
+                    metadata.setdefault('parameters', [])
+                    metadata.setdefault('dependencies', [])
+                    return metadata
+            except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+                # 如果返回值不是一个字面量字典，则无法安全解析
+                return None
+    return None
+
+
+def _slice_get_metadata(source: str):
+    """
+    用正则定位唯一的 get_metadata 定义，再用 tokenize 从定义行开始读到函数体结束，
+    返回（去除公共缩进后的）函数源码。出现多个候选、可能位于多行字符串中、
+    或分词失败时返回 _UNSURE。
+    """
+    matches = _GET_METADATA_DEF.finditer(source)
+    match = next(matches, None)
+    if match is None or next(matches, None) is not None:
+        return _UNSURE
+
+    # 定义行之前若有未闭合的三引号，这个 "def" 可能只是字符串内容
+    prefix = source[:match.start()]
+    if prefix.count('"""') % 2 or prefix.count("'''") % 2:
+        return _UNSURE
+
+    tail = source[match.start():]
+    end_row = None
+    depth = 0
+    header_done = False
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(tail).readline):
+            if not header_done:
+                if token.type == tokenize.NEWLINE:
+                    header_done = True
+                continue
+            if token.type in (tokenize.NL, tokenize.COMMENT):
+                continue
+            if token.type == tokenize.INDENT:
+                depth += 1
+                continue
+            if token.type == tokenize.DEDENT:
+                depth -= 1
+                if depth <= 0:
+                    end_row = token.start[0]
+                    break
+                continue
+            if depth == 0:
+                # 单行函数（def get_metadata(): return {...}）在头部的 NEWLINE 处结束
+                end_row = token.start[0]
+                break
+        else:
+            end_row = None
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        return _UNSURE
+
+    lines = tail.splitlines(keepends=True)
+    function_lines = lines if end_row is None else lines[:end_row - 1]
+    function_source = ''.join(function_lines)
+    if match.group(1):
+        function_source = textwrap.dedent(function_source)
+    return function_source
+
+
+def _extract_metadata_safely(file_path: str) -> Tuple[bool, Any]:
+    """进程池任务：异常不能跨进程抛出打断整批任务，因此包装为 (是否成功, 结果或错误信息)"""
+    try:
+        return True, extract_metadata_fast(file_path)
+    except Exception as e:
+        return False, str(e)
+
+
+def extract_metadata_batch(file_paths: List[Path], max_workers: Optional[int] = None,
+                           executor: str = 'process') -> List[Tuple[bool, Any]]:
+    """
+    并行提取多个文件的元数据，结果顺序与 file_paths 一致。
+    :param max_workers: 工作进程/线程数，默认为 CPU 核数
+    :param executor: 'process' 使用进程池（解析为 CPU 密集型，可绕开 GIL），'thread' 使用线程池
+    """
+    paths = [str(p) for p in file_paths]
+    if not paths:
+        return []
+
+    workers = max_workers or os.cpu_count() or 1
+    workers = min(workers, len(paths))
+    if workers <= 1:
+        return [_extract_metadata_safely(p) for p in paths]
+
+    # 每个工作者分到若干块，降低进程间通信的开销
+    chunksize = max(1, len(paths) // (workers * 4))
+    pool_class = ProcessPoolExecutor if executor == 'process' else ThreadPoolExecutor
+    try:
+        with pool_class(max_workers=workers) as pool:
+            # map 按提交顺序返回结果，保证合并结果确定且有序
+            return list(pool.map(_extract_metadata_safely, paths, chunksize=chunksize))
+    except (OSError, RuntimeError) as e:
+        # 某些环境（如受限沙箱）无法创建进程池，退回串行
+        print(f"并行解析脚本元数据失败，改为串行解析: {e}")
+        return [_extract_metadata_safely(p) for p in paths]
@@ -0,0 +1,188 @@
+"""
+输出批处理器 - 把子进程的逐行输出合并为按时间窗口和大小上限切分的帧（行列表），每帧只调用一次前端
+合并和计时在进程监管器的事件循环中进行，发送在监管器的共享线程池中执行，批处理器本身不占用线程
+"""
+import asyncio
+import threading
+import time
+from typing import Callable, Dict, Any, List, Tuple
+from core.output_store import utf8_size
+from core.process_supervisor import ProcessSupervisor
+
+# 一帧最多累积的时间（秒）和字节数（按 UTF-8 编码计算）
+FRAME_INTERVAL = 0.05
+FRAME_MAX_BYTES = 64 * 1024
+
+# 尚未发送的输出超过该字节数时，读取方暂停（前端处理不过来时让子进程随管道一起放慢）
+MAX_PENDING_BYTES = 1024 * 1024
+
+
+class OutputBatcher:
+    def __init__(self, send: Callable[[List[str]], None], supervisor: ProcessSupervisor,
+                 interval: float = FRAME_INTERVAL, max_frame_bytes: int = FRAME_MAX_BYTES,
+                 max_pending_bytes: int = MAX_PENDING_BYTES):
+        """
+        :param send: 发送一帧的函数（在线程池中调用，同一批处理器的帧按顺序发送），
+                     抛出异常时视为前端已关闭，后续输出被丢弃
+        """
+        self._send = send
+        self._supervisor = supervisor
+        self._interval = interval
+        self._max_frame_bytes = max_frame_bytes
+        self._max_pending_bytes = max(max_pending_bytes, max_frame_bytes)
+
+        self._lock = threading.Lock()
+        self._pending: List[str] = []
+        # 与 _pending 一一对应的每段字节数
+        self._pending_sizes: List[int] = []
+        self._pending_bytes = 0
+        self._first_pending_at = 0.0
+        self._closed = False
+        self._failed = False
+        # 以下事件只在事件循环中使用
+        self._wakeup = asyncio.Event()
+        self._writable = asyncio.Event()
+        self._finished = asyncio.Event()
+        self._finished_flag = threading.Event()
+
+        self._started_at = time.monotonic()
+        self._frames = 0
+        self._lines = 0
+        self._bytes = 0
+        self._backpressure_waits = 0
+        self._max_send_ms = 0.0
+
+        supervisor.submit(self._flush_loop())
+
+    def write(self, text: str):
+        """追加一行输出（可在任意线程中调用，不阻塞）"""
+        size = utf8_size(text)
+        with self._lock:
+            if self._closed or self._failed:
+                return
+            if not self._pending:
+                self._first_pending_at = time.monotonic()
+            self._pending.append(text)
+            self._pending_sizes.append(size)
+            self._pending_bytes += size
+            self._lines += 1
+            notify = len(self._pending) == 1 or self._pending_bytes >= self._max_frame_bytes
+        if notify:
+            self._supervisor.call_soon(self._wakeup.set)
+
+    async def wait_writable(self):
+        """待发送的数据过多时等待批处理器把它们发出（在事件循环中由读取方 await）"""
+        if not self._backpressure_wait_needed():
+            return
+        self._backpressure_waits += 1
+        while self._backpressure_wait_needed():
+            self._writable.clear()
+            await self._writable.wait()
+
+    async def aclose(self):
+        """发送剩余输出并结束（在事件循环中 await）"""
+        self._mark_closed()
+        self._wakeup.set()
+        self._writable.set()
+        await self._finished.wait()
+
+    def close(self, timeout: float = 5.0):
+        """发送剩余输出并结束（在事件循环以外的线程中调用）"""
+        self._mark_closed()
+        self._supervisor.call_soon(self._wakeup.set)
+        self._supervisor.call_soon(self._writable.set)
+        self._finished_flag.wait(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """累计的帧数/行数以及每秒速率"""
+        with self._lock:
+            elapsed = max(time.monotonic() - self._started_at, 1e-9)
+            return {
+                "frames": self._frames,
+                "lines": self._lines,
+                "bytes": self._bytes,
+                "frames_per_sec": self._frames / elapsed,
+                "lines_per_sec": self._lines / elapsed,
+                "pending_bytes": self._pending_bytes,
+                "backpressure_waits": self._backpressure_waits,
+                "max_send_ms": self._max_send_ms,
+            }
+
+    def _mark_closed(self):
+        with self._lock:
+            self._closed = True
+
+    def _backpressure_wait_needed(self) -> bool:
+        with self._lock:
+            return not self._closed and not self._failed and self._pending_bytes > self._max_pending_bytes
+
+    async def _flush_loop(self):
+        try:
+            while True:
+                with self._lock:
+                    has_pending = bool(self._pending)
+                    closed = self._closed
+                    deadline = self._first_pending_at + self._interval
+                if not has_pending:
+                    if closed:
+                        return
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+
+                # 等到时间窗口结束或攒够一帧
+                while True:
+                    with self._lock:
+                        ready = self._closed or self._pending_bytes >= self._max_frame_bytes
+                    remaining = deadline - time.monotonic()
+                    if ready or remaining <= 0:
+                        break
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+
+                with self._lock:
+                    frame, frame_bytes = self._take_frame()
+                # 唤醒因背压暂停的读取方
+                self._writable.set()
+
+                started = time.perf_counter()
+                try:
+                    await self._supervisor.run_blocking(self._send, frame)
+                except Exception as e:
+                    print(f"转发输出到前端时出错 (可能窗口已关闭): {e}")
+                    with self._lock:
+                        self._failed = True
+                        self._pending = []
+                        self._pending_sizes = []
+                        self._pending_bytes = 0
+                    self._writable.set()
+                    return
+                send_ms = (time.perf_counter() - started) * 1000
+                with self._lock:
+                    self._frames += 1
+                    self._bytes += frame_bytes
+                    self._max_send_ms = max(self._max_send_ms, send_ms)
+        finally:
+            self._finished.set()
+            self._finished_flag.set()
+
+    def _take_frame(self) -> Tuple[List[str], int]:
+        """取出不超过一帧大小的待发送输出（至少一段，超长的单行不拆分），返回 (帧, 字节数)"""
+        count = 0
+        size = 0
+        for text_size in self._pending_sizes:
+            if count and size + text_size > self._max_frame_bytes:
+                break
+            count += 1
+            size += text_size
+        frame = self._pending[:count]
+        del self._pending[:count]
+        del self._pending_sizes[:count]
+        self._pending_bytes -= size
+        if self._pending:
+            # 剩余部分立即组成下一帧
+            self._first_pending_at = time.monotonic() - self._interval
+        return frame, size
@@ -0,0 +1,81 @@
+"""
+任务输出存储 - 在后端为每个任务保存最近的输出行（环形缓冲区），供终端按行号分页读取
+行号从 0 开始连续编号，超出行数或字节预算（按 UTF-8 编码计算）时丢弃最早的行，内存占用不随输出总量增长
+"""
+import itertools
+import threading
+from collections import deque
+from typing import Dict, Any
+
+# 每个任务默认保留的行数和字节数
+DEFAULT_MAX_LINES = 20000
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024
+
+# 单次读取的最大行数
+MAX_PAGE_LINES = 5000
+
+
+def utf8_size(text: str) -> int:
+    """文本按 UTF-8 编码后的字节数（中文等非 ASCII 字符占多个字节）"""
+    return len(text.encode('utf-8', 'surrogatepass'))
+
+
+class JobOutputBuffer:
+    def __init__(self, max_lines: int = DEFAULT_MAX_LINES, max_bytes: int = DEFAULT_MAX_BYTES):
+        self._max_lines = max(1, max_lines)
+        self._max_bytes = max(1, max_bytes)
+        self._lines = deque()
+        # 与 _lines 一一对应的每行字节数，丢弃时不必重新编码
+        self._sizes = deque()
+        self._bytes = 0
+        # 缓冲区中第一行的行号（即已丢弃的行数）
+        self._first_line = 0
+        self._lock = threading.Lock()
+
+    def append(self, line: str):
+        size = utf8_size(line)
+        with self._lock:
+            self._lines.append(line)
+            self._sizes.append(size)
+            self._bytes += size
+            while len(self._lines) > self._max_lines or (self._bytes > self._max_bytes and len(self._lines) > 1):
+                self._lines.popleft()
+                self._bytes -= self._sizes.popleft()
+                self._first_line += 1
+
+    @property
+    def total_lines(self) -> int:
+        """到目前为止写入的总行数（含已丢弃的行）"""
+        with self._lock:
+            return self._first_line + len(self._lines)
+
+    def get_range(self, start: int, count: int) -> Dict[str, Any]:
+        """
+        读取从行号 start 开始的至多 count 行。start 早于缓冲区中最早的行时从最早的行开始。
+        :return: {"start": 实际起始行号, "lines": [...], "first_line": 最早可读行号, "total_lines": 总行数}
+        """
+        count = max(0, min(count, MAX_PAGE_LINES))
+        with self._lock:
+            total = self._first_line + len(self._lines)
+            start = min(max(start, self._first_line), total)
+            offset = start - self._first_line
+            # deque 不支持切片，islice 在 C 层跳过前面的行
+            lines = list(itertools.islice(self._lines, offset, offset + count))
+            return {"start": start, "lines": lines, "first_line": self._first_line, "total_lines": total}
+
+    def tail(self, count: int) -> Dict[str, Any]:
+        """读取最后 count 行"""
+        with self._lock:
+            total = self._first_line + len(self._lines)
+        return self.get_range(max(0, total - count), count)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "lines": len(self._lines),
+                "bytes": self._bytes,
+                "first_line": self._first_line,
+                "total_lines": self._first_line + len(self._lines),
+                "max_lines": self._max_lines,
+                "max_bytes": self._max_bytes,
+            }
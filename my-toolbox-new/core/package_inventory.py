@@ -0,0 +1,125 @@
+"""
+已安装包清单 - 直接读取虚拟环境 site-packages 中的 *.dist-info / *.egg-info 元数据，代替启动 pip list 子进程
+
+结果按虚拟环境缓存，以 site-packages 目录的修改时间判断是否失效：
+pip 安装、升级或卸载包时会新建或删除其中的 dist-info 目录，目录的修改时间随之变化。
+"""
+import os
+import threading
+from email.parser import HeaderParser
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from packaging.utils import canonicalize_name
+
+
+def site_packages_dirs(venv_path: Path) -> List[Path]:
+    """虚拟环境中存在的 site-packages 目录（Linux/macOS 为 lib/pythonX.Y/site-packages，Windows 为 Lib/site-packages）"""
+    venv_path = Path(venv_path)
+    candidates = list(venv_path.glob('lib/python*/site-packages')) + [venv_path / 'Lib' / 'site-packages']
+    dirs = []
+    seen = set()
+    for candidate in candidates:
+        try:
+            resolved = candidate.resolve()
+        except OSError:
+            continue
+        if resolved not in seen and candidate.is_dir():
+            seen.add(resolved)
+            dirs.append(candidate)
+    return dirs
+
+
+def _read_name_version(metadata_file: Path) -> Optional[Tuple[str, str]]:
+    """读取 METADATA / PKG-INFO 头部的 Name 和 Version 字段（只解析到第一个空行之前的头部）"""
+    try:
+        with open(metadata_file, 'r', encoding='utf-8', errors='replace') as f:
+            header_lines = []
+            for line in f:
+                if not line.strip():
+                    break
+                header_lines.append(line)
+    except OSError:
+        return None
+    headers = HeaderParser().parsestr(''.join(header_lines))
+    name, version = headers.get('Name'), headers.get('Version')
+    if not name or not version:
+        return None
+    return name.strip(), version.strip()
+
+
+def _read_entry(entry: os.DirEntry) -> Optional[Tuple[str, str]]:
+    if entry.name.endswith('.dist-info'):
+        return _read_name_version(Path(entry.path) / 'METADATA')
+    if entry.name.endswith('.egg-info'):
+        # egg-info 可能是目录（含 PKG-INFO），也可能是单个文件
+        path = Path(entry.path)
+        return _read_name_version(path / 'PKG-INFO' if entry.is_dir() else path)
+    return None
+
+
+def scan_site_packages(site_packages: Path) -> List[Dict[str, str]]:
+    """扫描一个 site-packages 目录，返回与 pip list --format=json 相同格式的 [{"name", "version"}]"""
+    packages = {}
+    try:
+        with os.scandir(site_packages) as entries:
+            for entry in entries:
+                result = _read_entry(entry)
+                if result is None:
+                    continue
+                name, version = result
+                # 同一个包残留多个版本的元数据时，与 pip 一样以先找到的为准
+                packages.setdefault(canonicalize_name(name), {"name": name, "version": version})
+    except OSError:
+        pass
+    return sorted(packages.values(), key=lambda package: package["name"].lower())
+
+
+class PackageInventory:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 虚拟环境路径 -> (各 site-packages 目录的修改时间, 包列表)
+        self._cache: Dict[str, Tuple[Tuple, List[Dict[str, str]]]] = {}
+        self.stats = {"hits": 0, "scans": 0}
+
+    def get_packages(self, venv_path: Path) -> Optional[List[Dict[str, str]]]:
+        """
+        虚拟环境中已安装的包 [{"name", "version"}]，site-packages 未变化时直接返回缓存
+        找不到 site-packages 目录时返回 None（调用方可改用 pip list）
+        """
+        dirs = site_packages_dirs(venv_path)
+        if not dirs:
+            return None
+        stamp = tuple((str(path), path.stat().st_mtime_ns) for path in dirs)
+        key = str(Path(venv_path))
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] == stamp:
+                self.stats["hits"] += 1
+                return list(cached[1])
+
+        packages = {}
+        for path in dirs:
+            for package in scan_site_packages(path):
+                packages.setdefault(canonicalize_name(package["name"]), package)
+        result = sorted(packages.values(), key=lambda package: package["name"].lower())
+        with self._lock:
+            self._cache[key] = (stamp, result)
+            self.stats["scans"] += 1
+        return list(result)
+
+    def get_versions(self, venv_path: Path) -> Optional[Dict[str, str]]:
+        """规范化包名（PEP 503）-> 已安装版本"""
+        packages = self.get_packages(venv_path)
+        if packages is None:
+            return None
+        return {canonicalize_name(package["name"]): package["version"] for package in packages}
+
+    def invalidate(self, venv_path: Optional[Path] = None):
+        """丢弃指定虚拟环境（默认全部）的缓存"""
+        with self._lock:
+            if venv_path is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(str(Path(venv_path)), None)
+
@@ -0,0 +1,158 @@
+"""
+包操作队列 - 每个虚拟环境同一时间只运行一个 pip 进程，不同虚拟环境之间并行
+
+排队期间提交到同一虚拟环境的同类操作（安装或卸载）合并为一次 pip 调用，
+pip 只解析一次依赖，也不会有多个 pip 进程同时写入同一个 site-packages。
+"""
+import asyncio
+import threading
+from typing import Awaitable, Callable, Dict, Any, List, Optional
+from core.output_batcher import OutputBatcher
+from core.process_supervisor import ProcessSupervisor
+
+
+class PackageOperation:
+    def __init__(self, venv_name: str, operation: str, packages: List[str],
+                 on_done: Optional[Callable[[Dict[str, Any]], Optional[Awaitable]]]):
+        self.venv_name = venv_name
+        self.operation = operation
+        self.packages = packages
+        self.on_done = on_done
+
+
+class PackageOperationQueue:
+    def __init__(self, supervisor: ProcessSupervisor,
+                 build_plan: Callable[[str, str, List[str]], Optional[List[List[List[str]]]]],
+                 open_output: Callable[[str], OutputBatcher],
+                 on_finished: Optional[Callable[[str, str, List[str], Dict[str, Any]], None]] = None):
+        """
+        :param build_plan: (虚拟环境名, 'install' 或 'uninstall', 包列表) -> 执行方案，环境不存在时返回 None。
+                           方案是若干次尝试，每次尝试是按顺序执行的命令列表；
+                           某个命令失败时改用下一次尝试，第一次全部成功的尝试即完成操作
+        :param open_output: 为一次 pip 调用创建输出批处理器（参数为虚拟环境名）
+        :param on_finished: 每次合并的调用完成后在线程池中调用 (虚拟环境名, 操作, 包列表, 结果)，可以阻塞
+        """
+        self._supervisor = supervisor
+        self._build_plan = build_plan
+        self._open_output = open_output
+        self._on_finished = on_finished
+        self._lock = threading.Lock()
+        # 虚拟环境名 -> 等待执行的操作
+        self._pending: Dict[str, List[PackageOperation]] = {}
+        # 正在执行 pip 的虚拟环境 -> 本次调用包含的包
+        self._running: Dict[str, List[str]] = {}
+
+    def submit(self, venv_name: str, operation: str, packages: List[str],
+               on_done: Optional[Callable[[Dict[str, Any]], Optional[Awaitable]]] = None):
+        """
+        提交一个包操作（不阻塞）
+        :param operation: 'install' 或 'uninstall'
+        :param on_done: 完成后在事件循环中调用，参数为 {"success", "error"?, "packages"}，可以是协程函数
+        """
+        if operation not in ('install', 'uninstall'):
+            raise ValueError(f"未知的包操作: {operation}")
+        op = PackageOperation(venv_name, operation, list(packages), on_done)
+        with self._lock:
+            self._pending.setdefault(venv_name, []).append(op)
+            start = venv_name not in self._running
+            if start:
+                self._running[venv_name] = []
+        if start:
+            self._supervisor.submit(self._drain(venv_name))
+
+    def status(self) -> Dict[str, Any]:
+        """每个虚拟环境正在执行和排队中的包"""
+        with self._lock:
+            return {
+                "running": {venv: list(packages) for venv, packages in self._running.items()},
+                "pending": {venv: [pkg for op in ops for pkg in op.packages]
+                            for venv, ops in self._pending.items() if ops},
+            }
+
+    def _take_batch(self, venv_name: str) -> List[PackageOperation]:
+        """取出队首开始连续的同类操作；队列为空时结束该虚拟环境的执行"""
+        with self._lock:
+            pending = self._pending.get(venv_name)
+            if not pending:
+                self._pending.pop(venv_name, None)
+                self._running.pop(venv_name, None)
+                return []
+            operation = pending[0].operation
+            count = 1
+            while count < len(pending) and pending[count].operation == operation:
+                count += 1
+            batch = pending[:count]
+            del pending[:count]
+            self._running[venv_name] = self._merge_packages(batch)
+            return batch
+
+    @staticmethod
+    def _merge_packages(batch: List[PackageOperation]) -> List[str]:
+        return list(dict.fromkeys(pkg for op in batch for pkg in op.packages))
+
+    async def _drain(self, venv_name: str):
+        while True:
+            batch = self._take_batch(venv_name)
+            if not batch:
+                return
+            operation = batch[0].operation
+            packages = self._merge_packages(batch)
+            try:
+                result = await self._run_batch(venv_name, operation, packages)
+            except Exception as e:
+                result = {"success": False, "error": str(e)}
+            if self._on_finished is not None:
+                try:
+                    await self._supervisor.run_blocking(self._on_finished, venv_name, operation, packages, result)
+                except Exception as e:
+                    print(f"包操作完成后的处理出错: {e}")
+            for op in batch:
+                await self._notify(op, {**result, "packages": op.packages})
+
+    async def _run_batch(self, venv_name: str, operation: str, packages: List[str]) -> Dict[str, Any]:
+        plan = self._build_plan(venv_name, operation, packages)
+        if not plan:
+            return {"success": False, "error": "无法构建命令，可能是环境不存在。"}
+
+        output = self._open_output(venv_name)
+        output.write(f"[{venv_name}] pip {operation} {' '.join(packages)}")
+        result = {"success": False, "error": "没有可执行的命令。"}
+        try:
+            for attempt, commands in enumerate(plan):
+                if attempt:
+                    output.write(f"[{venv_name}] 改用第 {attempt + 1} 种方式...")
+                for command in commands:
+                    result = await self._run_command(command, output)
+                    if not result["success"]:
+                        break
+                if result["success"]:
+                    return {**result, "attempt": attempt}
+            return result
+        finally:
+            await output.aclose()
+
+    async def _run_command(self, command: List[str], output: OutputBatcher) -> Dict[str, Any]:
+        exited = asyncio.get_running_loop().create_future()
+
+        def on_exit(return_code, error):
+            if not exited.done():
+                exited.set_result((return_code, error))
+
+        self._supervisor.spawn(command, on_line=output.write, on_exit=on_exit, throttle=output.wait_writable)
+        return_code, error = await exited
+        if error is not None:
+            return {"success": False, "error": str(error)}
+        if return_code != 0:
+            return {"success": False, "error": f"pip 退出码 {return_code}"}
+        return {"success": True}
+
+    @staticmethod
+    async def _notify(op: PackageOperation, result: Dict[str, Any]):
+        if op.on_done is None:
+            return
+        try:
+            outcome = op.on_done(result)
+            if outcome is not None:
+                await outcome
+        except Exception as e:
+            print(f"包操作完成回调出错: {e}")
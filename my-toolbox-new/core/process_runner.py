@@ -1,83 +1,384 @@
 """
 进程运行器 - 负责执行脚本并管理输出
+每次运行是一个带 ID 的任务（ScriptJob），多个任务可以同时运行，各自拥有输出通道、状态和退出码
+子进程由进程监管器的事件循环统一启动和读取，任务数量不影响线程数量
 """
-import subprocess
-import sys
+import itertools
+import json
 import shlex
+import subprocess
 import threading
+import time
 from pathlib import Path
+from typing import Callable, Dict, Any, List, Optional
+from core.output_batcher import OutputBatcher
+from core.process_supervisor import ProcessSupervisor, SupervisedProcess
+from core.interpreter_pool import InterpreterPool
+from core.resource_monitor import ResourceMonitor, ResourceUsage
+from core.output_store import JobOutputBuffer, DEFAULT_MAX_LINES, DEFAULT_MAX_BYTES
+from core.run_log import RunLogStore, RunLogWriter
+
+# 任务表中最多保留的已结束任务数，超出时丢弃最早结束的任务
+MAX_FINISHED_JOBS = 50
+
+# 启用结果缓存的任务最多记录的输出行数，超出时这次结果不缓存
+MAX_CAPTURED_LINES = 20000
+
+# 任务状态
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+JOB_TERMINATED = 'terminated'
+JOB_CANCELLED = 'cancelled'
+JOB_ERROR = 'error'
+FINISHED_STATUSES = {JOB_SUCCEEDED, JOB_FAILED, JOB_TERMINATED, JOB_CANCELLED, JOB_ERROR}
+
+
+class ScriptJob:
+    """一次脚本运行：子进程、输出批处理器、状态和退出码"""
+    def __init__(self, job_id: str, command: list, script_id: Optional[str] = None, name: Optional[str] = None,
+                 priority: int = 1, output: Optional[JobOutputBuffer] = None):
+        self.job_id = job_id
+        self.command = command
+        self.script_id = script_id
+        self.name = name or (Path(command[-1]).parent.name if command else job_id)
+        self.priority = priority
+        self.status = JOB_QUEUED
+        self.exit_code: Optional[int] = None
+        self.error: Optional[str] = None
+        self.queued_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.process: Optional[SupervisedProcess] = None
+        self.output_batcher: Optional[OutputBatcher] = None
+        # 完整输出写入的压缩日志（未启用日志或创建失败时为 None）
+        self.log_writer: Optional[RunLogWriter] = None
+        self.log_id: Optional[str] = None
+        # 后端保存的最近输出，终端按行号分页读取
+        self.output = output or JobOutputBuffer()
+        # 已交给前端的行数，即下一帧第一行的行号
+        self.sent_lines = 0
+        self.terminate_requested = False
+        # 是否由解释器池中预热的进程运行，以及子进程第一行输出的时间
+        self.warm = False
+        self.first_output_at: Optional[float] = None
+        # 结果缓存：启用时记录子进程的全部输出行（不含运行器自己添加的提示行）；cached 表示由缓存回放
+        self.cache_key: Optional[str] = None
+        self.captured_lines: Optional[List[str]] = None
+        self.cached = False
+        # CPU 时间、峰值内存、读写字节数等资源统计（未启用资源统计时为 None）
+        self.resources: Optional[ResourceUsage] = None
+        self._done = threading.Event()
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待任务结束（包括输出全部转发完毕），超时返回 False"""
+        return self._done.wait(timeout)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "script_id": self.script_id,
+            "name": self.name,
+            "status": self.status,
+            "priority": self.priority,
+            "exit_code": self.exit_code,
+            "error": self.error,
+            "pid": self.process.pid if self.process else None,
+            "queued_at": self.queued_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "log_id": self.log_id,
+            "warm": self.warm,
+            "cached": self.cached,
+            "first_output_ms": self.first_output_ms,
+            "resources": self.resources.to_dict() if self.resources else None,
+        }
+
+    @property
+    def first_output_ms(self) -> Optional[float]:
+        """从启动到子进程第一行输出的毫秒数"""
+        if self.first_output_at is None or self.started_at is None:
+            return None
+        return (self.first_output_at - self.started_at) * 1000
 
 
 class ProcessRunner:
-    def __init__(self):
-        self.process = None
+    def __init__(self, output_max_lines: int = DEFAULT_MAX_LINES, output_max_bytes: int = DEFAULT_MAX_BYTES,
+                 log_store: Optional[RunLogStore] = None, supervisor: Optional[ProcessSupervisor] = None,
+                 interpreter_pool: Optional[InterpreterPool] = None,
+                 resource_monitor: Optional[ResourceMonitor] = None):
+        """
+        :param output_max_lines: 每个任务在内存中保留的输出行数
+        :param output_max_bytes: 每个任务在内存中保留的输出字节数
+        :param log_store: 运行日志存储，每个任务的完整输出写入其中；None 表示不写日志
+        :param supervisor: 启动和监管子进程的进程监管器，None 时自行创建
+        :param interpreter_pool: 预热解释器池，启用时优先用其中的进程运行脚本
+        :param resource_monitor: 资源统计，None 表示不统计
+        """
+        self.supervisor = supervisor or ProcessSupervisor()
+        self.interpreter_pool = interpreter_pool
+        self.resource_monitor = resource_monitor
+        self.output_max_lines = output_max_lines
+        self.output_max_bytes = output_max_bytes
+        self.log_store = log_store
         self.window = None
+        # 任务ID -> 任务，按启动顺序排列
+        self.jobs: Dict[str, ScriptJob] = {}
+        self._lock = threading.Lock()
+        self._job_ids = itertools.count(1)
+        # 任务结束（包括取消）时的回调，调度器据此启动排队中的任务
+        self._finish_listeners: List[Callable[[ScriptJob], None]] = []
+        # 任务启动子进程之前的回调（在启动任务的线程中调用，可以阻塞），结果缓存据此记录运行前的文件快照
+        self._start_listeners: List[Callable[[ScriptJob], None]] = []
+
+    def add_finish_listener(self, listener: Callable[[ScriptJob], None]):
+        self._finish_listeners.append(listener)
+
+    def add_start_listener(self, listener: Callable[[ScriptJob], None]):
+        self._start_listeners.append(listener)
 
-    def run_script(self, command: list, window):
-        """启动脚本子进程，并在后台线程中流式传输其输出。"""
+    def run_script(self, command: list, window, script_id: Optional[str] = None,
+                   name: Optional[str] = None) -> ScriptJob:
+        """启动脚本子进程作为一个新任务，其输出由进程监管器读取并转发。"""
+        job = self.create_job(command, window, script_id, name)
+        self.start_job(job)
+        return job
+
+    def create_job(self, command: list, window, script_id: Optional[str] = None,
+                   name: Optional[str] = None, priority: int = 1, cache_key: Optional[str] = None) -> ScriptJob:
+        """
+        登记一个排队中的任务（不启动进程）
+        :param cache_key: 结果缓存的键，设置后记录子进程的输出以便成功后缓存
+        """
         self.window = window
-        try:
-            command_display_str = ' '.join(command)
-            message = f'<span style="color:yellow;">> {command_display_str}</span><br>'
-            self.window.evaluate_js(f'updateTerminal({repr(message)})')
+        job = ScriptJob(f"job-{next(self._job_ids)}", command, script_id, name, priority,
+                        JobOutputBuffer(self.output_max_lines, self.output_max_bytes))
+        job.cache_key = cache_key
+        with self._lock:
+            self.jobs[job.job_id] = job
+            self._prune_finished_jobs()
+        return job
+
+    def start_job(self, job: ScriptJob):
+        """启动排队中的任务的子进程（不阻塞），输出由进程监管器读取并转发"""
+        self.start_output(job)
+        if job.cache_key is not None:
+            job.captured_lines = []
+        for listener in self._start_listeners:
+            try:
+                listener(job)
+            except Exception as e:
+                print(f"处理任务启动回调时出错: {e}")
+
+        command = job.command
+        command_display_str = ' '.join(command)
+        self._emit(job, f'<span style="color:yellow;">> {command_display_str}</span>')
 
+        on_line = lambda line: self._on_process_line(job, line)
+        on_exit = lambda return_code, error: self._on_process_exit(job, return_code, error)
+        # 前端处理不过来时监管器暂停读取，子进程随之在管道写满后放慢
+        throttle = job.output_batcher.wait_writable
+        # 进程回收后 /proc 中就没有它了，在输出读完时做最后一次资源采样
+        on_eof = (lambda process: self.resource_monitor.final_sample(job.resources)) if self.resource_monitor else None
+        worker = None
+        if self.interpreter_pool is not None and len(command) >= 2:
+            worker = self.interpreter_pool.acquire(command[0])
+        if worker is not None:
+            job.warm = True
+            job.process = worker.run(command[1], command[2:], on_line, on_exit, throttle, on_eof)
+        else:
             args = [command[0], '-X', 'utf8', '-u'] + command[1:]
+            # 脚本不从标准输入读取数据，与预热进程一致地接到空设备
+            job.process = self.supervisor.spawn(args, on_line=on_line, on_exit=on_exit, throttle=throttle,
+                                                on_eof=on_eof, stdin=subprocess.DEVNULL)
+        if self.resource_monitor is not None:
+            # 预热进程在取出前已经运行了一段时间，以取出时的累计值为零点
+            job.resources = self.resource_monitor.track(job.process, baseline=job.warm)
 
-            self.process = subprocess.Popen(
-                args,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0,
-                bufsize=1,
-                text=True,
-                encoding='utf-8'
-            )
-
-            # 创建并启动一个线程来读取输出
-            thread = threading.Thread(target=self._stream_output, args=(self.process,))
-            thread.daemon = True  # 设置为守护线程，主程序退出时它也会退出
-            thread.start()
-
-            return self.process
-
-        except Exception as e:
-            error_message = f"<br><span style='color:red;'>无法执行脚本: {str(e)}</span><br>"
-            self.window.evaluate_js(f'updateTerminal({repr(error_message)})')
-            return None
+    def start_output(self, job: ScriptJob):
+        """把任务标记为运行中，并准备输出批处理器和运行日志"""
+        window = self.window
+        job.status = JOB_RUNNING
+        job.started_at = time.time()
+        # 每个任务的输出帧都带上任务ID和首行行号，前端据此分发到对应的输出通道
+        def send_frame(lines):
+            first_line = job.sent_lines
+            job.sent_lines += len(lines)
+            # 不转义非 ASCII 字符，帧的实际大小与批处理器按 UTF-8 计算的字节数一致
+            window.evaluate_js(f'updateTerminal({json.dumps(lines, ensure_ascii=False)}, {json.dumps(job.job_id)}, {first_line})')
+        job.output_batcher = OutputBatcher(send_frame, self.supervisor)
+        if self.log_store is not None:
+            job.log_writer = self.log_store.open_writer(job.job_id, job.script_id, job.name, job.command)
+            job.log_id = job.log_writer.log_id if job.log_writer else None
+        self.push_job_status(job)
 
-    def _stream_output(self, process):
-        """在线程中运行，读取并转发进程的输出。"""
-        while True:
-            output_str = process.stdout.readline()
-            if not output_str and process.poll() is not None:
-                break
-            if output_str and self.window:
-                try:
-                    safe_output = output_str.replace('\\', '\\\\').replace('"', '\\"')
-                    if not safe_output.endswith('<br>'):
-                        safe_output = safe_output.rstrip('\n\r') + '<br>'
-                    self.window.evaluate_js(f'updateTerminal({repr(safe_output)})')
-                except Exception as e:
-                    # 在窗口关闭后，evaluate_js会失败，此时应终止循环
-                    print(f"转发输出到前端时出错 (可能窗口已关闭): {e}")
-                    break
-        
-        return_code = process.wait()
-        if self.window:
+    def _on_process_line(self, job: ScriptJob, line: str):
+        if job.first_output_at is None:
+            job.first_output_at = time.time()
+        if job.captured_lines is not None:
+            if len(job.captured_lines) < MAX_CAPTURED_LINES:
+                job.captured_lines.append(line)
+            else:
+                # 输出过多，不再缓存这次的结果
+                job.captured_lines = None
+        self._emit(job, line)
+
+    def replay_job(self, command: list, window, lines: List[str], script_id: Optional[str] = None,
+                   name: Optional[str] = None, note: Optional[str] = None) -> ScriptJob:
+        """不启动进程，把缓存的输出作为一个已成功结束的任务回放"""
+        job = self.create_job(command, window, script_id, name)
+        job.cached = True
+        self.start_output(job)
+        self._emit(job, f'<span style="color:yellow;">> {" ".join(command)}</span>')
+        if note:
+            self._emit(job, f'<span style="color:gray;">{note}</span>')
+        job.first_output_at = time.time()
+        for line in lines:
+            self._emit(job, line)
+        job.exit_code = 0
+        self._emit(job, '<span style="color:lightgreen;">... 脚本执行成功（缓存结果） ...</span>')
+        job.output_batcher.close()
+        self._finish_job(job, JOB_SUCCEEDED)
+        return job
+
+    async def _on_process_exit(self, job: ScriptJob, return_code: Optional[int], error: Optional[Exception]):
+        """在事件循环中调用：输出最后一行状态，发送剩余输出，然后在线程池中完成收尾"""
+        if error is not None:
+            status = JOB_ERROR
+            job.error = str(error)
+            message = f"<span style='color:red;'>无法执行脚本: {str(error)}</span>"
+        else:
+            job.exit_code = return_code
             if return_code == 0:
-                message = '<br><span style="color:lightgreen;">... 脚本执行成功 ...</span><br>'
+                status = JOB_SUCCEEDED
+                message = '<span style="color:lightgreen;">... 脚本执行成功 ...</span>'
+            elif job.terminate_requested:
+                status = JOB_TERMINATED
+                message = f'<span style="color:orange;">... 脚本已被终止 (退出码: {return_code}) ...</span>'
             else:
-                message = f'<br><span style="color:red;">... 脚本执行失败 (退出码: {return_code}) ...</span><br>'
+                status = JOB_FAILED
+                message = f'<span style="color:red;">... 脚本执行失败 (退出码: {return_code}) ...</span>'
+        self._emit(job, message)
+        await job.output_batcher.aclose()
+        # 推送状态和结束回调（可能启动排队中的任务）会阻塞，不在事件循环中执行
+        await self.supervisor.run_blocking(self._finish_job, job, status)
+
+    @staticmethod
+    def _emit(job: ScriptJob, line: str):
+        """记录一行输出到任务的环形缓冲区和运行日志，并交给批处理器转发到前端"""
+        job.output.append(line)
+        if job.log_writer is not None:
+            job.log_writer.write_line(line)
+        job.output_batcher.write(line)
+
+    def _finish_job(self, job: ScriptJob, status: str):
+        """发送剩余输出，记录结束状态并通知前端和监听者"""
+        if job.output_batcher is not None:
+            job.output_batcher.close()
+        job.status = status
+        job.finished_at = time.time()
+        if job.resources is not None:
+            self.resource_monitor.finish(job.resources, job.script_id, status, job.first_output_ms)
+        if job.log_writer is not None:
+            self.log_store.close_writer(job.log_writer, status=status, exit_code=job.exit_code, error=job.error)
+        job._done.set()
+        self.push_job_status(job)
+        for listener in self._finish_listeners:
             try:
-                self.window.evaluate_js(f'updateTerminal({repr(message)})')
+                listener(job)
             except Exception as e:
-                print(f"发送最终状态到前端时出错 (可能窗口已关闭): {e}")
+                print(f"处理任务结束回调时出错: {e}")
+
+    def cancel_job(self, job: ScriptJob) -> bool:
+        """取消尚未启动的任务"""
+        if job.status != JOB_QUEUED:
+            return False
+        self._finish_job(job, JOB_CANCELLED)
+        return True
+
+    def push_job_status(self, job: ScriptJob):
+        """把任务状态变化推送给前端"""
+        if self.window:
+            try:
+                self.window.evaluate_js(f'window.onJobStatus && window.onJobStatus({json.dumps(job.to_dict())})')
+            except Exception as e:
+                print(f"发送任务状态到前端时出错 (可能窗口已关闭): {e}")
+
+    def _prune_finished_jobs(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.is_finished]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+
+    def get_job(self, job_id: str) -> Optional[ScriptJob]:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        """所有任务的状态，按启动顺序排列"""
+        with self._lock:
+            jobs = list(self.jobs.values())
+        return [job.to_dict() for job in jobs]
+
+    def terminate_job(self, job_id: str) -> bool:
+        """终止指定任务，任务不存在或已结束时返回 False"""
+        job = self.get_job(job_id)
+        if job is None or job.is_finished or job.process is None or job.process.poll() is not None:
+            return False
+        job.terminate_requested = True
+        job.process.terminate()  # 发送终止信号
+        return True
+
+    def wait_job(self, job_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """等待指定任务结束并返回其状态，任务不存在时返回 None"""
+        job = self.get_job(job_id)
+        if job is None:
+            return None
+        job.wait(timeout)
+        return job.to_dict()
+
+    def terminate_latest(self) -> bool:
+        """终止最近启动且仍在运行的任务"""
+        with self._lock:
+            running = [job for job in self.jobs.values() if job.status == JOB_RUNNING]
+        return bool(running) and self.terminate_job(running[-1].job_id)
+
+    def get_output(self, job_id: str, start: Optional[int] = None, count: int = 200) -> Optional[Dict[str, Any]]:
+        """
+        读取任务的输出行：start 为 None 时返回最后 count 行，否则返回从行号 start 开始的 count 行。
+        任务不存在时返回 None。
+        """
+        job = self.get_job(job_id)
+        if job is None:
+            return None
+        if start is None:
+            return job.output.tail(count)
+        return job.output.get_range(start, count)
+
+    def get_output_stats(self, job_id: Optional[str] = None) -> Dict[str, Any]:
+        """指定任务（默认为最近启动的任务）的输出转发统计（帧数、行数及每秒速率）"""
+        with self._lock:
+            if job_id is None:
+                job = next(reversed(self.jobs.values()), None)
+            else:
+                job = self.jobs.get(job_id)
+        if job is None or job.output_batcher is None:
+            return {}
+        stats = job.output_batcher.stats()
+        stats["buffer"] = job.output.stats()
+        return stats
 
     def shutdown(self):
-        """终止当前正在运行的进程。"""
-        if self.process and self.process.poll() is None:
-            print("正在终止后台脚本进程...")
-            self.process.terminate() # 发送终止信号
-            self.process = None
-            return True
-        return False
\ No newline at end of file
+        """终止所有正在运行的进程。"""
+        with self._lock:
+            running = [job for job in self.jobs.values() if job.status == JOB_RUNNING]
+        terminated = False
+        for job in running:
+            if self.terminate_job(job.job_id):
+                print(f"正在终止后台脚本进程 {job.job_id}...")
+                terminated = True
+        return terminated
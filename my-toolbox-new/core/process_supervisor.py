@@ -0,0 +1,285 @@
+"""
+进程监管器 - 在一个后台线程的 asyncio 事件循环中启动和监管所有子进程
+子进程的输出以非阻塞方式读取并按行分发，进程退出时回调；
+会阻塞的操作（如调用前端的 evaluate_js）交给一个小的共享线程池执行，
+因此同时运行的任务数量不再决定线程数量。
+"""
+import asyncio
+import codecs
+import inspect
+import os
+import re
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Optional, Tuple
+
+# 每次从管道读取的字节数
+READ_CHUNK_BYTES = 64 * 1024
+
+# 执行阻塞回调的线程数
+DEFAULT_WORKERS = 4
+
+# 关闭时等待子进程自行退出的秒数，超时后强制结束
+SHUTDOWN_GRACE_SECONDS = 3.0
+
+# 与文本模式的通用换行一致：\r\n、\r 和 \n 都视为换行
+_NEWLINE = re.compile(r'\r\n|\r|\n')
+
+
+class SupervisedProcess:
+    """由监管器启动的子进程的句柄，可在任意线程中查询和终止"""
+    def __init__(self, supervisor: 'ProcessSupervisor', args: list):
+        self.args = args
+        self.pid: Optional[int] = None
+        self.returncode: Optional[int] = None
+        self._supervisor = supervisor
+        self._process: Optional[asyncio.subprocess.Process] = None
+        # 进程启动前收到的终止请求和标准输入数据，启动后立即执行/写入
+        self._pending_signal: Optional[str] = None
+        self._pending_input: Optional[Tuple[bytes, bool]] = None
+        self._exited = threading.Event()
+
+    def poll(self) -> Optional[int]:
+        """与 subprocess.Popen.poll 相同：运行中返回 None，否则返回退出码"""
+        return self.returncode
+
+    def terminate(self):
+        self._supervisor.call_soon(self._signal, 'terminate')
+
+    def kill(self):
+        self._supervisor.call_soon(self._signal, 'kill')
+
+    def send_input(self, data: bytes, close: bool = True):
+        """写入子进程的标准输入（需以 stdin=subprocess.PIPE 启动），close 为 True 时随后关闭标准输入"""
+        self._supervisor.call_soon(self._write_input, data, close)
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[int]:
+        """等待进程结束（包括输出读取完毕），超时返回 None"""
+        self._exited.wait(timeout)
+        return self.returncode
+
+    def _attach(self, process: asyncio.subprocess.Process):
+        self._process = process
+        self.pid = process.pid
+        if self._pending_input:
+            self._write_input(*self._pending_input)
+        if self._pending_signal:
+            self._signal(self._pending_signal)
+
+    def _write_input(self, data: bytes, close: bool):
+        if self._process is None:
+            self._pending_input = (data, close)
+            return
+        stdin = self._process.stdin
+        if stdin is None or stdin.is_closing():
+            return
+        try:
+            stdin.write(data)
+            if close:
+                stdin.close()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _signal(self, action: str):
+        """在事件循环中向子进程发送终止/强制结束信号"""
+        if self._process is None:
+            self._pending_signal = action
+            return
+        if self._process.returncode is not None:
+            return
+        try:
+            getattr(self._process, action)()
+        except ProcessLookupError:
+            pass
+
+
+class ProcessSupervisor:
+    def __init__(self, max_workers: int = DEFAULT_WORKERS):
+        self._max_workers = max_workers
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._start_lock = threading.Lock()
+        # 事件循环中尚未结束的进程及其监管协程
+        self._processes = set()
+        self._tasks = set()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """事件循环（首次使用时启动后台线程）"""
+        if self._loop is None:
+            self._start()
+        return self._loop
+
+    def _start(self):
+        with self._start_lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(loop)
+                self._install_child_watcher(loop)
+                loop.call_soon(ready.set)
+                loop.run_forever()
+
+            self._executor = ThreadPoolExecutor(self._max_workers, thread_name_prefix="SupervisorWorker")
+            self._thread = threading.Thread(target=run, name="ProcessSupervisor", daemon=True)
+            self._thread.start()
+            ready.wait()
+            self._loop = loop
+
+    @staticmethod
+    def _install_child_watcher(loop: asyncio.AbstractEventLoop):
+        """
+        Linux 上用 pidfd 在事件循环中等待子进程退出。
+        Python 3.12 以前默认的监视器为每个子进程创建一个等待线程，3.12 起已默认使用 pidfd。
+        """
+        if sys.platform == "win32" or sys.version_info >= (3, 12) or not hasattr(os, 'pidfd_open'):
+            return
+        try:
+            os.close(os.pidfd_open(os.getpid()))
+        except OSError:
+            # 内核不支持 pidfd，保留默认的监视器
+            return
+        watcher = asyncio.PidfdChildWatcher()
+        watcher.attach_loop(loop)
+        asyncio.set_child_watcher(watcher)
+
+    def in_loop_thread(self) -> bool:
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def call_soon(self, callback: Callable, *args):
+        """在事件循环中调用 callback（可在任意线程中调用）"""
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def submit(self, coro: Awaitable):
+        """在事件循环中运行协程（可在任意线程中调用）"""
+        if self.in_loop_thread():
+            return self.loop.create_task(self._track(coro))
+        return asyncio.run_coroutine_threadsafe(self._track(coro), self.loop)
+
+    async def _track(self, coro: Awaitable):
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        try:
+            return await coro
+        finally:
+            self._tasks.discard(task)
+
+    def run_blocking(self, func: Callable, *args) -> Awaitable:
+        """在共享线程池中执行会阻塞的函数（只能在事件循环中 await）"""
+        return self.loop.run_in_executor(self._executor, func, *args)
+
+    def spawn(self, args: list, on_line: Callable[[str], None],
+              on_exit: Callable[[Optional[int], Optional[Exception]], Optional[Awaitable]],
+              throttle: Optional[Callable[[], Awaitable]] = None,
+              on_eof: Optional[Callable[[SupervisedProcess], None]] = None, **kwargs) -> SupervisedProcess:
+        """
+        启动子进程（不阻塞调用方），stdout 和 stderr 合并后按行交给 on_line
+        :param on_line: 每行输出的回调，在事件循环中调用，不能阻塞
+        :param on_exit: 进程结束且输出读完后调用 on_exit(退出码, 启动失败时的异常)，可以是协程函数
+        :param throttle: 每读一块输出后 await 的协程函数，消费方处理不过来时借此暂停读取（背压）
+        :param on_eof: 输出读完、回收进程之前在事件循环中调用 on_eof(句柄)，此时进程通常仍可在 /proc 中查询
+        :param kwargs: 传给 asyncio.create_subprocess_exec 的其他参数（如 cwd、env）
+        """
+        handle = SupervisedProcess(self, args)
+        self.submit(self._supervise(handle, on_line, on_exit, throttle, on_eof, kwargs))
+        return handle
+
+    async def run_process(self, args: list, **kwargs) -> Tuple[int, str]:
+        """在事件循环中运行子进程直到结束，返回 (退出码, 合并后的输出)"""
+        process = await asyncio.create_subprocess_exec(
+            *args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, **self._platform_kwargs(), **kwargs)
+        stdout, _ = await process.communicate()
+        return process.returncode, stdout.decode('utf-8', errors='replace')
+
+    async def _supervise(self, handle: SupervisedProcess, on_line, on_exit, throttle, on_eof, kwargs):
+        error = None
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *handle.args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                **self._platform_kwargs(), **kwargs)
+        except (OSError, ValueError) as e:
+            error = e
+        else:
+            self._processes.add(handle)
+            handle._attach(process)
+            try:
+                await self._pump(process.stdout, on_line, throttle)
+                if on_eof is not None:
+                    try:
+                        on_eof(handle)
+                    except Exception as e:
+                        print(f"处理进程输出结束回调时出错: {e}")
+                handle.returncode = await process.wait()
+            finally:
+                self._processes.discard(handle)
+        handle._exited.set()
+        try:
+            result = on_exit(handle.returncode, error)
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            print(f"处理进程结束回调时出错: {e}")
+
+    @staticmethod
+    async def _pump(stream: asyncio.StreamReader, on_line, throttle):
+        """分块读取管道并按行分发，不受单行长度限制"""
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        remainder = ''
+        # 上一块以 \r 结尾时，下一块开头的 \n 与它属于同一个换行
+        skip_newline = False
+        while True:
+            chunk = await stream.read(READ_CHUNK_BYTES)
+            text = remainder + decoder.decode(chunk, final=not chunk)
+            if skip_newline and text.startswith('\n'):
+                text = text[1:]
+            if not chunk:
+                if text:
+                    on_line(text)
+                return
+            skip_newline = text.endswith('\r')
+            lines = _NEWLINE.split(text)
+            remainder = lines.pop()
+            for line in lines:
+                try:
+                    on_line(line)
+                except Exception as e:
+                    print(f"处理进程输出时出错: {e}")
+            if throttle is not None:
+                await throttle()
+
+    @staticmethod
+    def _platform_kwargs() -> dict:
+        if sys.platform == "win32":
+            return {"creationflags": subprocess.CREATE_NO_WINDOW}
+        return {}
+
+    def shutdown(self, timeout: float = SHUTDOWN_GRACE_SECONDS):
+        """终止仍在运行的子进程（超时后强制结束），然后停止事件循环和线程池"""
+        if self._loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(timeout), self._loop).result(timeout + 2)
+        except Exception as e:
+            print(f"关闭进程监管器时出错: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=2)
+        self._executor.shutdown(wait=False)
+
+    async def _shutdown(self, timeout: float):
+        for handle in list(self._processes):
+            handle._signal('terminate')
+        pending = [task for task in self._tasks if task is not asyncio.current_task()]
+        if pending:
+            _done, pending = await asyncio.wait(pending, timeout=timeout)
+        if pending:
+            for handle in list(self._processes):
+                handle._signal('kill')
+            _done, pending = await asyncio.wait(pending, timeout=1)
+            for task in pending:
+                task.cancel()
@@ -0,0 +1,386 @@
+"""
+资源统计 - 记录每次运行（含其子进程）的 CPU 时间、峰值内存、磁盘读写字节数、耗时和内存曲线，并按脚本保存历史
+
+子进程由 asyncio 的子进程监视器回收，无法再用 os.wait4 取得 rusage，
+因此在 Linux 上定期读取 /proc（未提供 /proc 的系统在安装了可选依赖 psutil 时用 psutil），
+并在输出读完、进程被回收之前再采样一次，作为最终的数值。
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+from core.process_supervisor import ProcessSupervisor, SupervisedProcess
+
+# 采样间隔（秒）
+SAMPLE_INTERVAL = 0.5
+
+# 内存曲线最多保留的点数，超出时隔点丢弃并加倍记录间隔
+MAX_TIMELINE_POINTS = 240
+
+# 每个脚本保留的历史运行记录数
+MAX_HISTORY_PER_SCRIPT = 50
+
+# 任务结束后延迟写回历史文件的秒数，期间结束的任务合并为一次写入
+HISTORY_SAVE_DELAY = 2.0
+
+_HAS_PROC = os.path.exists('/proc/self/stat')
+_CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def _read_proc_stat(pid: int) -> Optional[Dict[str, int]]:
+    """读取 /proc/<pid>/stat 中的 CPU 时间（时钟周期）和常驻内存（页）"""
+    try:
+        with open(f'/proc/{pid}/stat', 'rb') as f:
+            data = f.read().decode('ascii', errors='replace')
+    except OSError:
+        return None
+    # 进程名在括号中，可能含空格；其后第 n 个字段对应 proc(5) 中的第 n+2 项
+    fields = data[data.rindex(')') + 2:].split()
+    return {
+        "utime": int(fields[11]),
+        "stime": int(fields[12]),
+        "cutime": int(fields[13]),
+        "cstime": int(fields[14]),
+        "rss": int(fields[21]) * _PAGE_SIZE,
+    }
+
+
+def _read_proc_io(pid: int) -> Dict[str, int]:
+    values = {}
+    try:
+        with open(f'/proc/{pid}/io', 'r') as f:
+            for line in f:
+                name, _, value = line.partition(':')
+                if name in ('read_bytes', 'write_bytes'):
+                    values[name] = int(value)
+    except OSError:
+        pass
+    return values
+
+
+def _read_proc_peak_rss(pid: int) -> int:
+    """/proc/<pid>/status 中的 VmHWM（进程自身的常驻内存峰值）"""
+    try:
+        with open(f'/proc/{pid}/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def _proc_children(pid: int) -> List[int]:
+    """进程的所有后代（依赖 /proc/<pid>/task/<tid>/children）"""
+    descendants = []
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        try:
+            tasks = os.listdir(f'/proc/{current}/task')
+        except OSError:
+            continue
+        for tid in tasks:
+            try:
+                with open(f'/proc/{current}/task/{tid}/children', 'r') as f:
+                    children = [int(child) for child in f.read().split()]
+            except OSError:
+                continue
+            descendants.extend(children)
+            stack.extend(children)
+    return descendants
+
+
+class ResourceUsage:
+    """一次运行的资源统计；数值只增不减，进程结束后保持最后一次采样的结果"""
+    def __init__(self, process: SupervisedProcess):
+        self.process = process
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.user_cpu = 0.0
+        self.system_cpu = 0.0
+        self.peak_rss = 0
+        self.read_bytes = 0
+        self.write_bytes = 0
+        self.samples = 0
+        # [(相对开始的秒数, 整个进程树的常驻内存)]
+        self.timeline: List[List[float]] = []
+        self._timeline_stride = 1
+        # 作为零点扣除的 (用户态 CPU, 内核态 CPU, 常驻内存, 读字节数, 写字节数)
+        self._baseline = (0.0, 0.0, 0, 0, 0)
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        return self.finished_at is None
+
+    def take_baseline(self):
+        """
+        以当前的累计值为零点。预热进程在取出时调用，
+        扣除它等待期间已经用掉的 CPU、IO 和解释器本身的常驻内存，只统计脚本运行的部分。
+        """
+        measured = self._measure()
+        if measured is None:
+            return
+        user_cpu, system_cpu, rss, _peak_rss, read_bytes, write_bytes = measured
+        with self._lock:
+            self._baseline = (user_cpu, system_cpu, rss, read_bytes, write_bytes)
+
+    def sample(self):
+        if not self.active:
+            return
+        measured = self._measure()
+        if measured is None:
+            return
+        user_cpu, system_cpu, rss, peak_rss, read_bytes, write_bytes = measured
+        base_user, base_system, base_rss, base_read, base_write = self._baseline
+        user_cpu = max(0.0, user_cpu - base_user)
+        system_cpu = max(0.0, system_cpu - base_system)
+        rss = max(0, rss - base_rss)
+        peak_rss = max(0, peak_rss - base_rss)
+        read_bytes = max(0, read_bytes - base_read)
+        write_bytes = max(0, write_bytes - base_write)
+        with self._lock:
+            self.user_cpu = max(self.user_cpu, user_cpu)
+            self.system_cpu = max(self.system_cpu, system_cpu)
+            self.peak_rss = max(self.peak_rss, rss, peak_rss)
+            self.read_bytes = max(self.read_bytes, read_bytes)
+            self.write_bytes = max(self.write_bytes, write_bytes)
+            if self.samples % self._timeline_stride == 0:
+                self.timeline.append([round(time.time() - self.started_at, 3), rss])
+                if len(self.timeline) > MAX_TIMELINE_POINTS:
+                    self.timeline = self.timeline[::2]
+                    self._timeline_stride *= 2
+            self.samples += 1
+
+    def _measure(self):
+        pid = self.process.pid
+        if pid is None:
+            return None
+        if _HAS_PROC:
+            return self._sample_proc(pid)
+        if psutil is not None:
+            return self._sample_psutil(pid)
+        return None
+
+    @staticmethod
+    def _sample_proc(pid: int):
+        root = _read_proc_stat(pid)
+        if root is None:
+            return None
+        # 已被回收的后代计入根进程的 cutime/cstime，仍在运行的后代单独累加
+        user = root["utime"] + root["cutime"]
+        system = root["stime"] + root["cstime"]
+        rss = root["rss"]
+        io = _read_proc_io(pid)
+        read_bytes = io.get("read_bytes", 0)
+        write_bytes = io.get("write_bytes", 0)
+        for child in _proc_children(pid):
+            stat = _read_proc_stat(child)
+            if stat is None:
+                continue
+            user += stat["utime"]
+            system += stat["stime"]
+            rss += stat["rss"]
+            child_io = _read_proc_io(child)
+            read_bytes += child_io.get("read_bytes", 0)
+            write_bytes += child_io.get("write_bytes", 0)
+        return (user / _CLOCK_TICKS, system / _CLOCK_TICKS, rss, _read_proc_peak_rss(pid),
+                read_bytes, write_bytes)
+
+    @staticmethod
+    def _sample_psutil(pid: int):
+        try:
+            root = psutil.Process(pid)
+            processes = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return None
+        user = system = rss = read_bytes = write_bytes = 0
+        for process in processes:
+            try:
+                with process.oneshot():
+                    cpu = process.cpu_times()
+                    user += cpu.user + (cpu.children_user if process is root else 0)
+                    system += cpu.system + (cpu.children_system if process is root else 0)
+                    rss += process.memory_info().rss
+                    if hasattr(process, 'io_counters'):
+                        io = process.io_counters()
+                        read_bytes += io.read_bytes
+                        write_bytes += io.write_bytes
+            except psutil.Error:
+                continue
+        return user, system, rss, 0, read_bytes, write_bytes
+
+    def finish(self):
+        with self._lock:
+            if self.finished_at is None:
+                self.finished_at = time.time()
+
+    def to_dict(self, include_timeline: bool = False) -> Dict[str, Any]:
+        with self._lock:
+            result = {
+                "wall_time": (self.finished_at or time.time()) - self.started_at,
+                "user_cpu": self.user_cpu,
+                "system_cpu": self.system_cpu,
+                "peak_rss": self.peak_rss,
+                "read_bytes": self.read_bytes,
+                "write_bytes": self.write_bytes,
+                "samples": self.samples,
+            }
+            if include_timeline:
+                result["timeline"] = list(self.timeline)
+            return result
+
+
+class ResourceMonitor:
+    def __init__(self, supervisor: ProcessSupervisor, history_file: Optional[Path] = None,
+                 interval: float = SAMPLE_INTERVAL):
+        """
+        :param history_file: 按脚本保存历史统计的 JSON 文件，None 表示不保存
+        """
+        self._supervisor = supervisor
+        self._history_file = Path(history_file) if history_file else None
+        self._interval = interval
+        self._lock = threading.Lock()
+        self._active: List[ResourceUsage] = []
+        self._sampling = False
+        self._history: Optional[Dict[str, List[Dict[str, Any]]]] = None
+        # 历史有尚未写回的记录 / 已安排了延迟写回
+        self._history_dirty = False
+        self._save_scheduled = False
+
+    @property
+    def available(self) -> bool:
+        """当前系统能否采集 CPU/内存/IO（否则只有耗时）"""
+        return _HAS_PROC or psutil is not None
+
+    def track(self, process: SupervisedProcess, baseline: bool = False) -> ResourceUsage:
+        """
+        开始统计一个进程（由同一个定时采样协程采样所有进程）
+        :param baseline: 进程在此之前已经启动（预热进程）时为 True，以当前的累计值为零点
+        """
+        usage = ResourceUsage(process)
+        if baseline and self.available:
+            usage.take_baseline()
+        with self._lock:
+            self._active.append(usage)
+            start = not self._sampling and self.available
+            self._sampling = self._sampling or start
+        if start:
+            self._supervisor.submit(self._sample_loop())
+        return usage
+
+    def final_sample(self, usage: ResourceUsage):
+        """输出读完、进程回收之前调用，记录最终的数值"""
+        usage.sample()
+
+    def finish(self, usage: ResourceUsage, script_id: Optional[str], status: str,
+               first_output_ms: Optional[float] = None):
+        """停止统计，并把结果加入该脚本的历史"""
+        usage.finish()
+        with self._lock:
+            if usage in self._active:
+                self._active.remove(usage)
+        if script_id is None or self._history_file is None:
+            return
+        record = {"finished_at": usage.finished_at, "status": status,
+                  "first_output_ms": first_output_ms, **usage.to_dict()}
+        with self._lock:
+            history = self._load_history()
+            runs = history.setdefault(script_id, [])
+            runs.append(record)
+            del runs[:-MAX_HISTORY_PER_SCRIPT]
+            self._history_dirty = True
+            schedule = not self._save_scheduled
+            self._save_scheduled = True
+        if schedule:
+            self._supervisor.call_soon(self._schedule_save)
+
+    def flush(self):
+        """立即写回尚未保存的历史记录（退出前调用）"""
+        with self._lock:
+            self._save_scheduled = False
+            if not self._history_dirty:
+                return
+            self._history_dirty = False
+            self._save_history(self._history)
+
+    def get_history(self, script_id: Optional[str] = None) -> Dict[str, Any]:
+        """脚本的历史运行统计和汇总（中位耗时、中位 CPU 时间、最大峰值内存）"""
+        with self._lock:
+            history = self._load_history()
+            scripts = [script_id] if script_id is not None else list(history)
+            result = {}
+            for sid in scripts:
+                runs = list(history.get(sid, []))
+                result[sid] = {"runs": runs, "summary": self._summarize(runs)}
+            return result
+
+    async def _sample_loop(self):
+        while True:
+            with self._lock:
+                active = list(self._active)
+                if not active:
+                    self._sampling = False
+                    return
+            # 读取 /proc 是同步文件 IO，放到线程池中执行，不阻塞事件循环
+            await self._supervisor.run_blocking(self._sample_all, active)
+            await asyncio.sleep(self._interval)
+
+    @staticmethod
+    def _sample_all(active: List[ResourceUsage]):
+        for usage in active:
+            usage.sample()
+
+    def _schedule_save(self):
+        # 用定时回调而不是协程等待，退出时不必等它到期（退出前会调用 flush）
+        self._supervisor.loop.call_later(HISTORY_SAVE_DELAY, self._supervisor.run_blocking, self.flush)
+
+    @staticmethod
+    def _summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        if not runs:
+            return {"count": 0}
+
+        def median(values):
+            values = sorted(values)
+            return values[len(values) // 2] if values else None
+
+        return {
+            "count": len(runs),
+            "median_wall_time": median([run["wall_time"] for run in runs]),
+            "median_cpu_time": median([run["user_cpu"] + run["system_cpu"] for run in runs]),
+            "max_peak_rss": max(run["peak_rss"] for run in runs),
+            "median_first_output_ms": median([run["first_output_ms"] for run in runs
+                                              if run.get("first_output_ms") is not None]),
+        }
+
+    def _load_history(self) -> Dict[str, List[Dict[str, Any]]]:
+        if self._history is None:
+            self._history = {}
+            if self._history_file is not None and self._history_file.exists():
+                try:
+                    with open(self._history_file, 'r', encoding='utf-8') as f:
+                        self._history = json.load(f)
+                except (OSError, json.JSONDecodeError) as e:
+                    print(f"读取运行统计失败: {e}")
+        return self._history
+
+    def _save_history(self, history: Dict[str, List[Dict[str, Any]]]):
+        try:
+            self._history_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self._history_file.with_suffix('.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(history, f, ensure_ascii=False)
+            os.replace(tmp_file, self._history_file)
+        except OSError as e:
+            print(f"保存运行统计失败: {e}")
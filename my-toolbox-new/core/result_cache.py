@@ -0,0 +1,308 @@
+"""
+结果缓存 - 为声明了 'cacheable': True 的脚本保存运行结果，相同输入再次运行时直接回放
+
+缓存键由以下内容的哈希组成：脚本文件夹中所有文件的内容、build_command 生成的参数、
+'file' 类型参数所指文件的内容、解释器路径以及虚拟环境中已安装包的集合。
+命中时回放保存的输出并把产物文件恢复到原位置，不启动进程。
+产物是运行期间在输出位置（'folder' 参数所指的文件夹以及 'file' 参数所在的文件夹，不含子文件夹）中新建或修改的文件。
+多个可缓存的任务同时向同一个输出位置写入时无法区分各自的产物，这些任务都不缓存。
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+from core.package_inventory import site_packages_dirs
+
+# 缓存总大小上限和最长保留天数
+MAX_TOTAL_BYTES = 500 * 1024 * 1024
+MAX_AGE_DAYS = 14
+
+# 单次运行可缓存的输出行数和产物大小，超出时不缓存
+MAX_CACHED_LINES = 20000
+MAX_ARTIFACT_BYTES = 50 * 1024 * 1024
+
+# 计算脚本文件夹哈希时跳过的目录
+_SKIPPED_DIRS = {'__pycache__', '.git', '.venv', 'venv'}
+
+
+def _hash_file(path: Path) -> str:
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def package_fingerprint(python_executable: str) -> str:
+    """虚拟环境中已安装包的指纹：site-packages 中 dist-info/egg-info 目录的名称（含版本号）"""
+    venv_root = Path(python_executable).resolve().parent.parent
+    names = []
+    for site_packages in site_packages_dirs(venv_root):
+        try:
+            with os.scandir(site_packages) as entries:
+                names.extend(entry.name for entry in entries
+                             if entry.name.endswith(('.dist-info', '.egg-info')))
+        except OSError:
+            continue
+    return hashlib.sha1('\n'.join(sorted(names)).encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, cache_dir: Path, max_total_bytes: int = MAX_TOTAL_BYTES, max_age_days: float = MAX_AGE_DAYS):
+        self._cache_dir = Path(cache_dir)
+        self._max_total_bytes = max_total_bytes
+        self._max_age_days = max_age_days
+        self._lock = threading.Lock()
+        # 文件路径 -> (修改时间, 大小, sha1)，文件未变化时不重复读取内容
+        self._digests: Dict[str, Tuple[int, int, str]] = {}
+        # 任务ID -> 任务启动时输出位置的快照，运行结束后据此找出产物
+        self._pending: Dict[str, Dict[str, Tuple[int, int]]] = {}
+        # 输出位置 -> 正在运行并写入该位置的任务ID
+        self._active_folders: Dict[str, Set[str]] = {}
+        # 运行期间与其他任务共用了输出位置的任务ID，结束时不缓存
+        self._overlapping: Set[str] = set()
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "skipped": 0}
+
+    def compute_key(self, script: Dict[str, Any], command_parts: list, python_executable: str) -> str:
+        """根据脚本内容、参数、输入文件内容和虚拟环境计算缓存键"""
+        script_folder = Path(script['file_path']).parent
+        inputs = {}
+        for param_def in script.get('parameters', []):
+            if param_def.get('type') != 'file':
+                continue
+            value = self._param_value(command_parts, param_def['name'])
+            if value:
+                inputs[param_def['name']] = self._file_digest(Path(value)) if Path(value).is_file() else None
+        key_source = {
+            "folder": self._folder_digest(script_folder),
+            "args": command_parts[1:],
+            "inputs": inputs,
+            "python": str(python_executable),
+            "packages": package_fingerprint(python_executable),
+        }
+        return hashlib.sha256(json.dumps(key_source, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """查找缓存的结果，不存在、已过期或产物缺失时返回 None"""
+        entry = self._read_entry(key)
+        if entry is None or time.time() - entry.get("created_at", 0) > self._max_age_days * 86400:
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+        entry_dir = self._entry_dir(key)
+        if not all((entry_dir / artifact["file"]).is_file() for artifact in entry.get("artifacts", [])):
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+        with self._lock:
+            self.stats["hits"] += 1
+        return entry
+
+    def restore_artifacts(self, key: str, entry: Dict[str, Any]) -> List[str]:
+        """把缓存的产物复制回原来的位置（内容相同的文件跳过），返回恢复的路径"""
+        entry_dir = self._entry_dir(key)
+        restored = []
+        for artifact in entry.get("artifacts", []):
+            target = Path(artifact["path"])
+            if target.is_file() and self._file_digest(target) == artifact["sha1"]:
+                continue
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(entry_dir / artifact["file"], target)
+            restored.append(str(target))
+        # 标记为最近使用，轮转时较晚删除
+        os.utime(entry_dir / "result.json")
+        return restored
+
+    def begin(self, job_id: str, script: Dict[str, Any], command_parts: list):
+        """任务启动时记录输出位置的文件快照（排队期间其他任务写入的文件不会被当作这次的产物）"""
+        folders = self._output_folders(script, command_parts)
+        snapshot = {}
+        for folder in folders:
+            snapshot.update(self._snapshot_folder(folder))
+        with self._lock:
+            self._pending[job_id] = snapshot
+            for folder in folders:
+                active = self._active_folders.setdefault(os.path.abspath(folder), set())
+                if active:
+                    # 同一输出位置已有任务在运行，双方的产物会互相混入
+                    self._overlapping.update(active)
+                    self._overlapping.add(job_id)
+                active.add(job_id)
+
+    def store(self, job_id: str, key: str, script: Dict[str, Any], command_parts: list, lines: List[str],
+              started_at: float) -> bool:
+        """任务运行成功后以 key 保存输出和产物；输出或产物过大、或运行期间与其他任务共用输出位置时不缓存"""
+        with self._lock:
+            before = self._pending.pop(job_id, None)
+            overlapping = self._release(job_id)
+        if before is None or overlapping or len(lines) > MAX_CACHED_LINES:
+            self._count("skipped")
+            return False
+
+        artifacts = []
+        total = 0
+        for folder in self._output_folders(script, command_parts):
+            for path, state in self._snapshot_folder(folder).items():
+                if before.get(path) != state:
+                    artifacts.append(Path(path))
+                    total += state[1]
+        if total > MAX_ARTIFACT_BYTES:
+            self._count("skipped")
+            return False
+
+        entry_dir = self._entry_dir(key)
+        tmp_dir = entry_dir.with_name(entry_dir.name + '.tmp')
+        try:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            tmp_dir.mkdir(parents=True)
+            entry_artifacts = []
+            for index, path in enumerate(artifacts):
+                file_name = f"{index}{path.suffix}"
+                shutil.copy2(path, tmp_dir / file_name)
+                entry_artifacts.append({"path": str(path), "file": file_name, "sha1": self._file_digest(path)})
+            entry = {
+                "script_id": script.get('id'),
+                "created_at": time.time(),
+                "duration": time.time() - started_at,
+                "lines": lines,
+                "artifacts": entry_artifacts,
+            }
+            with open(tmp_dir / "result.json", 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.replace(tmp_dir, entry_dir)
+        except OSError as e:
+            print(f"保存结果缓存失败: {e}")
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return False
+        self._count("stored")
+        self.evict()
+        return True
+
+    def discard(self, job_id: str):
+        """运行失败或取消时丢弃任务启动时的快照"""
+        with self._lock:
+            self._pending.pop(job_id, None)
+            self._release(job_id)
+
+    def _release(self, job_id: str) -> bool:
+        """任务结束时移出输出位置的占用记录，返回运行期间是否与其他任务共用过输出位置（需持有锁）"""
+        for folder in [folder for folder, active in self._active_folders.items() if job_id in active]:
+            active = self._active_folders[folder]
+            active.discard(job_id)
+            if not active:
+                del self._active_folders[folder]
+        if job_id in self._overlapping:
+            self._overlapping.discard(job_id)
+            return True
+        return False
+
+    def clear(self):
+        shutil.rmtree(self._cache_dir, ignore_errors=True)
+
+    def evict(self):
+        """删除超过保留天数的结果；总大小仍超出上限时从最久未使用的开始删除"""
+        if not self._cache_dir.exists():
+            return
+        entries = []
+        for entry_dir in self._cache_dir.iterdir():
+            result_file = entry_dir / "result.json"
+            if entry_dir.name.endswith('.tmp') or not result_file.is_file():
+                continue
+            size = sum(f.stat().st_size for f in entry_dir.iterdir() if f.is_file())
+            entries.append((result_file.stat().st_mtime, size, entry_dir))
+        entries.sort()
+        total = sum(size for _mtime, size, _dir in entries)
+        cutoff = time.time() - self._max_age_days * 86400
+        for mtime, size, entry_dir in entries:
+            if mtime >= cutoff and total <= self._max_total_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+
+    def get_stats(self) -> Dict[str, Any]:
+        entries = 0
+        total = 0
+        if self._cache_dir.exists():
+            for entry_dir in self._cache_dir.iterdir():
+                if (entry_dir / "result.json").is_file():
+                    entries += 1
+                    total += sum(f.stat().st_size for f in entry_dir.iterdir() if f.is_file())
+        with self._lock:
+            return {**self.stats, "entries": entries, "bytes": total}
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _entry_dir(self, key: str) -> Path:
+        return self._cache_dir / key
+
+    def _read_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._entry_dir(key) / "result.json", 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def _file_digest(self, path: Path) -> str:
+        stat = path.stat()
+        cache_key = str(path.resolve())
+        cached = self._digests.get(cache_key)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+        digest = _hash_file(path)
+        self._digests[cache_key] = (stat.st_mtime_ns, stat.st_size, digest)
+        return digest
+
+    def _folder_digest(self, folder: Path) -> str:
+        """脚本文件夹中所有文件（按相对路径排序）的内容哈希"""
+        digest = hashlib.sha1()
+        for root, dirs, files in os.walk(folder):
+            dirs[:] = sorted(d for d in dirs if d not in _SKIPPED_DIRS and not d.startswith('.'))
+            for name in sorted(files):
+                if name.startswith('.') or name.endswith('.pyc'):
+                    continue
+                path = Path(root) / name
+                digest.update(path.relative_to(folder).as_posix().encode('utf-8'))
+                digest.update(self._file_digest(path).encode('ascii'))
+        return digest.hexdigest()
+
+    @staticmethod
+    def _param_value(command_parts: list, name: str) -> Optional[str]:
+        flag = f"--{name}"
+        if flag in command_parts:
+            index = command_parts.index(flag)
+            if index + 1 < len(command_parts):
+                return command_parts[index + 1]
+        return None
+
+    def _output_folders(self, script: Dict[str, Any], command_parts: list) -> List[Path]:
+        folders = []
+        for param_def in script.get('parameters', []):
+            value = self._param_value(command_parts, param_def['name'])
+            if not value:
+                continue
+            if param_def.get('type') == 'folder':
+                folders.append(Path(value))
+            elif param_def.get('type') == 'file':
+                folders.append(Path(value).parent)
+        return list(dict.fromkeys(folders))
+
+    @staticmethod
+    def _snapshot_folder(folder: Path) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        snapshot[os.path.abspath(entry.path)] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            pass
+        return snapshot
@@ -0,0 +1,390 @@
+"""
+运行日志 - 把每次运行的输出写入 logs 目录下的压缩日志，并支持快速读取末尾、按行号定位和搜索
+
+日志文件由多个独立的 gzip 成员（块）首尾相连组成，整体仍是合法的 .gz 文件。
+每写完一块就在稀疏索引（.idx，每行一个 JSON）中记录该块的首行行号、文件偏移和长度，
+读取时只需解压用到的块，无需解压或载入整个日志。
+"""
+import bisect
+import gzip
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+from core.process_supervisor import ProcessSupervisor
+
+# 一个压缩块最多包含的行数和未压缩字节数
+BLOCK_LINES = 2000
+BLOCK_BYTES = 256 * 1024
+
+# 日志轮转：总大小上限和最长保留天数
+MAX_TOTAL_BYTES = 200 * 1024 * 1024
+MAX_AGE_DAYS = 30
+
+# 启动后两次轮转的最短间隔（秒）；其间新写入的日志超过总大小上限的 1/ROTATE_WRITE_FRACTION 时提前轮转
+ROTATE_INTERVAL = 600
+ROTATE_WRITE_FRACTION = 10
+
+# 上次运行时未正常结束（程序崩溃或被强制退出）的日志在启动时标记的状态
+STATUS_INTERRUPTED = 'interrupted'
+
+# 单次读取/搜索返回的最大行数
+MAX_RESULT_LINES = 5000
+
+_SAFE_NAME = re.compile(r'[^\w.-]+')
+
+
+class RunLogWriter:
+    """
+    一次运行的日志写入器
+    write_line 在事件循环中调用，只把行加入当前块；写满的块交给进程监管器的线程池压缩并写入，
+    一个输出很多的任务不会阻塞事件循环读取其他任务的输出。没有进程监管器时在调用线程中直接写入。
+    """
+    def __init__(self, log_file: Path, index_file: Path, meta_file: Path, meta: Dict[str, Any],
+                 supervisor: Optional[ProcessSupervisor] = None):
+        self._log_file = log_file
+        self._index_file = index_file
+        self._meta_file = meta_file
+        self._meta = meta
+        self._supervisor = supervisor
+        self._stream = open(log_file, 'ab')
+        self._index_stream = open(index_file, 'a', encoding='utf-8')
+        self._pending: List[str] = []
+        self._pending_bytes = 0
+        # 已写满、等待压缩写入的块（按顺序写入），以及是否已有线程池任务在写
+        self._blocks: List[List[str]] = []
+        self._writing = False
+        self._closed = False
+        self._next_line = 0
+        self._lock = threading.Lock()
+        # 保证块按顺序写入文件（线程池中的写入和 close 中的写入不会交错）
+        self._io_lock = threading.Lock()
+        self._write_meta()
+
+    @property
+    def log_id(self) -> str:
+        return self._meta["log_id"]
+
+    @property
+    def compressed_bytes(self) -> int:
+        """关闭后日志文件的大小（关闭前为 0）"""
+        return self._meta.get("compressed_bytes", 0)
+
+    def write_line(self, line: str):
+        background = False
+        with self._lock:
+            if self._closed:
+                return
+            self._pending.append(line)
+            self._pending_bytes += len(line) + 1
+            if len(self._pending) < BLOCK_LINES and self._pending_bytes < BLOCK_BYTES:
+                return
+            self._blocks.append(self._pending)
+            self._pending = []
+            self._pending_bytes = 0
+            if self._supervisor is not None:
+                if self._writing:
+                    return
+                self._writing = background = True
+        if background:
+            self._supervisor.submit(self._write_in_background())
+        else:
+            self._write_blocks()
+
+    def close(self, **final_meta):
+        """写出剩余的块并更新元数据（状态、退出码、结束时间等）；会等待线程池中正在进行的写入"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self._pending:
+                self._blocks.append(self._pending)
+                self._pending = []
+                self._pending_bytes = 0
+        self._write_blocks()
+        with self._io_lock:
+            self._stream.close()
+            self._index_stream.close()
+            self._meta.update(final_meta)
+            self._meta["total_lines"] = self._next_line
+            self._meta["compressed_bytes"] = self._log_file.stat().st_size
+            self._write_meta()
+
+    async def _write_in_background(self):
+        await self._supervisor.run_blocking(self._write_blocks)
+
+    def _write_blocks(self):
+        """按顺序压缩并写入所有排队的块"""
+        with self._io_lock:
+            while True:
+                with self._lock:
+                    if not self._blocks:
+                        self._writing = False
+                        return
+                    lines = self._blocks.pop(0)
+                if self._stream.closed:
+                    continue
+                try:
+                    self._write_block(lines)
+                except OSError as e:
+                    print(f"写入运行日志失败: {e}")
+
+    def _write_block(self, lines: List[str]):
+        data = ('\n'.join(lines) + '\n').encode('utf-8')
+        block = gzip.compress(data, compresslevel=6)
+        offset = self._stream.tell()
+        self._stream.write(block)
+        self._stream.flush()
+        entry = {"line": self._next_line, "lines": len(lines), "offset": offset, "length": len(block)}
+        self._index_stream.write(json.dumps(entry) + '\n')
+        self._index_stream.flush()
+        self._next_line += len(lines)
+
+    def _write_meta(self):
+        _write_meta_file(self._meta_file, self._meta)
+
+
+def _write_meta_file(meta_file: Path, meta: Dict[str, Any]):
+    tmp_file = meta_file.with_suffix('.tmp')
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, meta_file)
+
+
+class RunLogStore:
+    def __init__(self, logs_dir: Path, max_total_bytes: int = MAX_TOTAL_BYTES, max_age_days: float = MAX_AGE_DAYS,
+                 supervisor: Optional[ProcessSupervisor] = None):
+        """:param supervisor: 进程监管器，写满的日志块在其线程池中压缩写入；None 时在写入线程中直接写入"""
+        self._logs_dir = Path(logs_dir)
+        self._supervisor = supervisor
+        self._max_total_bytes = max_total_bytes
+        self._max_age_days = max_age_days
+        self._lock = threading.Lock()
+        # 正在写入的日志，轮转时跳过
+        self._open_logs = set()
+        # 上次轮转的时间，以及之后关闭的日志的压缩大小之和
+        self._last_rotate = 0.0
+        self._written_since_rotate = 0
+
+    def open_writer(self, job_id: str, script_id: Optional[str], name: str, command: list) -> Optional[RunLogWriter]:
+        """为一次运行创建日志，失败时返回 None（不影响脚本运行）"""
+        started_at = time.time()
+        log_id = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(started_at))}_{job_id}"
+        meta = {
+            "log_id": log_id,
+            "job_id": job_id,
+            "script_id": script_id,
+            "name": name,
+            "command": command,
+            "started_at": started_at,
+            "status": "running",
+        }
+        try:
+            self._logs_dir.mkdir(parents=True, exist_ok=True)
+            paths = self._paths(log_id)
+            with self._lock:
+                self._open_logs.add(log_id)
+            return RunLogWriter(paths["log"], paths["index"], paths["meta"], meta, self._supervisor)
+        except OSError as e:
+            print(f"创建运行日志失败: {e}")
+            return None
+
+    def close_writer(self, writer: Optional[RunLogWriter], **final_meta):
+        """
+        结束日志写入。轮转需要扫描所有日志，不在每次关闭时进行：
+        距上次轮转超过 ROTATE_INTERVAL，或其间写入的日志已占总大小上限的一定比例时才轮转
+        """
+        if writer is None:
+            return
+        try:
+            writer.close(finished_at=time.time(), **final_meta)
+        except OSError as e:
+            print(f"写入运行日志失败: {e}")
+        with self._lock:
+            self._open_logs.discard(writer.log_id)
+            self._written_since_rotate += writer.compressed_bytes
+            due = (time.monotonic() - self._last_rotate >= ROTATE_INTERVAL
+                   or self._written_since_rotate * ROTATE_WRITE_FRACTION >= self._max_total_bytes)
+        if due:
+            self.rotate()
+
+    def recover_interrupted(self) -> int:
+        """
+        启动时调用：把上次运行时没有正常关闭、仍为 running 状态的日志标记为 interrupted，
+        并根据已写入的索引补全行数和大小。返回修正的日志数。
+        """
+        recovered = 0
+        if not self._logs_dir.exists():
+            return recovered
+        for meta_file in self._logs_dir.glob('*.meta.json'):
+            meta = self._read_meta(meta_file)
+            if meta is None or meta.get("status") != "running":
+                continue
+            log_id = meta.get("log_id")
+            with self._lock:
+                if log_id in self._open_logs:
+                    continue
+            paths = self._paths(log_id)
+            index = self._read_index(log_id) or []
+            meta["status"] = STATUS_INTERRUPTED
+            meta["total_lines"] = index[-1]["line"] + index[-1]["lines"] if index else 0
+            try:
+                # 最后一次写入日志的时间即为中断时间的近似值
+                meta["finished_at"] = paths["log"].stat().st_mtime
+                meta["compressed_bytes"] = paths["log"].stat().st_size
+            except OSError:
+                meta["compressed_bytes"] = 0
+            try:
+                _write_meta_file(meta_file, meta)
+                recovered += 1
+            except OSError as e:
+                print(f"修正运行日志状态失败: {e}")
+        return recovered
+
+    def list_logs(self, script_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """所有运行日志的元数据，最新的在前"""
+        logs = []
+        if not self._logs_dir.exists():
+            return logs
+        for meta_file in self._logs_dir.glob('*.meta.json'):
+            meta = self._read_meta(meta_file)
+            if meta is None or (script_id is not None and meta.get("script_id") != script_id):
+                continue
+            logs.append(meta)
+        logs.sort(key=lambda meta: meta.get("started_at", 0), reverse=True)
+        return logs
+
+    def read_lines(self, log_id: str, start: int, count: int) -> Optional[Dict[str, Any]]:
+        """
+        读取从行号 start 开始的至多 count 行，只解压覆盖该范围的块
+        :return: {"start", "lines", "total_lines"}，日志不存在时返回 None
+        """
+        index = self._read_index(log_id)
+        if index is None:
+            return None
+        total = index[-1]["line"] + index[-1]["lines"] if index else 0
+        count = max(0, min(count, MAX_RESULT_LINES))
+        start = min(max(0, start), total)
+        end = min(total, start + count)
+
+        lines = []
+        if start < end:
+            block_starts = [entry["line"] for entry in index]
+            position = bisect.bisect_right(block_starts, start) - 1
+            with open(self._paths(log_id)["log"], 'rb') as f:
+                while position < len(index) and index[position]["line"] < end:
+                    entry = index[position]
+                    block_lines = self._read_block(f, entry)
+                    first = max(start, entry["line"]) - entry["line"]
+                    last = min(end, entry["line"] + entry["lines"]) - entry["line"]
+                    lines.extend(block_lines[first:last])
+                    position += 1
+        return {"start": start, "lines": lines, "total_lines": total}
+
+    def tail(self, log_id: str, count: int) -> Optional[Dict[str, Any]]:
+        """读取最后 count 行，只解压最后几块"""
+        index = self._read_index(log_id)
+        if index is None:
+            return None
+        total = index[-1]["line"] + index[-1]["lines"] if index else 0
+        return self.read_lines(log_id, max(0, total - count), count)
+
+    def search(self, log_id: str, query: str, limit: int = 200, ignore_case: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        逐块解压并查找包含 query 的行，内存中同时只有一块
+        :return: {"matches": [{"line": 行号, "text": 内容}], "truncated": 是否达到 limit}
+        """
+        index = self._read_index(log_id)
+        if index is None:
+            return None
+        limit = max(1, min(limit, MAX_RESULT_LINES))
+        needle = query.casefold() if ignore_case else query
+        matches = []
+        with open(self._paths(log_id)["log"], 'rb') as f:
+            for entry in index:
+                f.seek(entry["offset"])
+                text = gzip.decompress(f.read(entry["length"])).decode('utf-8', errors='replace')
+                # 先在整块文本上判断，不含关键词的块无需拆分成行（忽略大小写时用 casefold，非 ASCII 字母同样适用）
+                if needle not in (text.casefold() if ignore_case else text):
+                    continue
+                for offset, line in enumerate(text.split('\n')[:entry["lines"]]):
+                    if needle in (line.casefold() if ignore_case else line):
+                        matches.append({"line": entry["line"] + offset, "text": line})
+                        if len(matches) >= limit:
+                            return {"matches": matches, "truncated": True}
+        return {"matches": matches, "truncated": False}
+
+    def delete(self, log_id: str) -> bool:
+        """删除一份日志（正在写入的日志不能删除）"""
+        with self._lock:
+            if log_id in self._open_logs:
+                return False
+        removed = False
+        for path in self._paths(log_id).values():
+            try:
+                path.unlink()
+                removed = True
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def rotate(self):
+        """删除超过保留天数的日志；总大小仍超出上限时从最旧的开始删除"""
+        with self._lock:
+            self._last_rotate = time.monotonic()
+            self._written_since_rotate = 0
+        logs = self.list_logs()
+        cutoff = time.time() - self._max_age_days * 86400
+        sizes = {}
+        for meta in logs:
+            sizes[meta["log_id"]] = sum(
+                path.stat().st_size for path in self._paths(meta["log_id"]).values() if path.exists())
+        total = sum(sizes.values())
+        # list_logs 按开始时间倒序，从列表末尾（最旧）开始删除
+        for meta in reversed(logs):
+            log_id = meta["log_id"]
+            if meta.get("started_at", 0) >= cutoff and total <= self._max_total_bytes:
+                break
+            if self.delete(log_id):
+                total -= sizes[log_id]
+
+    def _paths(self, log_id: str) -> Dict[str, Path]:
+        safe_id = _SAFE_NAME.sub('_', log_id)
+        return {
+            "log": self._logs_dir / f"{safe_id}.log.gz",
+            "index": self._logs_dir / f"{safe_id}.idx",
+            "meta": self._logs_dir / f"{safe_id}.meta.json",
+        }
+
+    def _read_index(self, log_id: str) -> Optional[List[Dict[str, int]]]:
+        index_file = self._paths(log_id)["index"]
+        try:
+            with open(index_file, 'r', encoding='utf-8') as f:
+                text = f.read()
+        except OSError:
+            return None
+        index = []
+        for line in text.splitlines():
+            try:
+                index.append(json.loads(line))
+            except json.JSONDecodeError:
+                # 写入中的最后一行可能不完整
+                break
+        return index
+
+    @staticmethod
+    def _read_block(f, entry: Dict[str, int]) -> List[str]:
+        f.seek(entry["offset"])
+        data = gzip.decompress(f.read(entry["length"]))
+        return data.decode('utf-8', errors='replace').split('\n')[:entry["lines"]]
+
+    @staticmethod
+    def _read_meta(meta_file: Path) -> Optional[Dict[str, Any]]:
+        try:
+            with open(meta_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
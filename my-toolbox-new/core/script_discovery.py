@@ -1,20 +1,35 @@
 """
 脚本发现器 - 负责脚本的发现和加载
 """
+import copy
 import os
 from pathlib import Path
 import ast
 from typing import List, Dict, Any, Optional
 from core.icon_manager import IconManager
+from core.metadata_cache import MetadataCache, MISS
+from core.metadata_extractor import extract_metadata_fast, extract_metadata_batch
+
+# 缓存未命中的文件数达到此值时才启用并行解析（进程池的启动开销对少量文件不划算）
+PARALLEL_THRESHOLD = 64
 
 
 class ScriptDiscovery:
-    def __init__(self, scripts_dir: Path, user_preferences: Dict[str, Any]):
+    def __init__(self, scripts_dir: Path, user_preferences: Dict[str, Any], cache_file: Optional[Path] = None):
         self._scripts_dir = scripts_dir
         self.user_preferences = user_preferences
         # 确保目录存在
         self._scripts_dir.mkdir(exist_ok=True)
-    
+        # 元数据缓存默认放在项目根目录的 cache 文件夹中，跨重启保留
+        if cache_file is None:
+            cache_file = Path(scripts_dir).parent / "cache" / "metadata_cache.json"
+        self.metadata_cache = MetadataCache(cache_file)
+        # 所有脚本共用一个图标管理器，其按文件夹 mtime 失效的图标缓存跨扫描保留
+        self.icon_manager = IconManager(Path(__file__).parent.parent)
+        self.last_scan_stats = {"scripts": 0, "cache_hits": 0, "cache_misses": 0}
+        # 文件夹名 -> 最近一次读取到的元数据，供增量刷新计算差异
+        self._known_scripts: Dict[str, Dict[str, Any]] = {}
+
     def discover_scripts(self) -> List[Dict[str, Any]]:
         """动态发现脚本（遵循 main.py 入口约定）"""
         discovered_scripts = []
@@ -22,77 +37,174 @@ class ScriptDiscovery:
 
         if not scripts_dir.exists():
             scripts_dir.mkdir(exist_ok=True)
+            self._known_scripts = {}
             return discovered_scripts
 
-        for script_folder in scripts_dir.iterdir():
+        self.metadata_cache.reset_stats()
+
+        # 1. 按文件夹名排序收集入口文件，保证结果顺序与文件系统的遍历顺序无关
+        script_folders = []
+        for script_folder in sorted(scripts_dir.iterdir(), key=lambda p: p.name):
             if not script_folder.is_dir():
                 continue
+            if not (script_folder / "main.py").exists():
+                continue
+            script_folders.append(script_folder)
+        live_entry_points = [folder / "main.py" for folder in script_folders]
 
+        # 2. 先查缓存，只收集真正需要解析的文件
+        raw_metadata = {}
+        pending = []
+        for entry_point_file in live_entry_points:
+            cached = self.metadata_cache.lookup(entry_point_file)
+            if cached is MISS:
+                pending.append(entry_point_file)
+            else:
+                raw_metadata[entry_point_file] = cached
+
+        # 3. 解析缓存未命中的文件，数量较多时（如冷启动）分发到进程池并行解析
+        for entry_point_file, (ok, result) in zip(pending, self._extract_pending(pending)):
+            if not ok:
+                print(f"解析脚本 {entry_point_file} 时出错: {result}")
+                continue
+            self.metadata_cache.store(entry_point_file, result)
+            raw_metadata[entry_point_file] = result
+
+        # 4. 按固定顺序补全 ID、图标和分类
+        known_scripts = {}
+        for script_folder, entry_point_file in zip(script_folders, live_entry_points):
+            if entry_point_file not in raw_metadata:
+                continue
+            metadata = self._finalize_metadata(script_folder, raw_metadata[entry_point_file])
+            if metadata is not None:
+                # 保存副本：返回给调用方的字典之后可能被合并用户配置
+                known_scripts[script_folder.name] = copy.deepcopy(metadata)
+                discovered_scripts.append(metadata)
+
+        # 清理已消失脚本的缓存条目，并在有变化时持久化
+        self.metadata_cache.prune(live_entry_points)
+        self.metadata_cache.save()
+        self._known_scripts = known_scripts
+        self.last_scan_stats = {
+            "scripts": len(discovered_scripts),
+            "cache_hits": self.metadata_cache.hits,
+            "cache_misses": self.metadata_cache.misses,
+        }
+
+        return discovered_scripts
+
+    def _extract_pending(self, pending: List[Path]):
+        """解析一批缓存未命中的文件，返回与 pending 顺序一致的 (是否成功, 结果) 列表"""
+        settings = self.user_preferences.get('discovery', {})
+        threshold = settings.get('parallel_threshold', PARALLEL_THRESHOLD)
+        if len(pending) < threshold:
+            results = []
+            for entry_point_file in pending:
+                try:
+                    results.append((True, self._get_metadata_from_ast(entry_point_file)))
+                except Exception as e:
+                    results.append((False, str(e)))
+            return results
+        return extract_metadata_batch(
+            pending,
+            max_workers=settings.get('workers'),
+            executor=settings.get('executor', 'process'),
+        )
+
+    def refresh_folders(self, folder_names) -> Dict[str, list]:
+        """
+        增量刷新：只重新读取给定的脚本文件夹，并返回相对上一次结果的差异。
+        返回 {"added": [元数据...], "updated": [元数据...], "removed": [脚本ID...]}
+        """
+        diff = {"added": [], "updated": [], "removed": []}
+        scripts_dir = Path(self._scripts_dir)
+
+        for folder_name in sorted(set(folder_names)):
+            script_folder = scripts_dir / folder_name
             entry_point_file = script_folder / "main.py"
-            if not entry_point_file.exists():
+            previous = self._known_scripts.get(folder_name)
+
+            metadata = None
+            if script_folder.is_dir() and entry_point_file.exists():
+                metadata = self._load_script_folder(script_folder)
+            else:
+                self.metadata_cache.invalidate(entry_point_file)
+
+            if metadata is None:
+                if previous is not None:
+                    del self._known_scripts[folder_name]
+                    diff["removed"].append(previous['id'])
                 continue
 
-            try:
-                metadata = self._get_metadata_from_ast(entry_point_file)
-                if metadata is None:
-                    continue
-
-                folder_name = script_folder.name
-                # 注意：base_id 现在只基于文件夹，因为入口总是 main.py
-                base_id = f"{folder_name}"
-                
-                # ID管理逻辑
-                mapped_id = self._get_mapped_id(base_id)
-                if mapped_id:
-                    metadata['id'] = mapped_id
+            self._known_scripts[folder_name] = copy.deepcopy(metadata)
+            if previous is None:
+                diff["added"].append(metadata)
+            elif previous != metadata:
+                if previous['id'] != metadata['id']:
+                    diff["removed"].append(previous['id'])
+                    diff["added"].append(metadata)
                 else:
-                    import hashlib
-                    path_hash = hashlib.md5(base_id.encode('utf-8')).hexdigest()[:8]
-                    generated_id = f"{folder_name.lower().replace(' ', '_')}_{path_hash}"
-                    metadata['id'] = generated_id
-                    self._record_id_mapping(base_id, generated_id)
-
-                metadata['name'] = folder_name
-                metadata['file_path'] = str(entry_point_file)
-                
-                # 图标和分类逻辑
-                icon_manager = IconManager(Path(__file__).parent.parent)
-                metadata['icon'] = icon_manager.get_script_icon(script_folder)
-                user_script_config = self.user_preferences.get('scripts', {}).get(metadata['id'], {})
-                if 'category' in user_script_config:
-                    metadata['category'] = user_script_config['category']
+                    diff["updated"].append(metadata)
 
-                discovered_scripts.append(metadata)
+        # 同一ID既被移除又被新增（例如文件夹重命名后ID映射不变），视为更新
+        readded = {script['id']: script for script in diff["added"]}
+        for script_id in [i for i in diff["removed"] if i in readded]:
+            diff["removed"].remove(script_id)
+            diff["added"].remove(readded[script_id])
+            diff["updated"].append(readded[script_id])
 
-            except Exception as e:
-                print(f"解析脚本 {entry_point_file} 时出错: {e}")
-        
-        return discovered_scripts
+        # 不在每次增量刷新后重写整个缓存文件，由调用方在空闲或退出时调用 metadata_cache.save()
+        return diff
+
+    def _load_script_folder(self, script_folder: Path) -> Optional[Dict[str, Any]]:
+        """读取单个脚本文件夹的元数据（优先使用缓存）"""
+        entry_point_file = script_folder / "main.py"
+        try:
+            metadata = self.metadata_cache.get_or_extract(entry_point_file, self._get_metadata_from_ast)
+        except Exception as e:
+            print(f"解析脚本 {entry_point_file} 时出错: {e}")
+            return None
+        return self._finalize_metadata(script_folder, metadata)
+
+    def _finalize_metadata(self, script_folder: Path, metadata: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """为解析出的元数据补全 ID、名称、图标和分类信息"""
+        if metadata is None:
+            return None
+        entry_point_file = script_folder / "main.py"
+        try:
+            folder_name = script_folder.name
+            # 注意：base_id 现在只基于文件夹，因为入口总是 main.py
+            base_id = f"{folder_name}"
+            
+            # ID管理逻辑
+            mapped_id = self._get_mapped_id(base_id)
+            if mapped_id:
+                metadata['id'] = mapped_id
+            else:
+                import hashlib
+                path_hash = hashlib.md5(base_id.encode('utf-8')).hexdigest()[:8]
+                generated_id = f"{folder_name.lower().replace(' ', '_')}_{path_hash}"
+                metadata['id'] = generated_id
+                self._record_id_mapping(base_id, generated_id)
+
+            metadata['name'] = folder_name
+            metadata['file_path'] = str(entry_point_file)
+            
+            # 图标和分类逻辑
+            metadata['icon'] = self.icon_manager.get_script_icon(script_folder)
+            user_script_config = self.user_preferences.get('scripts', {}).get(metadata['id'], {})
+            if 'category' in user_script_config:
+                metadata['category'] = user_script_config['category']
+
+            return metadata
+
+        except Exception as e:
+            print(f"解析脚本 {entry_point_file} 时出错: {e}")
+            return None
 
     def _get_metadata_from_ast(self, file_path: Path) -> Optional[Dict[str, Any]]:
-        """使用AST安全地从脚本文件中提取元数据"""
-        with open(file_path, 'r', encoding='utf-8') as f:
-            source = f.read()
-        
-        tree = ast.parse(source, filename=str(file_path))
-        
-        for node in ast.walk(tree):
-            if isinstance(node, ast.FunctionDef) and node.name == 'get_metadata':
-                for sub_node in node.body:
-                    if isinstance(sub_node, ast.Return):
-                        # 安全地评估返回值
-                        try:
-                            metadata = ast.literal_eval(sub_node.value)
-                            if isinstance(metadata, dict):
-                                # 确保关键字段存在
-                                metadata.setdefault('description', '暂无描述')
-                                metadata.setdefault('parameters', [])
-                                metadata.setdefault('dependencies', [])
-                                return metadata
-                        except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
-                            # 如果返回值不是一个字面量字典，则无法安全解析
-                            return None
-        return None
+        """使用AST安全地从脚本文件中提取元数据（只解析 get_metadata 函数，必要时退回完整解析）"""
+        return extract_metadata_fast(file_path)
 
     def _get_mapped_id(self, base_id: str) -> Optional[str]:
         """获取基础ID对应的映射ID（用于处理文件夹重命名的情况）"""
@@ -1,29 +1,40 @@
 """
 脚本管理器 - 负责脚本的发现、加载和元数据管理
 """
+import threading
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable
 from core.script_discovery import ScriptDiscovery
 from core.script_metadata import ScriptMetadata
 from core.user_preferences import UserPreferences
 from core.script_organization import ScriptOrganization
 from core.script_operations import ScriptOperations
+from core.script_registry import ScriptRegistry
+from core.script_watcher import ScriptWatcher
 
 
 class ScriptManager:
-    def __init__(self):
-        self._scripts_dir = Path(__file__).parent.parent / "scripts"
-        self._user_profile_file = Path(__file__).parent.parent / "user_profile.json"
+    def __init__(self, base_dir: Optional[Path] = None):
+        """
+        :param base_dir: 包含 scripts 目录和 user_profile.json 的根目录，默认为项目根目录
+        """
+        base_dir = Path(base_dir) if base_dir is not None else Path(__file__).parent.parent
+        self._scripts_dir = base_dir / "scripts"
+        self._user_profile_file = base_dir / "user_profile.json"
         
         # 初始化各个模块
         self.user_preferences_manager = UserPreferences(self._user_profile_file)
         self.user_preferences = self.user_preferences_manager.user_preferences
         self.script_discovery = ScriptDiscovery(self._scripts_dir, self.user_preferences)
         self.script_metadata = ScriptMetadata()
-        self.script_organization = ScriptOrganization(self.user_preferences)
+        # 注册表持有有序脚本列表及按 ID/文件夹/分类的索引，由发现、重命名和删除增量维护
+        self.registry = ScriptRegistry()
+        self.script_organization = ScriptOrganization(self.user_preferences, self.registry)
         self.script_operations = ScriptOperations(self.user_preferences)
         
-        self.scripts = []
+        # 发现/增量刷新可能同时来自 API 线程和目录监视线程
+        self._lock = threading.RLock()
+        self._watcher = None
         
         # 确保目录存在
         self._scripts_dir.mkdir(exist_ok=True)
@@ -31,6 +42,15 @@ class ScriptManager:
         # 确保用户配置文件被创建
         self.save_user_preferences(self.user_preferences)
 
+    @property
+    def scripts(self) -> List[Dict[str, Any]]:
+        """按用户排序排列的脚本列表"""
+        return self.registry.scripts
+
+    @scripts.setter
+    def scripts(self, scripts_list):
+        self.registry.replace_all(scripts_list)
+
     @property
     def scripts_dir(self):
         """返回脚本目录路径"""
@@ -43,14 +63,18 @@ class ScriptManager:
 
     def discover_scripts(self):
         """发现脚本并应用排序"""
+        with self._lock:
+            self._discover_scripts_locked()
+
+    def _discover_scripts_locked(self):
         discovered_scripts = self.script_discovery.discover_scripts()
         
         # 现在处理新发现的脚本，只将之前未记录的脚本添加到排序数组的末尾
-        current_script_ids = {script['id'] for script in discovered_scripts}
         saved_script_order = self.get_script_order()
+        known_script_ids = set(saved_script_order)
         
-        # 找出新脚本（不在已保存的排序中的脚本）
-        new_script_ids = [script_id for script_id in current_script_ids if script_id not in saved_script_order]
+        # 找出新脚本（不在已保存的排序中的脚本），保持发现顺序以使结果确定
+        new_script_ids = [script['id'] for script in discovered_scripts if script['id'] not in known_script_ids]
         
         # 将新脚本添加到排序数组的末尾，但只在有新脚本时才保存（避免覆盖用户手动排序）
         if new_script_ids:
@@ -59,15 +83,13 @@ class ScriptManager:
             # self.save_script_order(updated_script_order) # BUG: This call uses a stale user_preferences object and overwrites good data.
             # By removing the save, we only update the order in memory for this session.
             # A proper save will happen on app close or other explicit save events.
-            self.user_preferences.get("layout", {})["scriptOrder"] = updated_script_order
+            self.user_preferences.setdefault("layout", {})["scriptOrder"] = updated_script_order
             # 更新 saved_script_order 以确保对新发现的脚本进行正确排序
             saved_script_order = updated_script_order
         # 如果没有新脚本，我们不修改已保存的排序，继续使用当前的 saved_script_order
         
-        # 现在对发现的脚本应用保存的排序
+        # 现在对发现的脚本应用保存的排序，并重建注册表索引
         self.scripts = self._apply_saved_script_order_list(discovered_scripts, saved_script_order)
-        # 更新 script_organization 的脚本列表
-        self.script_organization.scripts = self.scripts
 
         # 检查并初始化分类排序，确保 categoryOrder 参数始终存在
         layout_prefs = self.user_preferences.setdefault('layout', {})
@@ -101,43 +123,116 @@ class ScriptManager:
 
     def get_all_scripts(self) -> List[Dict[str, Any]]:
         """获取所有脚本"""
-        # 重新发现脚本以确保最新状态
-        self.discover_scripts()
-        
-        # 应用用户自定义的分类（排序已在discover_scripts中应用）
-        scripts = self.scripts.copy()
-        
-        # 应用用户配置
-        for script in scripts:
-            script_id = script['id']
-            if script_id in self.user_preferences.get('scripts', {}):
-                user_config = self.user_preferences['scripts'][script_id]
-                
-                # 智能合并用户配置，而不是盲目覆盖
-                for key, value in user_config.items():
-                    # 对于图标，只有当用户配置了一个非空的图标路径时才覆盖自动发现的图标
-                    if key == 'icon':
-                        if value:  # 检查 value 是否为非空字符串
-                            script[key] = value
-                    # 对于其他设置（如 category, venv），直接应用用户配置
-                    else:
-                        script[key] = value
-                
-                # 应用已保存的参数默认值
-                if 'parameter_defaults' in user_config:
-                    param_map = {p['name']: p for p in script.get('parameters', [])}
-                    for param_name, saved_default in user_config['parameter_defaults'].items():
-                        if param_name in param_map:
-                            param_map[param_name]['defaultValue'] = saved_default
-        
-        return scripts
+        with self._lock:
+            # 目录监视运行时脚本集合由增量刷新保持最新，否则重新发现脚本以确保最新状态
+            if not self.is_watching():
+                self._discover_scripts_locked()
+            
+            # 在副本上应用用户配置，注册表中保留发现得到的原始数据（排序已在discover_scripts中应用）
+            return [self._apply_user_config(script) for script in self.scripts]
+
+    def _apply_user_config(self, script: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        返回合并了用户配置的脚本副本。注册表中的字典保持为发现得到的原始数据，
+        生效的分类只同步到注册表的分类索引（分类列表和筛选依赖它）。
+        """
+        script_id = script['id']
+        merged = dict(script)
+        if script_id in self.user_preferences.get('scripts', {}):
+            user_config = self.user_preferences['scripts'][script_id]
+            
+            # 智能合并用户配置，而不是盲目覆盖
+            for key, value in user_config.items():
+                # 对于图标，只有当用户配置了一个非空的图标路径时才覆盖自动发现的图标
+                if key == 'icon':
+                    if value:  # 检查 value 是否为非空字符串
+                        merged[key] = value
+                # 对于其他设置（如 category, venv），直接应用用户配置
+                else:
+                    merged[key] = value
+            
+            # 应用已保存的参数默认值（参数字典同样复制后再修改）
+            if 'parameter_defaults' in user_config:
+                merged['parameters'] = [dict(p) for p in script.get('parameters', [])]
+                param_map = {p['name']: p for p in merged['parameters']}
+                for param_name, saved_default in user_config['parameter_defaults'].items():
+                    if param_name in param_map:
+                        param_map[param_name]['defaultValue'] = saved_default
+
+        if merged.get('category') != self.registry.category_of(script_id):
+            self.registry.reindex_category(script_id, merged.get('category'))
+        return merged
+
+    def start_watching(self, on_change: Callable[[Dict[str, list]], None]):
+        """
+        启动脚本目录监视。之后只重新读取发生变化的文件夹，
+        并通过 on_change 回调推送 {"added", "updated", "removed"} 差异。
+        """
+        if self._watcher is not None:
+            return
+
+        def handle_folder_changes(folder_names):
+            diff = self.apply_folder_changes(folder_names)
+            if diff['added'] or diff['updated'] or diff['removed']:
+                on_change(diff)
+
+        # 增量刷新只更新内存中的元数据缓存，目录静默一段时间后再批量写回磁盘
+        self._watcher = ScriptWatcher(self._scripts_dir, handle_folder_changes,
+                                      on_idle=self.save_metadata_cache)
+        self._watcher.start()
+
+    def stop_watching(self):
+        """停止脚本目录监视，并写回尚未持久化的元数据缓存"""
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+        self.save_metadata_cache()
+
+    def save_metadata_cache(self):
+        """把增量刷新积累的元数据缓存改动写回磁盘（没有改动时不写）"""
+        with self._lock:
+            self.script_discovery.metadata_cache.save()
+
+    def is_watching(self) -> bool:
+        return self._watcher is not None
+
+    def apply_folder_changes(self, folder_names) -> Dict[str, list]:
+        """增量刷新指定的脚本文件夹，更新内存中的脚本列表并返回差异"""
+        with self._lock:
+            diff = self.script_discovery.refresh_folders(folder_names)
+            if not (diff['added'] or diff['updated'] or diff['removed']):
+                return diff
+
+            for script_id in diff['removed']:
+                self.registry.remove(script_id)
+            # 注册表保存原始数据，推送给前端的差异使用合并了用户配置的副本
+            for key in ('updated', 'added'):
+                merged_scripts = []
+                for script in diff[key]:
+                    self.registry.upsert(script)
+                    merged_scripts.append(self._apply_user_config(script))
+                diff[key] = merged_scripts
+
+            if diff['added']:
+                # 新脚本追加到排序数组末尾（仅内存中，与 discover_scripts 的处理一致）
+                saved_script_order = self.get_script_order()
+                known_ids = set(saved_script_order)
+                new_script_ids = [script['id'] for script in diff['added'] if script['id'] not in known_ids]
+                if new_script_ids:
+                    saved_script_order = saved_script_order + new_script_ids
+                    self.user_preferences.setdefault("layout", {})["scriptOrder"] = saved_script_order
+                # upsert 已把新脚本追加到末尾，与排序一致；只有重新出现的旧脚本需要回到保存的位置
+                if len(new_script_ids) < len(diff['added']):
+                    self.registry.reorder(saved_script_order)
+            return diff
 
     def get_script_by_id(self, script_id: str) -> Optional[Dict[str, Any]]:
         """根据ID获取脚本"""
-        for script in self.scripts:
-            if script['id'] == script_id:
-                return script
-        return None
+        return self.registry.get(script_id)
+
+    def get_discovery_stats(self) -> Dict[str, int]:
+        """获取最近一次脚本发现的统计信息（脚本数、缓存命中/未命中次数）"""
+        return dict(self.script_discovery.last_scan_stats)
 
     def build_command(self, script: Dict[str, Any], params: Dict[str, Any]) -> str:
         """构建执行命令"""
@@ -147,9 +242,9 @@ class ScriptManager:
         """获取所有分类"""
         return self.script_organization.get_categories()
 
-    def search_scripts(self, query: str) -> List[Dict[str, Any]]:
+    def search_scripts(self, query: str, limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
         """搜索脚本"""
-        return self.script_organization.search_scripts(query)
+        return self.script_organization.search_scripts(query, limit=limit, offset=offset)
 
     def get_user_preferences(self) -> Dict[str, Any]:
         """获取用户偏好设置"""
@@ -192,8 +287,13 @@ class ScriptManager:
     def assign_script_to_category(self, script_id, category_name):
         """将脚本分配到指定分类"""
         result = self.script_organization.assign_script_to_category(script_id, category_name)
+        self._set_script_category(script_id, category_name)
         return self.save_user_preferences(self.user_preferences)
 
+    def _set_script_category(self, script_id, category_name):
+        """把用户指定的分类同步到注册表的分类索引"""
+        self.registry.reindex_category(script_id, category_name)
+
     def update_script_metadata(self, script_id, metadata_changes):
         """更新脚本文件中的元数据"""
         # 传递获取脚本的函数给操作模块
@@ -202,8 +302,14 @@ class ScriptManager:
         
         result = self.script_operations.update_script_metadata(script_id, metadata_changes, get_script_by_id_func)
         if result['success']:
-            # 重新发现脚本以更新内存中的数据
-            self.discover_scripts()
+            # 文件已被改写，显式作废缓存条目（避免同尺寸改写落在粗粒度 mtime 精度内被误判为命中）
+            script = self.get_script_by_id(script_id)
+            if script:
+                self.script_discovery.metadata_cache.invalidate(script['file_path'])
+                # 只重新读取这一个文件夹以更新内存中的数据
+                self.apply_folder_changes([Path(script['file_path']).parent.name])
+            else:
+                self.discover_scripts()
         return result
 
     def rename_script_folder(self, script_id, new_name):
@@ -212,15 +318,18 @@ class ScriptManager:
         def get_script_by_id_func(id):
             return self.get_script_by_id(id)
         
+        script = self.get_script_by_id(script_id)
+        old_folder_name = Path(script['file_path']).parent.name if script else None
         result = self.script_operations.rename_script_folder(script_id, new_name, get_script_by_id_func)
         
         if result.get('success'):
             # 1. 首先，保存已在 script_operations 中被原子化修改的 user_preferences
             self.save_user_preferences(self.user_preferences)
             
-            # 2. 然后，重新发现脚本。此时 discover_scripts 会读到刚保存的正确状态，
-            #    从而正确排序，不会再把重命名的脚本视为新脚本。
-            self.discover_scripts()
+            # 2. 然后，只刷新新旧两个文件夹。此时 id_mappings 已指向原ID，
+            #    重命名的脚本会保持原有ID和排序位置，不会被视为新脚本。
+            if result.get('new_name') and old_folder_name:
+                self.apply_folder_changes([old_folder_name, result['new_name']])
             
         return result
 
@@ -271,8 +380,8 @@ class ScriptManager:
             # 4. 保存更新后的配置
             self.save_user_preferences(self.user_preferences)
 
-            # 5. 重新扫描脚本以更新内存状态
-            self.discover_scripts()
+            # 5. 刷新被删除的文件夹以更新内存状态
+            self.apply_folder_changes([folder_name])
 
             return {"success": True, "message": f"脚本 '{folder_name}' 已被删除。"}
         except Exception as e:
@@ -300,6 +409,8 @@ class ScriptManager:
                 category_order = layout_prefs.setdefault('categoryOrder', [])
                 if value not in category_order:
                     category_order.append(value)
+
+            self._set_script_category(script_id, value)
             
             # 2. (修复BUG 1) 将分类变更同步写回 .py 文件
             try:
@@ -2,30 +2,33 @@
 脚本组织管理器 - 负责脚本排序和分类管理
 """
 from typing import List, Dict, Any, Optional
+from core.script_registry import ScriptRegistry
 
 
 class ScriptOrganization:
-    def __init__(self, user_preferences):
+    def __init__(self, user_preferences, registry: Optional[ScriptRegistry] = None):
         self.user_preferences = user_preferences
-        self.scripts = []
+        self.registry = registry if registry is not None else ScriptRegistry()
+
+    @property
+    def scripts(self) -> List[Dict[str, Any]]:
+        """由 ScriptManager 发现并加载的脚本列表"""
+        return self.registry.scripts
+
+    @scripts.setter
+    def scripts(self, scripts_list):
+        self.registry.replace_all(scripts_list)
 
     def get_categories(self) -> List[str]:
-        """获取所有分类"""
-        categories = set()
-        for script in self.scripts:
-            category = script.get('category', '未分类')
-            categories.add(category)
-        return sorted(list(categories))
+        """获取所有分类（由注册表的分类索引直接给出）"""
+        return self.registry.categories()
 
-    def search_scripts(self, query: str) -> List[Dict[str, Any]]:
-        """搜索脚本"""
-        query = query.lower()
-        results = []
-        for script in self.scripts:
-            if (query in script.get('name', '').lower() or 
-                query in script.get('description', '').lower() or 
-                query in script.get('category', '').lower()):
-                results.append(script)
+    def search_scripts(self, query: str, limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+        """搜索脚本（按相关度排序），空查询返回全部脚本"""
+        if not query or not query.strip():
+            scripts = self.scripts[offset:]
+            return scripts if limit is None else scripts[:limit]
+        results, _total = self.registry.search(query, limit=limit, offset=offset)
         return results
 
     def add_custom_category(self, category_name):
@@ -119,11 +122,4 @@ class ScriptOrganization:
         获取所有在脚本文件（元数据）中直接定义的分类。
         这用于区分是脚本自带的分类还是用户后加的纯自定义分类。
         """
-        categories = set()
-        # self.scripts 是由 ScriptManager 发现并加载的脚本列表
-        for script in self.scripts:
-            # script_discovery.py确保了元数据中总是有'category'键
-            category = script.get('category')
-            if category:
-                categories.add(category)
-        return categories
\ No newline at end of file
+        return self.registry.defined_categories()
\ No newline at end of file
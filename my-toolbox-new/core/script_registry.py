@@ -0,0 +1,168 @@
+"""
+脚本注册表 - 在内存中维护有序的脚本列表，以及按 ID、文件夹名和分类建立的索引
+"""
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterable
+from core.search_index import ScriptSearchIndex
+
+# 没有声明分类的脚本在分类列表中显示的名称
+UNCATEGORIZED = '未分类'
+
+# reindex_category 未指定分类时的占位值（None 本身是合法的分类键）
+MISSING = object()
+
+
+class ScriptRegistry:
+    def __init__(self):
+        self._scripts: List[Dict[str, Any]] = []
+        # 脚本ID -> 在有序列表中的下标，替换/删除时不必线性查找
+        self._positions: Dict[str, int] = {}
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        self._by_folder: Dict[str, Dict[str, Any]] = {}
+        # 分类 -> {脚本ID: 脚本}，分类键为元数据中的原始值（未声明时为 None）
+        self._by_category: Dict[Optional[str], Dict[str, Dict[str, Any]]] = {}
+        # 脚本ID -> 建立索引时的分类键，用于在分类被原地修改后找到旧的索引位置
+        self._category_of: Dict[str, Optional[str]] = {}
+        # 全文搜索索引随注册表的增删改同步更新
+        self.search_index = ScriptSearchIndex()
+
+    @property
+    def scripts(self) -> List[Dict[str, Any]]:
+        """按当前排序返回的脚本列表"""
+        return self._scripts
+
+    def __len__(self):
+        return len(self._scripts)
+
+    def __contains__(self, script_id):
+        return script_id in self._by_id
+
+    def replace_all(self, scripts: Iterable[Dict[str, Any]]):
+        """用新的有序脚本列表整体重建索引"""
+        self._scripts = list(scripts)
+        previous_ids = set(self._by_id)
+        self._by_id = {}
+        self._by_folder = {}
+        self._by_category = {}
+        self._category_of = {}
+        for script in self._scripts:
+            self._index(script)
+        self._rebuild_positions()
+        # 搜索索引按内容增量更新：未变化的脚本不会重新分词
+        for script_id in previous_ids - self._by_id.keys():
+            self.search_index.remove(script_id)
+
+    def get(self, script_id: str) -> Optional[Dict[str, Any]]:
+        return self._by_id.get(script_id)
+
+    def get_by_folder(self, folder_name: str) -> Optional[Dict[str, Any]]:
+        return self._by_folder.get(folder_name)
+
+    def upsert(self, script: Dict[str, Any]):
+        """新增或替换一个脚本：已存在时保持其在列表中的位置，否则追加到末尾"""
+        existing = self._by_id.get(script['id'])
+        if existing is not None:
+            self._unindex(existing)
+            self._scripts[self._position(existing)] = script
+        else:
+            self._positions[script['id']] = len(self._scripts)
+            self._scripts.append(script)
+        self._index(script)
+
+    def remove(self, script_id: str) -> Optional[Dict[str, Any]]:
+        """移除一个脚本并返回它（不存在时返回 None）"""
+        script = self._by_id.get(script_id)
+        if script is None:
+            return None
+        self._unindex(script)
+        position = self._positions.pop(script_id)
+        del self._scripts[position]
+        # 后面的脚本整体前移一位
+        for item in self._scripts[position:]:
+            self._positions[item['id']] -= 1
+        return script
+
+    def reorder(self, order_list: List[str]):
+        """按给定的 ID 顺序重排，未出现在列表中的脚本保持相对顺序排在最后"""
+        order_map = {script_id: index for index, script_id in enumerate(order_list)}
+        self._scripts.sort(key=lambda s: order_map.get(s['id'], float('inf')))
+        self._rebuild_positions()
+
+    def reindex_category(self, script_id: str, category=MISSING):
+        """
+        更新脚本在分类索引中的位置。
+        :param category: 生效的分类（例如用户配置覆盖的分类），省略时使用脚本字典中的 category 字段
+        """
+        script = self._by_id.get(script_id)
+        if script is None:
+            return
+        old_category = self._category_of.get(script_id)
+        new_category = script.get('category') if category is MISSING else category
+        if old_category == new_category:
+            return
+        self._drop_from_category(old_category, script_id)
+        self._by_category.setdefault(new_category, {})[script_id] = script
+        self._category_of[script_id] = new_category
+        self.search_index.add(script)
+
+    def category_of(self, script_id: str) -> Optional[str]:
+        """脚本当前在分类索引中的分类"""
+        return self._category_of.get(script_id)
+
+    def categories(self) -> List[str]:
+        """所有脚本使用到的分类（未声明分类的脚本归入“未分类”），按名称排序"""
+        return sorted({UNCATEGORIZED if category is None else category for category in self._by_category})
+
+    def defined_categories(self) -> set:
+        """脚本元数据中明确声明（非空）的分类集合"""
+        return {category for category in self._by_category if category}
+
+    def scripts_in_category(self, category: str) -> List[Dict[str, Any]]:
+        """某个分类下的脚本（按加入索引的顺序）"""
+        members = list(self._by_category.get(category, {}).values())
+        if category == UNCATEGORIZED:
+            members += list(self._by_category.get(None, {}).values())
+        return members
+
+    def search(self, query: str, limit: Optional[int] = None, offset: int = 0):
+        """全文搜索，返回 (按相关度排序的脚本列表, 命中总数)"""
+        script_ids, total = self.search_index.search(query, limit=limit, offset=offset)
+        return [self._by_id[script_id] for script_id in script_ids if script_id in self._by_id], total
+
+    def _position(self, script: Dict[str, Any]) -> int:
+        position = self._positions.get(script['id'])
+        if position is None or self._scripts[position] is not script:
+            raise ValueError(f"脚本 {script['id']} 不在注册表中")
+        return position
+
+    def _rebuild_positions(self):
+        self._positions = {script['id']: index for index, script in enumerate(self._scripts)}
+
+    def _index(self, script: Dict[str, Any]):
+        script_id = script['id']
+        category = script.get('category')
+        self._by_id[script_id] = script
+        self._by_folder[self._folder_name(script)] = script
+        self._by_category.setdefault(category, {})[script_id] = script
+        self._category_of[script_id] = category
+        self.search_index.add(script)
+
+    def _unindex(self, script: Dict[str, Any]):
+        script_id = script['id']
+        self._by_id.pop(script_id, None)
+        folder_name = self._folder_name(script)
+        if self._by_folder.get(folder_name) is script:
+            del self._by_folder[folder_name]
+        self._drop_from_category(self._category_of.pop(script_id, None), script_id)
+        self.search_index.remove(script_id)
+
+    def _drop_from_category(self, category: Optional[str], script_id: str):
+        members = self._by_category.get(category)
+        if members is not None:
+            members.pop(script_id, None)
+            if not members:
+                del self._by_category[category]
+
+    @staticmethod
+    def _folder_name(script: Dict[str, Any]) -> str:
+        return Path(script['file_path']).parent.name
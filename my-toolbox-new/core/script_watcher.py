@@ -0,0 +1,203 @@
+"""
+脚本目录监视器 - 监听 scripts 目录的变化，并以文件夹为单位汇报变更
+优先使用 watchdog（inotify / ReadDirectoryChangesW / FSEvents），未安装时退回到定时快照比对，快照间隔随扫描耗时放宽
+"""
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional, Set, Tuple
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+# 变更不会触发脚本列表更新的子路径
+IGNORED_NAMES = {'__pycache__'}
+
+# 轮询模式下扫描耗时占比的上限：一次快照耗时 t 秒时，至少间隔 t * POLL_COST_FACTOR 秒再扫描
+POLL_COST_FACTOR = 20
+# 随脚本库规模放宽后的最长轮询间隔（秒）
+MAX_POLL_INTERVAL = 30.0
+
+
+class _FolderEventHandler(FileSystemEventHandler):
+    """把 watchdog 的文件事件映射为顶层脚本文件夹名"""
+    def __init__(self, watcher: "ScriptWatcher"):
+        super().__init__()
+        self._watcher = watcher
+
+    def on_any_event(self, event):
+        for path in (getattr(event, 'src_path', None), getattr(event, 'dest_path', None)):
+            if path:
+                self._watcher._mark_path(path)
+
+
+class ScriptWatcher:
+    def __init__(self, scripts_dir: Path, on_change: Callable[[Set[str]], None],
+                 poll_interval: float = 2.0, debounce: float = 0.3,
+                 on_idle: Optional[Callable[[], None]] = None, idle_delay: float = 5.0):
+        """
+        :param on_change: 回调，参数为发生变化的脚本文件夹名集合（在监视线程中调用）
+        :param poll_interval: 轮询模式下两次快照的最短间隔（秒），脚本库较大、快照耗时较长时自动放宽
+        :param debounce: 事件模式下合并连续事件的静默时间（秒）
+        :param on_idle: 回调，最近一次变更后静默 idle_delay 秒时调用一次（在监视线程中调用），
+                        用于把增量刷新积累的改动批量持久化
+        """
+        self._scripts_dir = Path(scripts_dir)
+        self._on_change = on_change
+        self._poll_interval = poll_interval
+        self._debounce = debounce
+        self._on_idle = on_idle
+        self._idle_delay = idle_delay
+        # 最近一次变更之后是否还没有调用过 on_idle
+        self._idle_pending = False
+
+        self._pending: Set[str] = set()
+        self._pending_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._observer = None
+        self._snapshot: Dict[str, Tuple[int, int, int]] = {}
+
+    @property
+    def mode(self) -> str:
+        """当前的监视方式：'events'、'polling' 或 'stopped'"""
+        if self._thread is None:
+            return 'stopped'
+        return 'events' if self._observer is not None else 'polling'
+
+    def start(self):
+        """启动监视（重复调用无副作用）"""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+
+        if Observer is not None:
+            try:
+                observer = Observer()
+                observer.schedule(_FolderEventHandler(self), str(self._scripts_dir), recursive=True)
+                observer.daemon = True
+                observer.start()
+                self._observer = observer
+                target = self._dispatch_loop
+            except Exception as e:
+                print(f"启动文件系统事件监听失败，改用轮询模式: {e}")
+                self._observer = None
+                target = self._poll_loop
+        else:
+            target = self._poll_loop
+
+        if target == self._poll_loop:
+            self._snapshot = self._take_snapshot()
+
+        self._thread = threading.Thread(target=target, name="ScriptWatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止监视并等待后台线程退出"""
+        self._stop_event.set()
+        self._pending_event.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=2)
+            self._observer = None
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    # --- 事件模式 ---
+
+    def _mark_path(self, path: str):
+        """记录一个发生变化的路径所属的顶层脚本文件夹"""
+        try:
+            relative = Path(path).relative_to(self._scripts_dir)
+        except ValueError:
+            return
+        parts = relative.parts
+        if not parts or any(part in IGNORED_NAMES for part in parts):
+            return
+        with self._lock:
+            self._pending.add(parts[0])
+        self._pending_event.set()
+
+    def _dispatch_loop(self):
+        """等待事件，静默 debounce 秒后把累积的文件夹一次性交给回调"""
+        while not self._stop_event.is_set():
+            if self._idle_pending:
+                if not self._pending_event.wait(self._idle_delay):
+                    self._notify_idle()
+                    continue
+            else:
+                self._pending_event.wait()
+            # 合并一次保存/复制操作产生的连续事件
+            while not self._stop_event.is_set():
+                self._pending_event.clear()
+                if not self._pending_event.wait(self._debounce):
+                    break
+            if self._stop_event.is_set():
+                break
+            with self._lock:
+                changed, self._pending = self._pending, set()
+            if changed:
+                self._notify(changed)
+
+    # --- 轮询模式 ---
+
+    def _take_snapshot(self) -> Dict[str, Tuple[int, int, int]]:
+        """记录每个脚本文件夹的 (文件夹 mtime, main.py mtime, main.py 大小)"""
+        snapshot = {}
+        try:
+            with os.scandir(self._scripts_dir) as entries:
+                for entry in entries:
+                    if entry.name in IGNORED_NAMES or not entry.is_dir():
+                        continue
+                    try:
+                        folder_mtime = entry.stat().st_mtime_ns
+                    except OSError:
+                        continue
+                    try:
+                        main_stat = os.stat(os.path.join(entry.path, 'main.py'))
+                        snapshot[entry.name] = (folder_mtime, main_stat.st_mtime_ns, main_stat.st_size)
+                    except OSError:
+                        snapshot[entry.name] = (folder_mtime, 0, -1)
+        except OSError:
+            pass
+        return snapshot
+
+    def _poll_loop(self):
+        """定时比对快照，找出新增、删除或修改过的文件夹"""
+        last_change = 0.0
+        interval = self._poll_interval
+        while not self._stop_event.wait(interval):
+            started = time.monotonic()
+            snapshot = self._take_snapshot()
+            interval = min(MAX_POLL_INTERVAL,
+                           max(self._poll_interval, (time.monotonic() - started) * POLL_COST_FACTOR))
+            previous = self._snapshot
+            changed = {name for name in snapshot.keys() | previous.keys()
+                       if snapshot.get(name) != previous.get(name)}
+            self._snapshot = snapshot
+            if changed:
+                self._notify(changed)
+                last_change = time.monotonic()
+            elif self._idle_pending and time.monotonic() - last_change >= self._idle_delay:
+                self._notify_idle()
+
+    def _notify(self, changed: Set[str]):
+        try:
+            self._on_change(changed)
+        except Exception as e:
+            print(f"处理脚本目录变更时出错: {e}")
+        self._idle_pending = self._on_idle is not None
+
+    def _notify_idle(self):
+        self._idle_pending = False
+        try:
+            self._on_idle()
+        except Exception as e:
+            print(f"脚本目录空闲处理时出错: {e}")
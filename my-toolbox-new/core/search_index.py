@@ -0,0 +1,325 @@
+"""
+脚本搜索索引 - 基于倒排索引的全文搜索
+中文按单字和双字 n-gram 建索引，其他文字（含带重音的拉丁字母、西里尔字母等）按单词建索引并支持前缀匹配，
+词表另有三字母 n-gram 索引用于子串匹配（如 "vert" 命中 "converter"），结果按字段权重排序
+"""
+import bisect
+import re
+from collections import OrderedDict
+from itertools import compress, islice
+from typing import List, Dict, Any, Optional, Tuple
+
+# 字段权重：命中名称比命中描述更相关
+FIELD_WEIGHTS = {
+    'name': 5.0,
+    'category': 3.0,
+    'description': 2.0,
+    'parameters': 1.0,
+    'dependencies': 1.0,
+}
+
+# 最近查询结果缓存的条目数（连续输入、退格和翻页会重复相同的查询）
+QUERY_CACHE_SIZE = 64
+
+# 前缀命中与子串命中相对完整命中的得分折扣
+PREFIX_FACTOR = 0.8
+SUBSTRING_FACTOR = 0.5
+
+# 子串匹配所需的最短查询词长度（更短的词只做完整和前缀匹配），即词表 n-gram 的长度
+SUBSTRING_MIN_LENGTH = 3
+
+# CJK 统一表意文字、扩展A、兼容表意文字及日文假名、韩文音节
+_CJK_CHARS = '぀-ヿ㐀-䶿一-鿿가-힯豈-﫿'
+# 单词为除下划线和上述文字以外的 Unicode 字母数字（文本先 casefold），如 "café"、"qrcode"
+_TOKEN_PATTERN = re.compile(rf'([{_CJK_CHARS}]+)|([^\W_{_CJK_CHARS}]+)')
+_CJK_CHAR = re.compile(rf'[{_CJK_CHARS}]')
+
+
+def _cjk_ngrams(run: str) -> List[str]:
+    """中文文本的单字和相邻双字"""
+    grams = list(run)
+    grams.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return grams
+
+
+def tokenize_text(text: str) -> List[str]:
+    """索引端分词：中文生成单字+双字，其他文字按字母数字切分为单词"""
+    terms = []
+    for cjk, word in _TOKEN_PATTERN.findall(str(text).casefold()):
+        if cjk:
+            terms.extend(_cjk_ngrams(cjk))
+        else:
+            terms.append(word)
+    return terms
+
+
+def tokenize_query(query: str) -> List[Tuple[str, bool]]:
+    """
+    查询端分词，返回 (词项, 是否为单词) 列表。
+    中文连续片段拆为双字（单个汉字保持单字），所有词项之间为“与”关系。
+    """
+    terms = []
+    for cjk, word in _TOKEN_PATTERN.findall(query.casefold()):
+        if cjk:
+            if len(cjk) == 1:
+                terms.append((cjk, False))
+            else:
+                terms.extend((cjk[i:i + 2], False) for i in range(len(cjk) - 1))
+        else:
+            terms.append((word, True))
+    # 去重但保持顺序
+    return list(dict.fromkeys(terms))
+
+
+def _is_word(term: str) -> bool:
+    """词项是否为单词（而不是中文 n-gram）"""
+    return _CJK_CHAR.match(term) is None
+
+
+# 把 bin() 的 "0"/"1" 字符转换为 0/1 字节，作为 itertools.compress 的选择器
+_BIT_FLAGS = bytes.maketrans(b'01', b'\x00\x01')
+
+
+def _popcount(mask: int) -> int:
+    return bin(mask).count('1')
+
+
+def _bit_flags(mask: int) -> bytes:
+    """位图的每一位对应一个 0/1 字节（从低位起），全部在内置函数中完成"""
+    return bin(mask)[:1:-1].encode('ascii').translate(_BIT_FLAGS)
+
+
+def _trigrams(term: str) -> set:
+    return {term[i:i + SUBSTRING_MIN_LENGTH] for i in range(len(term) - SUBSTRING_MIN_LENGTH + 1)}
+
+
+class ScriptSearchIndex:
+    """
+    倒排表按得分分组保存为位图：词项 -> {得分: 位图}，位图的第 n 位表示第 n 个加入的脚本。
+    求交、合并前缀/子串命中和按得分分组都是整数位运算，与命中数量几乎无关；
+    结果按得分降序、同分按加入顺序（即位序）排列，只从位图中取出当前页需要的脚本。
+    """
+    def __init__(self):
+        # 词项 -> {得分: 该词项得分为此值的脚本位图}
+        self._postings: Dict[str, Dict[float, int]] = {}
+        # 排好序的单词词表，用于二分查找前缀
+        self._word_terms: List[str] = []
+        # 三字母 n-gram -> 包含它的单词，用于子串匹配时只检查少量候选词
+        self._term_grams: Dict[str, set] = {}
+        # 脚本ID -> 该脚本贡献的词项，删除时据此清理倒排表
+        self._doc_terms: Dict[str, Dict[str, float]] = {}
+        # 脚本ID -> 建索引时各字段的文本，内容未变时跳过重建
+        self._doc_fingerprints: Dict[str, tuple] = {}
+        # 脚本ID <-> 位序（即加入顺序，更新时保持不变，得分相同时按此排序以保证结果稳定）
+        self._doc_bits: Dict[str, int] = {}
+        self._bit_docs: List[Optional[str]] = []
+        # 查询词项 -> [索引版本, 按得分降序的 [(得分, 位图)], 命中总数, 取过全部结果时的脚本ID列表]；
+        # 任何增删改都会使版本号递增
+        self._query_cache: "OrderedDict[tuple, list]" = OrderedDict()
+        self._version = 0
+
+    def __len__(self):
+        return len(self._doc_terms)
+
+    def add(self, script: Dict[str, Any]):
+        """新增或更新一个脚本的索引（内容未变化时直接返回）"""
+        script_id = script['id']
+        fields = self._extract_fields(script)
+        if self._doc_fingerprints.get(script_id) == fields:
+            return
+        self._version += 1
+        if script_id in self._doc_terms:
+            self._drop_postings(script_id)
+
+        term_scores: Dict[str, float] = {}
+        for field_name, text in zip(FIELD_WEIGHTS, fields):
+            weight = FIELD_WEIGHTS[field_name]
+            for term in tokenize_text(text):
+                term_scores[term] = term_scores.get(term, 0.0) + weight
+
+        bit_index = self._doc_bits.get(script_id)
+        if bit_index is None:
+            bit_index = self._doc_bits[script_id] = len(self._bit_docs)
+            self._bit_docs.append(script_id)
+        bit = 1 << bit_index
+        for term, score in term_scores.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                if _is_word(term):
+                    self._add_word(term)
+            postings[score] = postings.get(score, 0) | bit
+
+        self._doc_terms[script_id] = term_scores
+        self._doc_fingerprints[script_id] = fields
+
+    def remove(self, script_id: str):
+        """从索引中移除一个脚本（其位序不再复用）"""
+        if script_id not in self._doc_terms:
+            return
+        self._version += 1
+        self._drop_postings(script_id)
+        del self._doc_terms[script_id]
+        self._doc_fingerprints.pop(script_id, None)
+        self._bit_docs[self._doc_bits.pop(script_id)] = None
+
+    def search(self, query: str, limit: Optional[int] = None, offset: int = 0) -> Tuple[List[str], int]:
+        """
+        搜索并按相关度排序。
+        :return: (当前页的脚本ID列表, 命中总数)
+        """
+        terms = tokenize_query(query)
+        if not terms:
+            return [], 0
+
+        cache_key = tuple(terms)
+        cached = self._query_cache.get(cache_key)
+        if cached is not None and cached[0] == self._version:
+            self._query_cache.move_to_end(cache_key)
+        else:
+            ranked = self._rank(terms)
+            cached = [self._version, ranked, sum(_popcount(mask) for _score, mask in ranked), None]
+            self._query_cache[cache_key] = cached
+            if len(self._query_cache) > QUERY_CACHE_SIZE:
+                self._query_cache.popitem(last=False)
+        _version, ranked, total, all_ids = cached
+        if all_ids is not None:
+            return all_ids[offset:None if limit is None else offset + limit], total
+        if limit is None and offset <= 0:
+            # 取全部结果时保存下来，之后的相同查询和翻页直接切片
+            cached[3] = self._page(ranked, 0, None)
+            return cached[3], total
+        return self._page(ranked, offset, limit), total
+
+    def _rank(self, terms: List[Tuple[str, bool]]) -> List[Tuple[float, int]]:
+        """所有词项都命中的脚本按总得分分组，返回按得分降序的 [(得分, 位图)]，各位图互不相交"""
+        combined = None
+        for term, is_word in terms:
+            groups = self._match_term(term, is_word)
+            if combined is None:
+                combined = groups
+                continue
+            # 所有词项都必须命中：两边的得分分组两两求交，总得分相同的合并
+            merged: Dict[float, int] = {}
+            for score, mask in combined.items():
+                for term_score, term_mask in groups.items():
+                    both = mask & term_mask
+                    if both:
+                        total = round(score + term_score, 6)
+                        merged[total] = merged.get(total, 0) | both
+            combined = merged
+            if not combined:
+                return []
+        return sorted(combined.items(), reverse=True)
+
+    def _page(self, ranked: List[Tuple[float, int]], offset: int, limit: Optional[int]) -> List[str]:
+        """按顺序从各得分分组的位图中取出第 offset 个起的至多 limit 个脚本ID"""
+        result: List[str] = []
+        skip = max(0, offset)
+        for _score, mask in ranked:
+            if limit is not None and len(result) >= limit:
+                break
+            count = _popcount(mask)
+            if skip >= count:
+                skip -= count
+                continue
+            stop = None if limit is None else skip + limit - len(result)
+            result.extend(islice(compress(self._bit_docs, _bit_flags(mask)), skip, stop))
+            skip = 0
+        return result
+
+    def _match_term(self, term: str, is_word: bool) -> Dict[float, int]:
+        """
+        单个查询词项命中的脚本按得分分组：完整命中 > 前缀命中 > 子串命中，
+        同一脚本通过多个词命中时取最高得分
+        """
+        exact = self._postings.get(term, {})
+        if not is_word:
+            return exact
+
+        weighted = list(exact.items())
+        start = bisect.bisect_left(self._word_terms, term)
+        for index in range(start, len(self._word_terms)):
+            candidate = self._word_terms[index]
+            if not candidate.startswith(term):
+                break
+            if candidate != term:
+                weighted.extend((score * PREFIX_FACTOR, mask) for score, mask in self._postings[candidate].items())
+
+        # 子串命中（如 "vert" 命中 "converter"）始终参与合并，与旧的子串搜索语义一致，
+        # 命中结果不会因为新增了其他完整或前缀命中的脚本而消失；候选词通过 n-gram 索引取得，不扫描整个词表
+        for candidate in self._substring_candidates(term):
+            if term in candidate and not candidate.startswith(term):
+                weighted.extend((score * SUBSTRING_FACTOR, mask) for score, mask in self._postings[candidate].items())
+
+        groups: Dict[float, int] = {}
+        seen = 0
+        for score, mask in sorted(weighted, key=lambda item: item[0], reverse=True):
+            mask &= ~seen
+            if mask:
+                seen |= mask
+                score = round(score, 6)
+                groups[score] = groups.get(score, 0) | mask
+        return groups
+
+    def _substring_candidates(self, term: str) -> set:
+        """包含 term 的全部 n-gram 的单词（短于 SUBSTRING_MIN_LENGTH 的词不做子串匹配）"""
+        if len(term) < SUBSTRING_MIN_LENGTH:
+            return set()
+        gram_sets = []
+        for gram in _trigrams(term):
+            terms = self._term_grams.get(gram)
+            if not terms:
+                return set()
+            gram_sets.append(terms)
+        gram_sets.sort(key=len)
+        return gram_sets[0].intersection(*gram_sets[1:])
+
+    def _add_word(self, term: str):
+        bisect.insort(self._word_terms, term)
+        for gram in _trigrams(term):
+            self._term_grams.setdefault(gram, set()).add(term)
+
+    def _remove_word(self, term: str):
+        index = bisect.bisect_left(self._word_terms, term)
+        if index < len(self._word_terms) and self._word_terms[index] == term:
+            del self._word_terms[index]
+        for gram in _trigrams(term):
+            terms = self._term_grams.get(gram)
+            if terms is not None:
+                terms.discard(term)
+                if not terms:
+                    del self._term_grams[gram]
+
+    def _drop_postings(self, script_id: str):
+        keep = ~(1 << self._doc_bits[script_id])
+        for term, score in self._doc_terms.get(script_id, {}).items():
+            postings = self._postings.get(term)
+            if postings is None or score not in postings:
+                continue
+            mask = postings[score] & keep
+            if mask:
+                postings[score] = mask
+                continue
+            del postings[score]
+            if not postings:
+                del self._postings[term]
+                if _is_word(term):
+                    self._remove_word(term)
+
+    @staticmethod
+    def _extract_fields(script: Dict[str, Any]) -> tuple:
+        """按 FIELD_WEIGHTS 的顺序取出参与索引的文本"""
+        parameter_texts = []
+        for param in script.get('parameters') or []:
+            if isinstance(param, dict):
+                parameter_texts.append(str(param.get('label', '')))
+                parameter_texts.append(str(param.get('name', '')))
+        dependencies = script.get('dependencies') or []
+        return (
+            str(script.get('name', '')),
+            str(script.get('category', '') or ''),
+            str(script.get('description', '') or ''),
+            ' '.join(parameter_texts),
+            ' '.join(str(dep) for dep in dependencies),
+        )
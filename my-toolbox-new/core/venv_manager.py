@@ -9,7 +9,11 @@ import json
 import shutil
 from typing import Optional
 from packaging.requirements import Requirement
+from packaging.utils import canonicalize_name
 from packaging.version import parse as parse_version
+from core.package_inventory import PackageInventory
+from core.venv_template import VenvTemplate
+from core.wheelhouse import Wheelhouse
 
 
 class VenvManager:
@@ -17,6 +21,12 @@ class VenvManager:
         self._venvs_dir = base_dir / "venvs"
         self._venvs_dir.mkdir(exist_ok=True)
         self._config_file = self._venvs_dir / "venvs.json"
+        # 已安装包清单直接读取 site-packages 中的元数据，按虚拟环境缓存
+        self.package_inventory = PackageInventory()
+        # 新环境从预先构建的模板环境复制，不再每次运行 venv 和 ensurepip
+        self.venv_template = VenvTemplate(self._venvs_dir)
+        # 所有环境共用的本地 wheel 仓库，安装时优先使用
+        self.wheelhouse = Wheelhouse(self._venvs_dir / "wheelhouse")
         self.venvs_config = self._load_config()
         self._ensure_default_venv()
 
@@ -59,6 +69,11 @@ class VenvManager:
 
         if not python_executable.exists() or not pip_executable.exists():
             print(f"默认虚拟环境不存在或已损坏，正在重新创建于: {default_venv_path}")
+            clone_result = self.venv_template.clone(default_venv_path)
+            if clone_result['success']:
+                print("默认虚拟环境创建/修复成功。")
+                return
+            print(f"{clone_result['error']}，改为直接创建。")
             try:
                 # 使用 --clear 标志可以安全地覆盖不完整的环境
                 subprocess.run(
@@ -91,11 +106,19 @@ class VenvManager:
             return venv_path / "bin" / "pip"
 
     def list_packages(self, venv_name: str):
-        """列出指定虚拟环境中已安装的包"""
+        """列出指定虚拟环境中已安装的包（读取 site-packages 中的元数据，不启动 pip）"""
         if venv_name not in self.venvs_config['venvs']:
             return {"success": False, "error": "虚拟环境不存在。"}
 
         venv_path = Path(self.venvs_config['venvs'][venv_name]['path'])
+        packages = self.package_inventory.get_packages(venv_path)
+        if packages is not None:
+            return {"success": True, "packages": packages}
+        # 找不到 site-packages 目录（非标准布局）时退回到 pip list
+        return self._pip_list_packages(venv_path)
+
+    def _pip_list_packages(self, venv_path: Path):
+        """通过 pip list 列出已安装的包"""
         pip_executable = self._get_pip_executable_path(venv_path)
 
         if not pip_executable.exists():
@@ -118,21 +141,52 @@ class VenvManager:
 
     def install_package(self, venv_name: str, package_spec: str):
         """构建用于安装包的命令列表"""
-        if venv_name not in self.venvs_config['venvs']:
+        return self.install_packages(venv_name, [package_spec])
+
+    def install_packages(self, venv_name: str, package_specs: list[str]):
+        """构建一次安装多个包的命令列表（pip 只解析一次依赖）"""
+        if venv_name not in self.venvs_config['venvs'] or not package_specs:
             return None
         python_executable = self.get_python_executable_for_venv(venv_name)
         if not python_executable:
             return None
-        return [str(python_executable), "-m", "pip", "install", "--upgrade", package_spec]
+        return [str(python_executable), "-m", "pip", "install", "--upgrade"] + list(package_specs)
 
     def uninstall_package(self, venv_name: str, package_name: str):
         """构建用于卸载包的命令列表"""
-        if venv_name not in self.venvs_config['venvs']:
+        return self.uninstall_packages(venv_name, [package_name])
+
+    def uninstall_packages(self, venv_name: str, package_names: list[str]):
+        """构建一次卸载多个包的命令列表"""
+        if venv_name not in self.venvs_config['venvs'] or not package_names:
+            return None
+        python_executable = self.get_python_executable_for_venv(venv_name)
+        if not python_executable:
+            return None
+        return [str(python_executable), "-m", "pip", "uninstall"] + list(package_names) + ["-y"]
+
+    def package_plan(self, venv_name: str, operation: str, packages: list[str]):
+        """
+        按操作类型（'install' 或 'uninstall'）构建 pip 的执行方案（若干次尝试，每次尝试为命令列表）
+        安装优先从本地 wheel 仓库离线安装，缺少 wheel 时先把它们下载/构建到仓库中
+        """
+        if operation == 'uninstall':
+            command = self.uninstall_packages(venv_name, packages)
+            return [[command]] if command else None
+        if venv_name not in self.venvs_config['venvs'] or not packages:
             return None
         python_executable = self.get_python_executable_for_venv(venv_name)
         if not python_executable:
             return None
-        return [str(python_executable), "-m", "pip", "uninstall", package_name, "-y"]
+        return self.wheelhouse.install_plan(python_executable, packages)
+
+    def record_package_operation(self, venv_name: str, operation: str, packages: list[str], result: dict):
+        """包操作完成后更新 wheel 仓库的命中统计和使用时间"""
+        if operation != 'install' or venv_name not in self.venvs_config['venvs']:
+            return
+        venv_path = Path(self.venvs_config['venvs'][venv_name]['path'])
+        attempt = result.get('attempt') if result.get('success') else None
+        self.wheelhouse.record_install(attempt, self.package_inventory.get_versions(venv_path))
 
     def check_dependencies(self, venv_name: str, requirements: list[str]):
         """检查指定环境是否满足依赖需求"""
@@ -140,14 +194,14 @@ class VenvManager:
         if not list_result['success']:
             return list_result
 
-        installed_packages = {pkg['name'].lower().replace('_', '-'): pkg['version'] for pkg in list_result['packages']}
+        installed_packages = {canonicalize_name(pkg['name']): pkg['version'] for pkg in list_result['packages']}
         
         status_list = []
         for req_str in requirements:
             try:
                 req = Requirement(req_str)
-                # 标准化名称以进行比较 (小写并用连字符)
-                normalized_req_name = req.name.lower().replace('_', '-')
+                # 按 PEP 503 规范化名称以进行比较 (小写，'_' 和 '.' 视为 '-')
+                normalized_req_name = canonicalize_name(req.name)
                 
                 status = {
                     "requirement": req_str,
@@ -205,6 +259,7 @@ class VenvManager:
 
         try:
             old_path.rename(new_path)
+            self.package_inventory.invalidate(old_path)
             venv_info = self.venvs_config['venvs'].pop(old_name)
             venv_info['path'] = str(new_path)
             self.venvs_config['venvs'][new_name] = venv_info
@@ -223,6 +278,7 @@ class VenvManager:
         try:
             if venv_path.exists():
                 shutil.rmtree(venv_path)
+            self.package_inventory.invalidate(venv_path)
             
             del self.venvs_config['venvs'][venv_name]
             self._save_config(self.venvs_config)
@@ -267,3 +323,18 @@ class VenvManager:
         }
         
         return {"success": True, "commands": commands, "path": str(venv_path)}
+
+    def clone_venv_from_template(self, name: str):
+        """从模板复制出名为 name 的新虚拟环境并登记到配置中（不需要联网，通常不到一秒）"""
+        if not name or not name.isidentifier():
+            return {"success": False, "error": "名称无效。请使用有效的标识符（字母、数字、下划线），且不以数字开头。"}
+        if name in self.venvs_config['venvs']:
+            return {"success": False, "error": "该名称的虚拟环境已存在。"}
+
+        venv_path = self._venvs_dir / name
+        result = self.venv_template.clone(venv_path)
+        if not result['success']:
+            return result
+        self.venvs_config['venvs'][name] = {"path": str(venv_path), "editable": True}
+        self._save_config(self.venvs_config)
+        return {"success": True, "name": name, "path": str(venv_path)}
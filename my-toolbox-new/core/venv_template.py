@@ -0,0 +1,161 @@
+"""
+虚拟环境模板 - 只用 python -m venv 和 ensurepip 构建一次干净的模板环境，之后的新环境都从模板复制
+
+复制时普通文件使用硬链接（不支持时退回到复制），包含模板路径的文件（pyvenv.cfg、activate 脚本、
+pip 等入口脚本的 shebang 以及 Windows 上的 pip.exe 启动器）单独复制并把路径替换为新环境的路径。
+复制一个环境通常只需几十毫秒，不需要联网。
+构建模板的 Python 或其版本变化后模板会被重新构建。
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, Any
+
+# 模板所在的文件夹名（以点开头，不会出现在虚拟环境列表中）
+TEMPLATE_DIR_NAME = ".template"
+
+# 记录模板由哪个 Python 构建的文件
+TEMPLATE_INFO_FILE = "template.json"
+
+
+def _scripts_dir_name() -> str:
+    return "Scripts" if sys.platform == "win32" else "bin"
+
+
+class VenvTemplate:
+    def __init__(self, venvs_dir: Path, base_python: str = sys.executable):
+        """
+        :param venvs_dir: 虚拟环境根目录，模板保存在其中的 .template 文件夹
+        :param base_python: 构建模板所用的 Python
+        """
+        self._venvs_dir = Path(venvs_dir)
+        self._path = self._venvs_dir / TEMPLATE_DIR_NAME
+        self._base_python = base_python
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def is_ready(self) -> bool:
+        """模板存在、完整，且由当前的 Python 构建"""
+        info_file = self._path / TEMPLATE_INFO_FILE
+        try:
+            with open(info_file, 'r', encoding='utf-8') as f:
+                info = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return False
+        return info == self._expected_info() and self._python_path(self._path).exists()
+
+    def ensure(self) -> Dict[str, Any]:
+        """模板不可用时重新构建（需要几秒；在临时文件夹中构建完成后再替换，中途失败不留下半成品）"""
+        with self._lock:
+            if self.is_ready():
+                return {"success": True}
+            building = self._venvs_dir / (TEMPLATE_DIR_NAME + ".building")
+            try:
+                shutil.rmtree(building, ignore_errors=True)
+                subprocess.run(
+                    [self._base_python, "-m", "venv", "--clear", str(building)],
+                    capture_output=True, text=True, check=True, encoding='utf-8'
+                )
+                subprocess.run(
+                    [str(self._python_path(building)), "-m", "ensurepip", "--upgrade"],
+                    capture_output=True, text=True, check=True, encoding='utf-8'
+                )
+                with open(building / TEMPLATE_INFO_FILE, 'w', encoding='utf-8') as f:
+                    json.dump(self._expected_info(), f)
+                shutil.rmtree(self._path, ignore_errors=True)
+                # 模板文件中记录的仍是 .building 路径，复制时据此替换
+                os.replace(building, self._path)
+                return {"success": True}
+            except (subprocess.CalledProcessError, OSError) as e:
+                shutil.rmtree(building, ignore_errors=True)
+                error_message = f"构建虚拟环境模板失败: {e}"
+                if isinstance(e, subprocess.CalledProcessError):
+                    error_message += f"\n错误详情: {e.stderr}"
+                return {"success": False, "error": error_message}
+
+    def clone(self, target: Path) -> Dict[str, Any]:
+        """
+        从模板创建位于 target 的新环境（target 已存在时先删除）
+        :return: {"success": True} 或 {"success": False, "error": 错误信息}
+        """
+        ensured = self.ensure()
+        if not ensured["success"]:
+            return ensured
+        target = Path(target)
+        staging = target.with_name(target.name + ".cloning")
+        try:
+            shutil.rmtree(staging, ignore_errors=True)
+            self._copy_tree(self._path, staging,
+                            str(self._venvs_dir / (TEMPLATE_DIR_NAME + ".building")), str(target), target.name)
+            (staging / TEMPLATE_INFO_FILE).unlink(missing_ok=True)
+            shutil.rmtree(target, ignore_errors=True)
+            os.replace(staging, target)
+            return {"success": True}
+        except OSError as e:
+            shutil.rmtree(staging, ignore_errors=True)
+            return {"success": False, "error": f"从模板复制虚拟环境失败: {e}"}
+
+    def _expected_info(self) -> Dict[str, Any]:
+        base = Path(self._base_python)
+        try:
+            base = base.resolve()
+        except OSError:
+            pass
+        return {"base_python": str(base), "version": sys.version}
+
+    @staticmethod
+    def _python_path(venv_path: Path) -> Path:
+        return venv_path / _scripts_dir_name() / ("python.exe" if sys.platform == "win32" else "python")
+
+    def _copy_tree(self, source: Path, target: Path, old_prefix: str, new_prefix: str, prompt: str):
+        # 环境路径以及 activate 脚本中的命令行提示符（默认为文件夹名）
+        replacements = [
+            (old_prefix.encode('utf-8'), new_prefix.encode('utf-8')),
+            (f"({TEMPLATE_DIR_NAME}.building) ".encode('utf-8'), f"({prompt}) ".encode('utf-8')),
+        ]
+        # 只有这些位置的文件会包含环境自身的路径
+        rewrite_dirs = {source, source / _scripts_dir_name()}
+        for root, dirs, files in os.walk(source):
+            root_path = Path(root)
+            dest_root = target / root_path.relative_to(source)
+            dest_root.mkdir(parents=True, exist_ok=True)
+            for name in list(dirs):
+                src = root_path / name
+                if src.is_symlink():
+                    # 例如 lib64 -> lib，按原样重建，不进入其中
+                    dirs.remove(name)
+                    self._copy_symlink(src, dest_root / name, old_prefix, new_prefix)
+            for name in files:
+                src = root_path / name
+                dest = dest_root / name
+                if src.is_symlink():
+                    self._copy_symlink(src, dest, old_prefix, new_prefix)
+                    continue
+                if root_path in rewrite_dirs:
+                    with open(src, 'rb') as f:
+                        content = f.read()
+                    if any(old in content for old, _new in replacements):
+                        for old, new in replacements:
+                            content = content.replace(old, new)
+                        with open(dest, 'wb') as f:
+                            f.write(content)
+                        shutil.copymode(src, dest)
+                        continue
+                try:
+                    os.link(src, dest)
+                except OSError:
+                    shutil.copy2(src, dest)
+
+    @staticmethod
+    def _copy_symlink(src: Path, dest: Path, old_prefix: str, new_prefix: str):
+        link = os.readlink(src)
+        if link.startswith(old_prefix):
+            link = new_prefix + link[len(old_prefix):]
+        os.symlink(link, dest, target_is_directory=src.is_dir())
@@ -0,0 +1,34 @@
+"""
+预热的解释器进程 - 由解释器池在虚拟环境的 Python 中提前启动，等待一个运行请求
+
+从标准输入读取一行 JSON {"script": 脚本路径, "args": [参数...]}，把标准输入改接到空设备
+（与冷启动的脚本一致，脚本读不到请求之后的任何数据），然后在本进程中以 __main__ 身份运行该脚本（等同于 python main.py 参数...），运行结束后进程退出，
+每个进程只运行一次脚本，脚本之间互不影响。
+"""
+import json
+import os
+import pkgutil  # noqa: F401  runpy.run_path 运行时才导入 pkgutil（及 typing、re），在等待期间提前导入
+import runpy
+import sys
+
+
+def main():
+    line = sys.stdin.readline()
+    if not line:
+        # 解释器池关闭时直接关闭标准输入
+        return
+    request = json.loads(line)
+    # 文件描述符 0 和 sys.stdin 都换成空设备，子进程继承到的也是空设备
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.close(devnull)
+    sys.stdin = open(0, 'r', closefd=False)
+    script = request["script"]
+    sys.argv = [script] + list(request.get("args", []))
+    # 与直接运行脚本一致：脚本所在目录作为 sys.path 的第一项
+    sys.path[0] = os.path.dirname(os.path.abspath(script))
+    runpy.run_path(script, run_name="__main__")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+本地 wheel 仓库 - 所有受管虚拟环境共用的 venvs/wheelhouse 文件夹
+
+安装包时先只用仓库中的 wheel 离线安装（pip --no-index --find-links），成功即命中；
+缺少 wheel 时先用 pip wheel 把需要的包及其依赖下载/构建到仓库中，再从仓库离线安装，
+这样通过工具箱安装过的每个 wheel 都会留在仓库中，之后任何环境再安装时不需要重新下载或构建。
+离线模式下只尝试第一步，不访问网络。
+仓库按最近使用时间（安装后把环境中正在使用的 wheel 标记为最近使用）和大小上限清理。
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+from packaging.utils import canonicalize_name
+
+# 仓库大小上限，超出时从最久未使用的 wheel 开始删除
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+# 统计数据文件
+STATS_FILE = "stats.json"
+
+
+def parse_wheel_filename(file_name: str) -> Optional[Tuple[str, str]]:
+    """从 wheel 文件名（名称-版本-...-平台.whl）取出规范化的包名和版本"""
+    if not file_name.endswith('.whl'):
+        return None
+    parts = file_name[:-4].split('-')
+    if len(parts) < 5:
+        return None
+    return canonicalize_name(parts[0]), parts[1]
+
+
+class Wheelhouse:
+    def __init__(self, path: Path, offline: bool = False, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        :param offline: 为 True 时只从仓库安装，不访问网络
+        :param max_bytes: 仓库大小上限，每次有新 wheel 加入后按此清理
+        """
+        self.path = Path(path)
+        self.offline = offline
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = self._load_stats()
+        # 已计入统计的 wheel，安装后与仓库内容比较得出新加入的数量
+        self._known_wheels = self.wheel_names()
+
+    def install_plan(self, python_executable: str, package_specs: List[str]) -> List[List[List[str]]]:
+        """
+        安装命令的执行方案：若干次尝试，每次尝试是按顺序执行的命令列表，第一次全部成功的尝试即完成安装
+        第一次尝试只用仓库离线安装；非离线模式下第二次尝试先把缺少的 wheel 下载/构建到仓库再离线安装
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        python_executable = str(python_executable)
+        local_install = [python_executable, "-m", "pip", "install", "--upgrade",
+                         "--no-index", "--find-links", str(self.path)] + list(package_specs)
+        attempts = [[local_install]]
+        if not self.offline:
+            fetch = [python_executable, "-m", "pip", "wheel", "--wheel-dir", str(self.path),
+                     "--find-links", str(self.path)] + list(package_specs)
+            attempts.append([fetch, local_install])
+        return attempts
+
+    def record_install(self, attempt: Optional[int], installed: Optional[Dict[str, str]]):
+        """
+        记录一次安装的结果并把环境中正在使用的 wheel 标记为最近使用
+        :param attempt: 成功的尝试序号（0 为命中仓库），失败时为 None
+        :param installed: 安装后环境中的 规范化包名 -> 版本
+        """
+        current = self.wheel_names()
+        now = time.time()
+        for wheel in self._wheels():
+            parsed = parse_wheel_filename(wheel.name)
+            if installed and parsed and installed.get(parsed[0]) == parsed[1]:
+                try:
+                    os.utime(wheel, (now, now))
+                except OSError:
+                    pass
+        with self._lock:
+            added = len(current - self._known_wheels)
+            self._known_wheels = current
+            if attempt == 0:
+                self._stats["hits"] += 1
+            elif attempt is not None:
+                self._stats["misses"] += 1
+            else:
+                self._stats["failures"] += 1
+            self._stats["wheels_added"] += added
+            self._save_stats()
+        if added:
+            self.prune()
+
+    def wheel_names(self) -> Set[str]:
+        return {wheel.name for wheel in self._wheels()}
+
+    def prune(self, max_bytes: Optional[int] = None) -> Dict[str, Any]:
+        """从最久未使用的 wheel 开始删除，直到仓库不超过 max_bytes（默认为配置的上限）"""
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        wheels = []
+        for wheel in self._wheels():
+            try:
+                stat = wheel.stat()
+            except OSError:
+                continue
+            wheels.append((stat.st_mtime, stat.st_size, wheel))
+        wheels.sort()
+        total = sum(size for _mtime, size, _wheel in wheels)
+        removed, freed = 0, 0
+        for _mtime, size, wheel in wheels:
+            if total <= limit:
+                break
+            try:
+                wheel.unlink()
+            except OSError as e:
+                print(f"删除 wheel 失败: {e}")
+                continue
+            total -= size
+            removed += 1
+            freed += size
+        with self._lock:
+            self._stats["pruned"] += removed
+            self._known_wheels = self.wheel_names()
+            self._save_stats()
+        return {"success": True, "removed": removed, "freed_bytes": freed, "total_bytes": total}
+
+    def get_stats(self) -> Dict[str, Any]:
+        wheels = 0
+        total = 0
+        for wheel in self._wheels():
+            try:
+                total += wheel.stat().st_size
+            except OSError:
+                continue
+            wheels += 1
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": self._stats["hits"] / lookups if lookups else None,
+                "wheels": wheels,
+                "bytes": total,
+                "max_bytes": self.max_bytes,
+                "offline": self.offline,
+                "path": str(self.path),
+            }
+
+    def _wheels(self) -> List[Path]:
+        try:
+            return [entry for entry in self.path.iterdir() if entry.suffix == '.whl' and entry.is_file()]
+        except OSError:
+            return []
+
+    def _load_stats(self) -> Dict[str, int]:
+        stats = {"hits": 0, "misses": 0, "failures": 0, "wheels_added": 0, "pruned": 0}
+        try:
+            with open(self.path / STATS_FILE, 'r', encoding='utf-8') as f:
+                stats.update(json.load(f))
+        except (OSError, json.JSONDecodeError):
+            pass
+        return stats
+
+    def _save_stats(self):
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            with open(self.path / STATS_FILE, 'w', encoding='utf-8') as f:
+                json.dump(self._stats, f)
+        except OSError as e:
+            print(f"保存 wheel 仓库统计失败: {e}")
@@ -24,6 +24,7 @@ export class ScriptToolbox {
         this.scripts = [];
         this.currentCategory = 'all';
         this.searchQuery = '';
+        this.searchResultIds = null; // 后端按相关度排序的搜索结果ID
         this.selectedScript = null;
         
         this.init();
@@ -47,8 +48,9 @@ export class ScriptToolbox {
     
     setupEventListeners() {
         // 搜索功能
-        document.getElementById('search-input').addEventListener('input', (e) => {
+        document.getElementById('search-input').addEventListener('input', async (e) => {
             this.searchQuery = e.target.value.toLowerCase();
+            await this.scriptManager.updateSearchResults();
             this.scriptManager.renderScripts();
         });
         
@@ -56,6 +58,7 @@ export class ScriptToolbox {
         document.getElementById('refresh-btn').addEventListener('click', async () => {
             await this.scriptManager.loadScripts();
             await this.categoryManager.loadCategories();
+            await this.scriptManager.updateSearchResults();
             this.scriptManager.renderScripts();
         });
         
@@ -87,7 +90,11 @@ export class ScriptToolbox {
         document.getElementById('terminal-kill-btn').addEventListener('click', async () => {
             if (confirm('确定要终止当前正在运行的任务吗？')) {
                 try {
-                    const result = await window.pywebview.api.terminate_current_script();
+                    // 终止终端中当前显示的任务
+                    const jobId = this.terminalManager.activeJobId;
+                    const result = jobId
+                        ? await window.pywebview.api.terminate_job(jobId)
+                        : await window.pywebview.api.terminate_current_script();
                     if (result.success) {
                         alert('终止信号已发送！请稍候查看输出结果。');
                     } else {
@@ -113,11 +120,13 @@ export class ScriptToolbox {
     async executeScript(scriptId, params = {}) {
         // 显示终端视图
         document.getElementById('terminal-view').style.display = 'flex';
-        document.getElementById('terminal-output').innerHTML = '';
         
-        // 执行脚本
+        // 执行脚本，每次执行都是一个新任务，其他任务在后台继续运行
         try {
-            await window.pywebview.api.execute_script(scriptId, params);
+            const result = await window.pywebview.api.execute_script(scriptId, params);
+            if (result && result.success) {
+                this.terminalManager.addJob(result.job);
+            }
         } catch (error) {
             console.error('执行脚本失败:', error);
             const errorMsg = `<span style="color: red;">执行脚本时发生错误: ${error.message}</span><br>`;
@@ -171,6 +180,20 @@ export class ScriptToolbox {
     }
 }
 
+// 脚本目录变化时由后端调用，增量更新脚本列表
+window.onScriptsChanged = function(diff) {
+    if (window.scriptToolbox) {
+        window.scriptToolbox.scriptManager.applyScriptChanges(diff);
+    }
+};
+
+// 批量图标请求的结果由后端分块推送
+window.onIconsChunk = function(chunk) {
+    if (window.scriptToolbox) {
+        window.scriptToolbox.scriptManager.iconManager.applyIconChunk(chunk);
+    }
+};
+
 // 初始化应用 - 等待pywebview API准备就绪
 function initializeApp() {
     if (window.pywebview && window.pywebview.api) {
@@ -6,6 +6,14 @@ export class IconManager {
     constructor(app) {
         this.app = app;
         this.iconsCache = new Map(); // 缓存已加载的图标
+        // 卡片图标按 32px 显示，高分屏下请求对应倍数的缩略图
+        this.iconSize = Math.ceil(32 * (window.devicePixelRatio || 1));
+        // 图标路径 -> 等待该图标的卡片容器列表
+        this.pendingIcons = new Map();
+        // 已向后端请求、尚未返回的图标路径
+        this.inflightIcons = new Set();
+        this.iconFlushScheduled = false;
+        this.iconRequestSeq = 0;
     }
 
     /**
@@ -24,26 +32,110 @@ export class IconManager {
         iconContainer.innerHTML = '';
 
         if (script.icon) {
-            // 尝试加载图像图标
-            this.loadImageIcon(iconContainer, script.icon, script.name);
+            const cached = this.iconsCache.get(script.icon);
+            if (cached) {
+                this.showImageIcon(iconContainer, cached, script.name);
+            } else {
+                // 同一次渲染中的所有图标合并为一次批量请求
+                this.queueIcon(iconContainer, script.icon, script.name);
+            }
         } else {
             // 如果没有指定图标，保持为空或显示默认
             iconContainer.innerHTML = '<span class="emoji-icon">⚙️</span>';
         }
     }
 
+    /**
+     * 登记一个等待加载的图标，并在本轮渲染结束后统一发起请求
+     */
+    queueIcon(iconContainer, iconPath, scriptName) {
+        iconContainer.innerHTML = '<div class="loading-icon">⏳</div>';
+        if (!this.pendingIcons.has(iconPath)) {
+            this.pendingIcons.set(iconPath, []);
+        }
+        this.pendingIcons.get(iconPath).push({ container: iconContainer, name: scriptName });
+
+        if (!this.iconFlushScheduled) {
+            this.iconFlushScheduled = true;
+            queueMicrotask(() => this.flushIconQueue());
+        }
+    }
+
+    /**
+     * 把尚未请求过的图标路径（按卡片顺序、已去重）一次性交给后端，结果分块推送回来
+     */
+    async flushIconQueue() {
+        this.iconFlushScheduled = false;
+        const paths = [...this.pendingIcons.keys()].filter(path => !this.inflightIcons.has(path));
+        if (paths.length === 0) return;
+        paths.forEach(path => this.inflightIcons.add(path));
+
+        const requestId = ++this.iconRequestSeq;
+        try {
+            const result = await window.pywebview.api.request_icons(requestId, paths, this.iconSize);
+            if (result.success) return;
+            console.warn('批量加载图标不可用，改为逐个加载:', result.error);
+        } catch (error) {
+            console.error('批量加载图标失败，改为逐个加载:', error);
+        }
+        // 批量接口失败时退回逐个加载
+        paths.forEach(path => {
+            this.inflightIcons.delete(path);
+            const waiting = this.pendingIcons.get(path) || [];
+            this.pendingIcons.delete(path);
+            waiting.forEach(({ container, name }) => this.loadImageIcon(container, path, name));
+        });
+    }
+
+    /**
+     * 处理后端推送的一块图标数据
+     * @param {{request_id: number, icons: Object<string, string>, errors: Object<string, string>, done: boolean}} chunk
+     */
+    applyIconChunk(chunk) {
+        Object.entries(chunk.icons || {}).forEach(([path, base64Data]) => {
+            this.iconsCache.set(path, base64Data);
+            this.inflightIcons.delete(path);
+            const waiting = this.pendingIcons.get(path) || [];
+            this.pendingIcons.delete(path);
+            waiting.forEach(({ container, name }) => {
+                // 等待期间重新渲染过的卡片已不在页面中
+                if (container.isConnected) {
+                    this.showImageIcon(container, base64Data, name);
+                }
+            });
+        });
+        Object.entries(chunk.errors || {}).forEach(([path, error]) => {
+            this.inflightIcons.delete(path);
+            const waiting = this.pendingIcons.get(path) || [];
+            this.pendingIcons.delete(path);
+            waiting.forEach(({ container }) => {
+                container.innerHTML = '<span class="emoji-icon">❌</span>';
+            });
+            console.error(`获取图标base64数据失败: ${error} for path: ${path}`);
+        });
+    }
+
     /**
      * 加载图像图标
      */
     async loadImageIcon(iconContainer, iconPath, scriptName) {
+        // 已加载过的图标直接使用缓存，重复渲染不再经过 pywebview 桥
+        const cached = this.iconsCache.get(iconPath);
+        if (cached) {
+            this.showImageIcon(iconContainer, cached, scriptName);
+            return;
+        }
+
         // 创建加载中的占位元素
         iconContainer.innerHTML = '<div class="loading-icon">⏳</div>';
 
         try {
             // 通过API将图标文件转换为base64格式
-            const result = await window.pywebview.api.get_icon_as_base64(iconPath);
+            const result = await window.pywebview.api.get_icon_as_base64(iconPath, this.iconSize);
             
             if (result.success) {
+                this.iconsCache.set(iconPath, result.base64_data);
+
                 // 创建图像元素
                 const img = document.createElement('img');
                 img.src = result.base64_data;
@@ -75,6 +167,25 @@ export class IconManager {
         }
     }
 
+    /**
+     * 使用已缓存的图标数据直接显示
+     */
+    showImageIcon(iconContainer, base64Data, scriptName) {
+        const img = document.createElement('img');
+        img.src = base64Data;
+        img.alt = scriptName;
+        img.classList.add('script-icon-img');
+        iconContainer.innerHTML = '';
+        iconContainer.appendChild(img);
+    }
+
+    /**
+     * 图标文件内容可能已变化（路径不变），丢弃其缓存
+     */
+    invalidateIcon(iconPath) {
+        this.iconsCache.delete(iconPath);
+    }
+
     /**
      * 直接打开文件选择器选择图标
      */
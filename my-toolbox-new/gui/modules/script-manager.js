@@ -37,6 +37,28 @@ export class ScriptManager {
         }
     }
     
+    /**
+     * 通过后端搜索索引获取当前关键词的结果（按相关度排序）
+     */
+    async updateSearchResults() {
+        const query = this.app.searchQuery;
+        if (!query) {
+            this.app.searchResultIds = null;
+            return;
+        }
+        // 只采用最后一次输入对应的结果，丢弃先发后至的旧响应
+        const requestSeq = (this.searchSeq = (this.searchSeq || 0) + 1);
+        try {
+            const results = await window.pywebview.api.search_scripts(query);
+            if (requestSeq === this.searchSeq) {
+                this.app.searchResultIds = results.map(script => script.id);
+            }
+        } catch (error) {
+            console.error('搜索脚本失败:', error);
+            this.app.searchResultIds = [];
+        }
+    }
+
     renderScripts() {
         const grid = document.getElementById('scripts-grid');
         
@@ -60,13 +82,12 @@ export class ScriptManager {
                 );
             }
             
-            // 按搜索关键词过滤
-            if (this.app.searchQuery) {
-                filteredScripts = filteredScripts.filter(script => 
-                    script.name.toLowerCase().includes(this.app.searchQuery) ||
-                    script.description.toLowerCase().includes(this.app.searchQuery) ||
-                    (script.category && script.category.toLowerCase().includes(this.app.searchQuery))
-                );
+            // 按搜索关键词过滤，并按后端给出的相关度排序
+            if (this.app.searchQuery && this.app.searchResultIds) {
+                const scriptMap = new Map(filteredScripts.map(script => [script.id, script]));
+                filteredScripts = this.app.searchResultIds
+                    .filter(id => scriptMap.has(id))
+                    .map(id => scriptMap.get(id));
             }
             
             // 渲染脚本卡片
@@ -127,6 +148,36 @@ export class ScriptManager {
         }
     }
     
+    /**
+     * 应用后端推送的脚本差异（新增/更新/删除），无需重新加载整个列表
+     * @param {{added: Object[], updated: Object[], removed: string[]}} diff
+     */
+    async applyScriptChanges(diff) {
+        const removedIds = new Set(diff.removed || []);
+        const changed = new Map();
+        [...(diff.updated || []), ...(diff.added || [])].forEach(script => changed.set(script.id, script));
+        // 更新过的脚本可能替换了同名图标文件
+        (diff.updated || []).forEach(script => script.icon && this.iconManager.invalidateIcon(script.icon));
+
+        const scripts = [];
+        this.app.scripts.forEach(script => {
+            if (removedIds.has(script.id)) return;
+            if (changed.has(script.id)) {
+                scripts.push(changed.get(script.id));
+                changed.delete(script.id);
+            } else {
+                scripts.push(script);
+            }
+        });
+        // 剩余的是新脚本，追加到末尾
+        changed.forEach(script => scripts.push(script));
+        this.app.scripts = scripts;
+
+        this.app.categoryManager.loadCategories();
+        await this.updateSearchResults();
+        this.renderScripts();
+    }
+
     updateScriptDisplay(scriptId, updates) {
         // 更新应用中的脚本数据
         const script = this.app.scripts.find(s => s.id === scriptId);
@@ -1,17 +1,258 @@
 /**
  * 终端管理模块 - 处理终端输出显示
+ * 每个任务有独立的输出通道，终端显示当前选中任务的输出。
+ * 完整的输出保存在后端的环形缓冲区中，前端只缓存最近的若干行，并且只渲染可见区域内的行。
  */
+
+// 每行的固定高度（像素），与 .terminal-line 的样式一致
+const LINE_HEIGHT = 20;
+// 可见区域上下额外渲染的行数
+const OVERSCAN_LINES = 20;
+// 每个任务在前端缓存的最近行数
+const CLIENT_TAIL_LINES = 2000;
+// 不属于任何任务的消息（如启动前的错误）所在的通道
+const SYSTEM_CHANNEL = '__system__';
+
 export class TerminalManager {
     constructor(app) {
         this.app = app;
+        // 任务ID -> {name, status, firstLine, totalLines, tailStart, tail, page, follow}
+        this.jobs = new Map();
+        this.activeJobId = null;
+        this.renderScheduled = false;
+        this.pageRequestSeq = 0;
+
+        const select = document.getElementById('terminal-job-select');
+        if (select) {
+            select.addEventListener('change', () => this.showJob(select.value));
+        }
+        const output = this.getOutputElement();
+        if (output) {
+            output.innerHTML = '<div class="terminal-spacer"></div><div class="terminal-lines"></div>';
+            output.addEventListener('scroll', () => {
+                const entry = this.jobs.get(this.activeJobId);
+                if (entry) {
+                    // 用户滚动到底部时恢复跟随最新输出，向上滚动时停止跟随
+                    entry.follow = output.scrollTop + output.clientHeight >= output.scrollHeight - LINE_HEIGHT;
+                }
+                this.scheduleRender();
+            });
+        }
+    }
+
+    getOutputElement() {
+        return document.getElementById('terminal-output');
+    }
+
+    /**
+     * 登记一个新任务并切换到它
+     */
+    addJob(job) {
+        const entry = this.getOrCreateJob(job.job_id);
+        entry.name = job.name;
+        entry.status = job.status;
+        this.showJob(job.job_id);
+    }
+
+    getOrCreateJob(jobId) {
+        // 输出帧可能先于 execute_script 的返回值到达
+        if (!this.jobs.has(jobId)) {
+            this.jobs.set(jobId, {
+                name: jobId === SYSTEM_CHANNEL ? '系统消息' : jobId,
+                status: 'running',
+                firstLine: 0,
+                totalLines: 0,
+                tailStart: 0,
+                tail: [],
+                page: null,
+                follow: true
+            });
+        }
+        return this.jobs.get(jobId);
+    }
+
+    /**
+     * 追加一帧输出
+     * @param {string} jobId - 任务ID
+     * @param {string[]} lines - 输出行（HTML）
+     * @param {number} [firstLine] - 第一行在任务输出中的行号，省略时接在已有输出之后
+     */
+    appendLines(jobId, lines, firstLine) {
+        const entry = this.getOrCreateJob(jobId);
+        if (firstLine === undefined) {
+            firstLine = entry.totalLines;
+        }
+        if (firstLine !== entry.tailStart + entry.tail.length) {
+            // 与缓存不连续（例如丢失了部分帧），从这一帧重新开始缓存，中间的行按需向后端读取
+            entry.tail = [];
+            entry.tailStart = firstLine;
+        }
+        entry.tail.push(...lines);
+        if (entry.tail.length > CLIENT_TAIL_LINES) {
+            const drop = entry.tail.length - CLIENT_TAIL_LINES;
+            entry.tail.splice(0, drop);
+            entry.tailStart += drop;
+            if (jobId === SYSTEM_CHANNEL) {
+                entry.firstLine = entry.tailStart;
+            }
+        }
+        entry.totalLines = Math.max(entry.totalLines, firstLine + lines.length);
+
+        if (jobId === SYSTEM_CHANNEL && this.activeJobId !== SYSTEM_CHANNEL) {
+            // 错误等系统消息需要立即可见
+            this.showJob(SYSTEM_CHANNEL);
+            return;
+        }
+        if (jobId === this.activeJobId) {
+            this.scheduleRender();
+        }
+    }
+
+    /**
+     * 后端推送的任务状态变化
+     */
+    updateJobStatus(job) {
+        const entry = this.getOrCreateJob(job.job_id);
+        entry.name = job.name;
+        entry.status = job.status;
+        this.renderJobSelect();
+    }
+
+    async showJob(jobId) {
+        this.activeJobId = jobId;
+        const entry = this.getOrCreateJob(jobId);
+        entry.follow = true;
+        this.renderJobSelect();
+        this.scheduleRender();
+
+        if (jobId === SYSTEM_CHANNEL) return;
+        // 同步后端保存的行号范围和最近的输出
+        try {
+            const result = await window.pywebview.api.get_job_output(jobId, null, CLIENT_TAIL_LINES);
+            if (result.success) {
+                entry.firstLine = result.first_line;
+                if (result.total_lines >= entry.totalLines) {
+                    entry.tail = result.lines;
+                    entry.tailStart = result.start;
+                    entry.totalLines = result.total_lines;
+                }
+                if (jobId === this.activeJobId) this.scheduleRender();
+            }
+        } catch (error) {
+            console.error('读取任务输出失败:', error);
+        }
+    }
+
+    scheduleRender() {
+        if (this.renderScheduled) return;
+        this.renderScheduled = true;
+        requestAnimationFrame(() => {
+            this.renderScheduled = false;
+            this.render();
+        });
+    }
+
+    /**
+     * 只渲染可见区域（加上下缓冲）内的行
+     */
+    render() {
+        const output = this.getOutputElement();
+        const entry = this.jobs.get(this.activeJobId);
+        if (!output || !entry) return;
+        const spacer = output.querySelector('.terminal-spacer');
+        const container = output.querySelector('.terminal-lines');
+
+        spacer.style.height = `${(entry.totalLines - entry.firstLine) * LINE_HEIGHT}px`;
+        if (entry.follow) {
+            output.scrollTop = output.scrollHeight;
+        }
+
+        const firstVisible = Math.floor(output.scrollTop / LINE_HEIGHT);
+        const visibleCount = Math.ceil(output.clientHeight / LINE_HEIGHT);
+        const start = entry.firstLine + Math.max(0, firstVisible - OVERSCAN_LINES);
+        const end = Math.min(entry.totalLines, entry.firstLine + firstVisible + visibleCount + OVERSCAN_LINES);
+
+        const rows = [];
+        let missing = false;
+        for (let lineNo = start; lineNo < end; lineNo++) {
+            const line = this.getCachedLine(entry, lineNo);
+            if (line === undefined) missing = true;
+            rows.push(`<div class="terminal-line">${line === undefined ? '' : line}</div>`);
+        }
+        container.style.top = `${(start - entry.firstLine) * LINE_HEIGHT}px`;
+        container.innerHTML = rows.join('');
+
+        if (missing && this.activeJobId !== SYSTEM_CHANNEL) {
+            this.fetchPage(this.activeJobId, start, end - start);
+        }
+    }
+
+    getCachedLine(entry, lineNo) {
+        if (lineNo >= entry.tailStart && lineNo < entry.tailStart + entry.tail.length) {
+            return entry.tail[lineNo - entry.tailStart];
+        }
+        const page = entry.page;
+        if (page && lineNo >= page.start && lineNo < page.start + page.lines.length) {
+            return page.lines[lineNo - page.start];
+        }
+        return undefined;
+    }
+
+    /**
+     * 向后端读取不在前端缓存中的行（滚动到较早的输出时）
+     */
+    async fetchPage(jobId, start, count) {
+        const requestSeq = ++this.pageRequestSeq;
+        try {
+            const result = await window.pywebview.api.get_job_output(jobId, start, count);
+            // 只采用最后一次请求的结果
+            if (!result.success || requestSeq !== this.pageRequestSeq) return;
+            const entry = this.getOrCreateJob(jobId);
+            entry.firstLine = result.first_line;
+            entry.page = { start: result.start, lines: result.lines };
+            if (jobId === this.activeJobId) this.scheduleRender();
+        } catch (error) {
+            console.error('读取任务输出失败:', error);
+        }
+    }
+
+    renderJobSelect() {
+        const select = document.getElementById('terminal-job-select');
+        if (!select) return;
+        const statusLabels = {
+            queued: '排队中', running: '运行中', succeeded: '成功', failed: '失败',
+            terminated: '已终止', cancelled: '已取消', error: '错误'
+        };
+        select.innerHTML = '';
+        this.jobs.forEach((entry, jobId) => {
+            const option = document.createElement('option');
+            option.value = jobId;
+            option.textContent = jobId === SYSTEM_CHANNEL
+                ? entry.name
+                : `${entry.name} (${statusLabels[entry.status] || entry.status})`;
+            option.selected = jobId === this.activeJobId;
+            select.appendChild(option);
+        });
     }
 }
 
 // 更新终端输出的函数（由后端调用）
 // 注意：这是全局函数，需要在全局作用域定义
-window.updateTerminal = function(content) {
-    const terminalOutput = document.getElementById('terminal-output');
-    terminalOutput.innerHTML += content;
-    // 自动滚动到底部
-    terminalOutput.scrollTop = terminalOutput.scrollHeight;
-};
\ No newline at end of file
+// content 为一帧输出行数组（带任务ID和首行行号），或一段不属于任何任务的 HTML 消息
+window.updateTerminal = function(content, jobId, firstLine) {
+    if (!window.scriptToolbox) return;
+    const terminalManager = window.scriptToolbox.terminalManager;
+    if (Array.isArray(content)) {
+        terminalManager.appendLines(jobId, content, firstLine);
+    } else {
+        const lines = String(content).split(/<br\s*\/?>/).filter(line => line !== '');
+        terminalManager.appendLines(SYSTEM_CHANNEL, lines);
+    }
+};
+
+// 任务状态变化时由后端调用
+window.onJobStatus = function(job) {
+    if (window.scriptToolbox) {
+        window.scriptToolbox.terminalManager.updateJobStatus(job);
+    }
+};
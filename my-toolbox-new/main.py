@@ -21,6 +21,8 @@ def main():
     
     # 启动应用
     webview.start(debug=False, gui='cef' if webview.settings.get('use_cef') else None)
+    # 窗口关闭后终止仍在运行的脚本并停止后台事件循环
+    api.shutdown()
 
 
 if __name__ == '__main__':
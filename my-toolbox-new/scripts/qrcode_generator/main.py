@@ -14,7 +14,7 @@ def get_metadata():
     """
     返回脚本的元数据，供工具箱UI使用。
     """
-    return {'description': '根据输入的文本或URL链接，生成一个二维码图片文件。', 'dependencies': ['qrcode[pil]'], 'parameters': [{'name': 'data', 'type': 'text', 'label': '要编码的文本或URL', 'required': True, 'defaultValue': 'https://www.google.com'}, {'name': 'output_path', 'type': 'folder', 'label': '选择保存文件夹', 'required': True, 'defaultValue': ''}, {'name': 'box_size', 'type': 'number', 'label': '尺寸 (单个模块的像素数)', 'required': False, 'defaultValue': 10}, {'name': 'border', 'type': 'number', 'label': '边框宽度 (模块数)', 'required': False, 'defaultValue': 4}], 'category': '测试'}
+    return {'description': '根据输入的文本或URL链接，生成一个二维码图片文件。', 'dependencies': ['qrcode[pil]'], 'parameters': [{'name': 'data', 'type': 'text', 'label': '要编码的文本或URL', 'required': True, 'defaultValue': 'https://www.google.com'}, {'name': 'output_path', 'type': 'folder', 'label': '选择保存文件夹', 'required': True, 'defaultValue': ''}, {'name': 'box_size', 'type': 'number', 'label': '尺寸 (单个模块的像素数)', 'required': False, 'defaultValue': 10}, {'name': 'border', 'type': 'number', 'label': '边框宽度 (模块数)', 'required': False, 'defaultValue': 4}], 'category': '测试', 'cacheable': True}
 
 def main():
     """
@@ -0,0 +1,7 @@
+"""
+测试配置 - 把项目根目录加入 sys.path，测试中可以直接 import core.*
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,31 @@
+"""
+依赖集合的规范化和哈希
+"""
+from core.auto_env import normalize_requirement, normalize_requirements, requirements_key
+
+
+def test_normalize_name_extras_and_specifiers():
+    assert normalize_requirement('Requests_OAuthlib') == 'requests-oauthlib'
+    assert normalize_requirement(' Foo[Zeta, alpha] <2.0 , >=1.0 ') == 'foo[alpha,zeta]<2.0,>=1.0'
+    assert normalize_requirement('PyWin32; sys_platform == "win32"') == 'pywin32; sys_platform == "win32"'
+
+
+def test_normalize_keeps_url_and_unparseable_text():
+    assert normalize_requirement('Pkg @ https://example.com/pkg.zip') == 'pkg @ https://example.com/pkg.zip'
+    assert normalize_requirement('  not a ( requirement ') == 'not a ( requirement'
+
+
+def test_normalize_requirements_sorts_dedups_and_drops_blanks():
+    assert normalize_requirements(['numpy', 'Pandas>=2', ' ', '', 'NumPy']) == ['numpy', 'pandas>=2']
+
+
+def test_key_ignores_order_case_and_whitespace():
+    key = requirements_key(['requests>=2,<3', 'numpy'])
+    assert key == requirements_key(['NumPy', ' requests < 3 , >= 2 '])
+    assert key == requirements_key(['numpy', 'requests<3,>=2', 'numpy', ''])
+    assert len(key) == 12
+
+
+def test_key_changes_with_requirements():
+    assert requirements_key(['numpy']) != requirements_key(['numpy>=1.26'])
+    assert requirements_key(['numpy']) != requirements_key(['numpy', 'pandas'])
@@ -0,0 +1,110 @@
+"""
+JobScheduler 的优先级、并发上限和取消
+任务不启动真实的子进程：运行器只记录 start_job 的调用，测试中手动结束任务
+"""
+import pytest
+
+from core.job_scheduler import JobScheduler
+from core.process_runner import ProcessRunner, JOB_CANCELLED, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED
+
+
+class RecordingRunner(ProcessRunner):
+    def __init__(self):
+        super().__init__()
+        self.started = []
+
+    def start_job(self, job):
+        job.status = JOB_RUNNING
+        self.started.append(job.job_id)
+
+    def finish(self, job):
+        self._finish_job(job, JOB_SUCCEEDED)
+
+
+@pytest.fixture
+def runner():
+    runner = RecordingRunner()
+    yield runner
+    runner.supervisor.shutdown()
+
+
+def submit(scheduler, script_id, priority='normal'):
+    return scheduler.submit(['python', f'{script_id}/main.py'], None, script_id=script_id, priority=priority)
+
+
+def test_global_limit_queues_extra_jobs(runner):
+    scheduler = JobScheduler(runner, max_concurrent=2)
+    jobs = [submit(scheduler, f's{i}') for i in range(3)]
+    assert runner.started == [jobs[0].job_id, jobs[1].job_id]
+    assert jobs[2].status == JOB_QUEUED
+    assert scheduler.status()['running'] == 2
+    assert scheduler.status()['queued'] == 1
+
+    runner.finish(jobs[0])
+    assert runner.started[-1] == jobs[2].job_id
+    assert scheduler.status()['queued'] == 0
+
+
+def test_priority_then_fifo_order(runner):
+    scheduler = JobScheduler(runner, max_concurrent=1)
+    blocker = submit(scheduler, 'blocker')
+    low = submit(scheduler, 'low', 'low')
+    normal_1 = submit(scheduler, 'n1')
+    high = submit(scheduler, 'high', 'high')
+    normal_2 = submit(scheduler, 'n2')
+    assert scheduler.queue_positions() == {high.job_id: 1, normal_1.job_id: 2, normal_2.job_id: 3, low.job_id: 4}
+
+    for expected in (blocker, high, normal_1, normal_2, low):
+        assert runner.started[-1] == expected.job_id
+        runner.finish(expected)
+
+
+def test_per_script_limit_does_not_block_other_scripts(runner):
+    scheduler = JobScheduler(runner, max_concurrent=3, per_script_limit=1)
+    first = submit(scheduler, 'a')
+    second = submit(scheduler, 'a')
+    other = submit(scheduler, 'b')
+    assert runner.started == [first.job_id, other.job_id]
+    assert second.status == JOB_QUEUED
+
+    runner.finish(first)
+    assert runner.started[-1] == second.job_id
+
+
+def test_script_specific_limit_overrides_default(runner):
+    scheduler = JobScheduler(runner, max_concurrent=4, per_script_limit=1, script_limits={'a': 2})
+    jobs = [submit(scheduler, 'a') for _ in range(3)]
+    assert runner.started == [jobs[0].job_id, jobs[1].job_id]
+
+
+def test_cancel_only_removes_queued_jobs(runner):
+    scheduler = JobScheduler(runner, max_concurrent=1)
+    running = submit(scheduler, 'a')
+    queued = submit(scheduler, 'b')
+    finished = []
+    runner.add_finish_listener(finished.append)
+
+    assert scheduler.cancel(running.job_id) is False
+    assert scheduler.cancel(queued.job_id) is True
+    assert queued.status == JOB_CANCELLED
+    assert finished == [queued]
+    assert scheduler.cancel(queued.job_id) is False
+    assert scheduler.cancel('job-missing') is False
+
+    # 取消的任务不会在名额空出后被启动
+    runner.finish(running)
+    assert runner.started == [running.job_id]
+    assert scheduler.status()['running'] == 0
+
+
+def test_raising_limit_starts_queued_jobs(runner):
+    scheduler = JobScheduler(runner, max_concurrent=1)
+    jobs = [submit(scheduler, f's{i}') for i in range(3)]
+    scheduler.configure(max_concurrent=3)
+    assert runner.started == [job.job_id for job in jobs]
+
+
+def test_unknown_priority_rejected(runner):
+    scheduler = JobScheduler(runner)
+    with pytest.raises(ValueError):
+        submit(scheduler, 'a', 'urgent')
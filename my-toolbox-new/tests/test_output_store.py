@@ -0,0 +1,52 @@
+"""
+任务输出环形缓冲区的淘汰和分页
+"""
+from core.output_store import JobOutputBuffer, MAX_PAGE_LINES, utf8_size
+
+
+def test_evicts_oldest_lines_over_line_budget():
+    buffer = JobOutputBuffer(max_lines=3, max_bytes=1024)
+    for i in range(5):
+        buffer.append(f'line {i}')
+    assert buffer.total_lines == 5
+    page = buffer.get_range(0, 10)
+    assert page == {"start": 2, "lines": ['line 2', 'line 3', 'line 4'], "first_line": 2, "total_lines": 5}
+
+
+def test_byte_budget_counts_utf8_bytes():
+    assert utf8_size('中文') == 6
+    buffer = JobOutputBuffer(max_lines=100, max_bytes=12)
+    for text in ('一二', '三四', '五六'):
+        buffer.append(text)
+    # 每行 6 字节，只能保留最后两行
+    assert buffer.get_range(0, 10)['lines'] == ['三四', '五六']
+    assert buffer.stats()['bytes'] == 12
+
+
+def test_keeps_single_line_larger_than_budget():
+    buffer = JobOutputBuffer(max_lines=10, max_bytes=4)
+    buffer.append('short')
+    buffer.append('much longer line')
+    stats = buffer.stats()
+    assert stats['lines'] == 1
+    assert stats['first_line'] == 1
+    assert buffer.tail(5)['lines'] == ['much longer line']
+
+
+def test_get_range_clamps_start():
+    buffer = JobOutputBuffer(max_lines=10)
+    for i in range(4):
+        buffer.append(str(i))
+    assert buffer.get_range(1, 2)['lines'] == ['1', '2']
+    past_end = buffer.get_range(100, 5)
+    assert past_end['start'] == 4
+    assert past_end['lines'] == []
+    assert buffer.get_range(2, -1)['lines'] == []
+
+
+def test_tail_and_page_limit():
+    buffer = JobOutputBuffer(max_lines=MAX_PAGE_LINES * 2)
+    for i in range(MAX_PAGE_LINES + 10):
+        buffer.append(str(i))
+    assert buffer.tail(3)['lines'] == [str(MAX_PAGE_LINES + 7), str(MAX_PAGE_LINES + 8), str(MAX_PAGE_LINES + 9)]
+    assert len(buffer.get_range(0, MAX_PAGE_LINES * 2)['lines']) == MAX_PAGE_LINES
@@ -0,0 +1,105 @@
+"""
+包操作队列的合并规则和执行方案的回退
+"""
+import sys
+import threading
+
+import pytest
+
+from core.output_batcher import OutputBatcher
+from core.package_queue import PackageOperationQueue
+from core.process_supervisor import ProcessSupervisor
+
+
+class HeldSupervisor:
+    """只保存提交的协程而不运行，便于在排队状态下检查合并规则"""
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, coro):
+        self.submitted.append(coro)
+
+    def close(self):
+        for coro in self.submitted:
+            coro.close()
+
+
+@pytest.fixture
+def held():
+    supervisor = HeldSupervisor()
+    yield supervisor
+    supervisor.close()
+
+
+@pytest.fixture
+def supervisor():
+    supervisor = ProcessSupervisor()
+    yield supervisor
+    supervisor.shutdown()
+
+
+def make_queue(supervisor, build_plan=None):
+    return PackageOperationQueue(supervisor, build_plan or (lambda venv, op, packages: None),
+                                 lambda venv: OutputBatcher(lambda frame: None, supervisor))
+
+
+def test_one_drain_per_venv(held):
+    queue = make_queue(held)
+    queue.submit('a', 'install', ['requests'])
+    queue.submit('a', 'install', ['numpy'])
+    queue.submit('b', 'install', ['rich'])
+    assert len(held.submitted) == 2
+    assert queue.status()['pending'] == {'a': ['requests', 'numpy'], 'b': ['rich']}
+
+
+def test_take_batch_merges_consecutive_same_operations(held):
+    queue = make_queue(held)
+    queue.submit('a', 'install', ['requests', 'numpy'])
+    queue.submit('a', 'install', ['numpy', 'rich'])
+    queue.submit('a', 'uninstall', ['six'])
+    queue.submit('a', 'install', ['tqdm'])
+
+    batch = queue._take_batch('a')
+    assert [op.packages for op in batch] == [['requests', 'numpy'], ['numpy', 'rich']]
+    assert queue.status()['running'] == {'a': ['requests', 'numpy', 'rich']}
+
+    assert [op.operation for op in queue._take_batch('a')] == ['uninstall']
+    assert [op.packages for op in queue._take_batch('a')] == [['tqdm']]
+    assert queue._take_batch('a') == []
+    assert queue.status() == {'running': {}, 'pending': {}}
+
+
+def test_unknown_operation_rejected(held):
+    with pytest.raises(ValueError):
+        make_queue(held).submit('a', 'upgrade', ['requests'])
+
+
+def test_falls_back_to_next_attempt(supervisor):
+    fail = [sys.executable, '-c', 'raise SystemExit(3)']
+    ok = [sys.executable, '-c', 'pass']
+    queue = make_queue(supervisor, lambda venv, op, packages: [[ok, fail], [ok]])
+    done = threading.Event()
+    results = []
+
+    def on_done(result):
+        results.append(result)
+        done.set()
+
+    queue.submit('a', 'install', ['requests'], on_done)
+    assert done.wait(10)
+    assert results == [{'success': True, 'attempt': 1, 'packages': ['requests']}]
+
+
+def test_reports_missing_environment(supervisor):
+    queue = make_queue(supervisor)
+    done = threading.Event()
+    results = []
+
+    def on_done(result):
+        results.append(result)
+        done.set()
+
+    queue.submit('missing', 'uninstall', ['requests'], on_done)
+    assert done.wait(10)
+    assert results[0]['success'] is False
+    assert results[0]['packages'] == ['requests']
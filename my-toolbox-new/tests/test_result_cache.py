@@ -0,0 +1,145 @@
+"""
+结果缓存的缓存键、产物保存与恢复、轮转，以及共用输出位置时跳过缓存
+"""
+import os
+import sys
+import time
+
+import pytest
+
+from core.result_cache import ResultCache
+
+
+@pytest.fixture
+def script(tmp_path):
+    folder = tmp_path / 'scripts' / 'demo'
+    folder.mkdir(parents=True)
+    (folder / 'main.py').write_text('print("hello")\n', encoding='utf-8')
+    return {
+        'id': 'demo',
+        'file_path': str(folder / 'main.py'),
+        'parameters': [
+            {'name': 'input', 'type': 'file'},
+            {'name': 'out', 'type': 'folder'},
+            {'name': 'count', 'type': 'int'},
+        ],
+    }
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(tmp_path / 'cache')
+
+
+def command(script, *args):
+    return ['python', script['file_path'], *args]
+
+
+def test_key_is_stable_and_sensitive_to_args(cache, script):
+    key = cache.compute_key(script, command(script, '--count', '1'), sys.executable)
+    assert key == cache.compute_key(script, command(script, '--count', '1'), sys.executable)
+    assert key != cache.compute_key(script, command(script, '--count', '2'), sys.executable)
+
+
+def test_key_tracks_script_and_input_content(cache, script, tmp_path):
+    input_file = tmp_path / 'data.txt'
+    input_file.write_text('a', encoding='utf-8')
+    parts = command(script, '--input', str(input_file))
+    key = cache.compute_key(script, parts, sys.executable)
+
+    input_file.write_text('bb', encoding='utf-8')
+    changed_input = cache.compute_key(script, parts, sys.executable)
+    assert changed_input != key
+
+    with open(script['file_path'], 'a', encoding='utf-8') as f:
+        f.write('print("world")\n')
+    assert cache.compute_key(script, parts, sys.executable) != changed_input
+
+
+def test_store_lookup_and_restore_artifacts(cache, script, tmp_path):
+    out = tmp_path / 'out'
+    out.mkdir()
+    (out / 'old.txt').write_text('before', encoding='utf-8')
+    parts = command(script, '--out', str(out))
+    key = cache.compute_key(script, parts, sys.executable)
+
+    cache.begin('job-1', script, parts)
+    (out / 'result.txt').write_text('result', encoding='utf-8')
+    assert cache.store('job-1', key, script, parts, ['done'], time.time())
+
+    entry = cache.lookup(key)
+    assert entry['lines'] == ['done']
+    # 任务启动前已存在且未修改的文件不是产物
+    assert [os.path.basename(artifact['path']) for artifact in entry['artifacts']] == ['result.txt']
+
+    (out / 'result.txt').unlink()
+    assert cache.restore_artifacts(key, entry) == [str(out / 'result.txt')]
+    assert (out / 'result.txt').read_text(encoding='utf-8') == 'result'
+    assert cache.restore_artifacts(key, entry) == []
+    assert cache.get_stats()['hits'] == 1
+
+
+def test_lookup_misses_when_artifact_missing(cache, script, tmp_path):
+    out = tmp_path / 'out'
+    out.mkdir()
+    parts = command(script, '--out', str(out))
+    cache.begin('job-1', script, parts)
+    (out / 'result.txt').write_text('result', encoding='utf-8')
+    cache.store('job-1', 'key', script, parts, [], time.time())
+
+    (tmp_path / 'cache' / 'key' / '0.txt').unlink()
+    assert cache.lookup('key') is None
+    assert cache.lookup('unknown') is None
+    assert cache.get_stats()['misses'] == 2
+
+
+def test_overlapping_jobs_are_not_cached(cache, script, tmp_path):
+    out = tmp_path / 'out'
+    out.mkdir()
+    parts = command(script, '--out', str(out))
+    cache.begin('job-1', script, parts)
+    cache.begin('job-2', script, parts)
+    (out / 'result.txt').write_text('result', encoding='utf-8')
+    cache.discard('job-1')
+    assert not cache.store('job-2', 'key', script, parts, [], time.time())
+
+    # 之后单独运行的任务可以正常缓存
+    cache.begin('job-3', script, parts)
+    (out / 'result.txt').write_text('again', encoding='utf-8')
+    assert cache.store('job-3', 'key', script, parts, [], time.time())
+    assert cache.get_stats()['skipped'] == 1
+
+
+def test_store_without_begin_is_skipped(cache, script):
+    assert not cache.store('job-1', 'key', script, command(script), ['x'], time.time())
+
+
+def store_entry(cache, script, key, lines, mtime=None):
+    parts = command(script)
+    cache.begin(key, script, parts)
+    assert cache.store(key, key, script, parts, lines, time.time())
+    if mtime is not None:
+        result_file = cache._entry_dir(key) / 'result.json'
+        os.utime(result_file, (mtime, mtime))
+
+
+def test_evict_removes_expired_entries(tmp_path, script):
+    cache = ResultCache(tmp_path / 'cache', max_age_days=1)
+    store_entry(cache, script, 'old', ['x'], time.time() - 2 * 86400)
+    store_entry(cache, script, 'new', ['x'])
+    cache.evict()
+    assert cache.lookup('old') is None
+    assert cache.lookup('new') is not None
+
+
+def test_evict_removes_least_recently_used_over_size_limit(tmp_path, script):
+    lines = ['x' * 100] * 10
+    cache = ResultCache(tmp_path / 'cache', max_total_bytes=2500)
+    now = time.time()
+    store_entry(cache, script, 'a', lines, now - 30)
+    store_entry(cache, script, 'b', lines, now - 20)
+    store_entry(cache, script, 'c', lines, now - 10)
+    cache.evict()
+    assert cache.lookup('a') is None
+    assert cache.lookup('b') is not None
+    assert cache.lookup('c') is not None
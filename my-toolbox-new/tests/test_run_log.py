@@ -0,0 +1,80 @@
+"""
+运行日志的分块读取、搜索和中断恢复
+"""
+import pytest
+
+from core.run_log import BLOCK_LINES, RunLogStore, STATUS_INTERRUPTED
+
+TOTAL_LINES = BLOCK_LINES * 2 + 500
+
+
+@pytest.fixture
+def store(tmp_path):
+    return RunLogStore(tmp_path)
+
+
+@pytest.fixture
+def log_id(store):
+    writer = store.open_writer('job-1', 'demo', 'Demo', ['python', 'main.py'])
+    for i in range(TOTAL_LINES):
+        writer.write_line(f'Line {i}' + (' MATCH' if i % 1000 == 999 else ''))
+    store.close_writer(writer, status='succeeded', exit_code=0)
+    return writer.log_id
+
+
+def test_meta_after_close(store, log_id):
+    meta = store.list_logs('demo')[0]
+    assert meta['log_id'] == log_id
+    assert meta['status'] == 'succeeded'
+    assert meta['total_lines'] == TOTAL_LINES
+    assert meta['compressed_bytes'] > 0
+
+
+def test_read_lines_across_block_boundary(store, log_id):
+    page = store.read_lines(log_id, BLOCK_LINES - 2, 4)
+    assert page['start'] == BLOCK_LINES - 2
+    assert page['total_lines'] == TOTAL_LINES
+    assert page['lines'] == [f'Line {BLOCK_LINES - 2}', f'Line {BLOCK_LINES - 1} MATCH', f'Line {BLOCK_LINES}',
+                             f'Line {BLOCK_LINES + 1}']
+
+
+def test_read_lines_clamps_range(store, log_id):
+    page = store.read_lines(log_id, TOTAL_LINES - 1, 10)
+    assert page['lines'] == [f'Line {TOTAL_LINES - 1}']
+    assert store.read_lines(log_id, TOTAL_LINES + 5, 10)['lines'] == []
+    assert store.read_lines('missing', 0, 10) is None
+
+
+def test_tail_reads_last_lines(store, log_id):
+    page = store.tail(log_id, 3)
+    assert page['start'] == TOTAL_LINES - 3
+    assert page['lines'] == [f'Line {i}' for i in range(TOTAL_LINES - 3, TOTAL_LINES)]
+
+
+def test_search_across_blocks(store, log_id):
+    result = store.search(log_id, 'match')
+    assert result['truncated'] is False
+    assert [match['line'] for match in result['matches']] == [999, 1999, 2999, 3999]
+    assert result['matches'][1]['text'] == 'Line 1999 MATCH'
+
+    assert store.search(log_id, 'match', ignore_case=False)['matches'] == []
+
+    limited = store.search(log_id, 'MATCH', limit=2)
+    assert limited['truncated'] is True
+    assert [match['line'] for match in limited['matches']] == [999, 1999]
+
+
+def test_recover_interrupted_marks_unclosed_logs(tmp_path):
+    writer = RunLogStore(tmp_path).open_writer('job-2', 'demo', 'Demo', ['python', 'main.py'])
+    for i in range(BLOCK_LINES + 10):
+        writer.write_line(f'Line {i}')
+
+    # 模拟重启：新的存储对象不知道这份日志仍在写入
+    restarted = RunLogStore(tmp_path)
+    assert restarted.recover_interrupted() == 1
+    meta = restarted.list_logs()[0]
+    assert meta['status'] == STATUS_INTERRUPTED
+    # 只有写满的块落盘，未写满的尾部随进程一起丢失
+    assert meta['total_lines'] == BLOCK_LINES
+    assert restarted.tail(writer.log_id, 1)['lines'] == [f'Line {BLOCK_LINES - 1}']
+    assert restarted.recover_interrupted() == 0
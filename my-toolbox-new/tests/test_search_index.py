@@ -0,0 +1,130 @@
+"""
+ScriptSearchIndex 的排序、分页和增量更新
+"""
+from core.search_index import ScriptSearchIndex, tokenize_query, tokenize_text
+
+
+def make_script(script_id, name, description='', category=None, dependencies=None):
+    return {
+        'id': script_id,
+        'name': name,
+        'description': description,
+        'category': category,
+        'parameters': [],
+        'dependencies': dependencies or [],
+    }
+
+
+def build_index(*scripts):
+    index = ScriptSearchIndex()
+    for script in scripts:
+        index.add(script)
+    return index
+
+
+def test_name_match_ranks_above_description_match():
+    index = build_index(
+        make_script('desc', '工具', description='convert images'),
+        make_script('name', 'convert'),
+        make_script('other', 'unrelated'),
+    )
+    ids, total = index.search('convert')
+    assert ids == ['name', 'desc']
+    assert total == 2
+
+
+def test_exact_match_ranks_above_prefix_and_substring():
+    index = build_index(
+        make_script('substring', 'reconverter'),
+        make_script('prefix', 'converter'),
+        make_script('exact', 'convert'),
+    )
+    ids, _total = index.search('convert')
+    assert ids == ['exact', 'prefix', 'substring']
+
+
+def test_equal_scores_keep_insertion_order():
+    index = build_index(*[make_script(f's{i}', 'report tool') for i in range(5)])
+    ids, total = index.search('report')
+    assert ids == [f's{i}' for i in range(5)]
+    assert total == 5
+
+
+def test_all_query_terms_must_match():
+    index = build_index(
+        make_script('both', 'image convert'),
+        make_script('one', 'image viewer'),
+    )
+    ids, total = index.search('image convert')
+    assert ids == ['both']
+    assert total == 1
+
+
+def test_short_terms_do_not_match_as_substring():
+    index = build_index(make_script('a', 'decoder'))
+    assert index.search('co') == ([], 0)
+    assert index.search('de') == (['a'], 1)
+    assert index.search('cod') == (['a'], 1)
+
+
+def test_cjk_ngrams_and_unicode_words():
+    index = build_index(
+        make_script('report', '测试报告生成'),
+        make_script('cafe', 'Café Über'),
+    )
+    assert index.search('报告')[0] == ['report']
+    assert index.search('报')[0] == ['report']
+    assert index.search('CAFÉ')[0] == ['cafe']
+    assert index.search('über')[0] == ['cafe']
+
+
+def test_paging_returns_slices_and_total():
+    index = build_index(*[make_script(f's{i:02d}', f'tool {i}') for i in range(30)])
+    everything, total = index.search('tool')
+    assert total == 30
+    page, page_total = index.search('tool', limit=10, offset=10)
+    assert page == everything[10:20]
+    assert page_total == 30
+    assert index.search('tool', limit=10, offset=25)[0] == everything[25:]
+
+
+def test_remove_drops_script_from_results():
+    index = build_index(make_script('a', 'converter'), make_script('b', 'converter'))
+    assert index.search('conv')[0] == ['a', 'b']
+    index.remove('a')
+    assert index.search('conv') == (['b'], 1)
+    assert len(index) == 1
+    index.remove('a')  # 重复移除无副作用
+    assert len(index) == 1
+
+
+def test_remove_last_script_for_term_cleans_vocabulary():
+    index = build_index(make_script('a', 'uniqueword'))
+    index.remove('a')
+    assert index.search('unique') == ([], 0)
+    assert index.search('quew') == ([], 0)
+    assert index._word_terms == []
+    assert index._term_grams == {}
+
+
+def test_update_reindexes_and_keeps_position():
+    index = build_index(make_script('a', 'alpha tool'), make_script('b', 'beta tool'))
+    index.add(make_script('a', 'gamma tool'))
+    assert index.search('alpha') == ([], 0)
+    assert index.search('gamma')[0] == ['a']
+    # 更新后仍按最初加入的顺序排在前面
+    assert index.search('tool')[0] == ['a', 'b']
+
+
+def test_cached_results_invalidated_by_changes():
+    index = build_index(make_script('a', 'tool'))
+    assert index.search('tool')[0] == ['a']
+    index.add(make_script('b', 'tool'))
+    assert index.search('tool')[0] == ['a', 'b']
+    index.remove('a')
+    assert index.search('tool')[0] == ['b']
+
+
+def test_tokenizers_casefold_and_split_cjk():
+    assert tokenize_text('Straße 报告') == ['strasse', '报', '告', '报告']
+    assert tokenize_query('图片转换 PNG') == [('图片', False), ('片转', False), ('转换', False), ('png', True)]